@@ -3,8 +3,14 @@
 
 -- Enable extensions
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
 
 -- Drop existing tables if they exist (in reverse dependency order)
+DROP TABLE IF EXISTS sync_state CASCADE;
+DROP TABLE IF EXISTS partition_archive CASCADE;
+DROP TABLE IF EXISTS stock_ledger CASCADE;
+DROP TABLE IF EXISTS daily_product_sales CASCADE;
+DROP TABLE IF EXISTS daily_sales CASCADE;
 DROP TABLE IF EXISTS document_products CASCADE;
 DROP TABLE IF EXISTS documents CASCADE;
 DROP TABLE IF EXISTS money_movements CASCADE;
@@ -81,7 +87,8 @@ CREATE TABLE stores (
     created BIGINT,
     updated BIGINT,
     created_ms DECIMAL(16,3),
-    deleted BOOLEAN DEFAULT FALSE
+    deleted BOOLEAN DEFAULT FALSE,
+    _hash VARCHAR(32)
 );
 
 -- Financial Accounts
@@ -100,7 +107,8 @@ CREATE TABLE accounts (
     created BIGINT,
     updated BIGINT,
     created_ms DECIMAL(16,3),
-    deleted BOOLEAN DEFAULT FALSE
+    deleted BOOLEAN DEFAULT FALSE,
+    _hash VARCHAR(32)
 );
 
 -- Money Sources (payment methods)
@@ -109,7 +117,8 @@ CREATE TABLE money_sources (
     id VARCHAR(50),
     title VARCHAR(255) NOT NULL,
     type VARCHAR(50),
-    country VARCHAR(10)
+    country VARCHAR(10),
+    _hash VARCHAR(32)
 );
 
 -- Cash Registers
@@ -138,7 +147,8 @@ CREATE TABLE categories (
     sort_order INTEGER DEFAULT 0,
     created BIGINT,
     updated BIGINT,
-    deleted BOOLEAN DEFAULT FALSE
+    deleted BOOLEAN DEFAULT FALSE,
+    _hash VARCHAR(32)
 );
 
 -- Products (Catalog)
@@ -179,7 +189,8 @@ CREATE TABLE products (
     created BIGINT,
     updated BIGINT,
     created_ms DECIMAL(16,3),
-    deleted BOOLEAN DEFAULT FALSE
+    deleted BOOLEAN DEFAULT FALSE,
+    _hash VARCHAR(32)
 );
 
 -- Customers (Clients)
@@ -212,7 +223,8 @@ CREATE TABLE customers (
     created BIGINT,
     updated BIGINT,
     created_ms DECIMAL(16,3),
-    deleted BOOLEAN DEFAULT FALSE
+    deleted BOOLEAN DEFAULT FALSE,
+    _hash VARCHAR(32)
 );
 
 -- Suppliers
@@ -236,7 +248,8 @@ CREATE TABLE suppliers (
     created BIGINT,
     updated BIGINT,
     created_ms DECIMAL(16,3),
-    deleted BOOLEAN DEFAULT FALSE
+    deleted BOOLEAN DEFAULT FALSE,
+    _hash VARCHAR(32)
 );
 
 -- ============================================================================
@@ -269,9 +282,14 @@ CREATE TABLE shifts (
     deleted BOOLEAN DEFAULT FALSE
 );
 
+-- Documents and money movements are range-partitioned by month on date
+-- (epoch seconds, UTC). Monthly partitions are created on demand by
+-- ensure_month_partition(); rows without a matching partition land in the
+-- *_default partition and are moved out when their month is created.
+
 -- Documents (Sales, Purchases, Movements, Returns, etc.)
 CREATE TABLE documents (
-    _id VARCHAR(24) PRIMARY KEY,
+    _id VARCHAR(24) NOT NULL,
     uuid UUID DEFAULT uuid_generate_v4(),
     _user VARCHAR(24),
     _client VARCHAR(24),
@@ -280,7 +298,7 @@ CREATE TABLE documents (
     type VARCHAR(50) NOT NULL,
     number INTEGER,
     status BOOLEAN DEFAULT TRUE,
-    date BIGINT,
+    date BIGINT NOT NULL DEFAULT 0,
     store VARCHAR(24),
     "from" JSONB,
     "to" JSONB,
@@ -297,12 +315,17 @@ CREATE TABLE documents (
     created BIGINT,
     updated BIGINT,
     created_ms DECIMAL(16,3),
-    deleted BOOLEAN DEFAULT FALSE
-);
+    deleted BOOLEAN DEFAULT FALSE,
+    search_text TEXT,
+    _hash VARCHAR(32),
+    PRIMARY KEY (_id, date)
+) PARTITION BY RANGE (date);
+
+CREATE TABLE documents_default PARTITION OF documents DEFAULT;
 
 -- Money Movements (Financial Transactions)
 CREATE TABLE money_movements (
-    _id VARCHAR(24) PRIMARY KEY,
+    _id VARCHAR(24) NOT NULL,
     uuid UUID DEFAULT uuid_generate_v4(),
     _user VARCHAR(24),
     _client VARCHAR(24),
@@ -311,7 +334,7 @@ CREATE TABLE money_movements (
     _app VARCHAR(20),
     type VARCHAR(20) NOT NULL,
     sum DECIMAL(12,2) NOT NULL,
-    date BIGINT,
+    date BIGINT NOT NULL DEFAULT 0,
     "from" JSONB,
     "to" JSONB,
     account VARCHAR(24),
@@ -323,9 +346,118 @@ CREATE TABLE money_movements (
     created BIGINT,
     updated BIGINT,
     created_ms DECIMAL(16,3),
-    deleted BOOLEAN DEFAULT FALSE
+    deleted BOOLEAN DEFAULT FALSE,
+    _hash VARCHAR(32),
+    PRIMARY KEY (_id, date)
+) PARTITION BY RANGE (date);
+
+CREATE TABLE money_movements_default PARTITION OF money_movements DEFAULT;
+
+-- Months detached by the importer's --detach-before: rows dated before
+-- the cutoff (epoch seconds) are archived and not loaded again
+CREATE TABLE partition_archive (
+    parent VARCHAR(63) PRIMARY KEY,
+    before BIGINT NOT NULL
 );
 
+-- ============================================================================
+-- REPORTING AGGREGATES (maintained incrementally by the importer)
+-- ============================================================================
+
+-- Documents per store, local day and document type
+CREATE TABLE daily_sales (
+    _client VARCHAR(24) NOT NULL,
+    store VARCHAR(24) NOT NULL DEFAULT '',
+    day DATE NOT NULL,
+    type VARCHAR(50) NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    sum DECIMAL(14,2) NOT NULL DEFAULT 0,
+    paid DECIMAL(14,2) NOT NULL DEFAULT 0,
+    discount DECIMAL(14,2) NOT NULL DEFAULT 0,
+    tax DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (_client, store, day, type)
+);
+
+-- Document line items per product, store, local day and document type
+CREATE TABLE daily_product_sales (
+    _client VARCHAR(24) NOT NULL,
+    product VARCHAR(24) NOT NULL,
+    store VARCHAR(24) NOT NULL DEFAULT '',
+    day DATE NOT NULL,
+    type VARCHAR(50) NOT NULL,
+    qty DECIMAL(14,3) NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    cost DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (_client, product, store, day, type)
+);
+
+-- Stock ledger rebuilt from document history by rebuild_stock_ledger.py.
+-- seq orders movements that share a date. Stock of a product in a store
+-- at time T:
+--   SELECT balance FROM stock_ledger
+--   WHERE _client = $1 AND product = $2 AND store = $3 AND date <= T
+--   ORDER BY date DESC, seq DESC LIMIT 1;
+CREATE TABLE stock_ledger (
+    _client VARCHAR(24) NOT NULL,
+    product VARCHAR(24) NOT NULL,
+    store VARCHAR(24) NOT NULL,
+    date BIGINT NOT NULL,
+    seq BIGINT NOT NULL DEFAULT 0,
+    _document VARCHAR(24) NOT NULL,
+    type VARCHAR(50),
+    delta DECIMAL(12,3) NOT NULL,
+    balance DECIMAL(12,3) NOT NULL
+);
+
+-- Progress of sync_daemon.py: start (epoch seconds) of the last cycle that
+-- committed, so a restarted daemon catches up on the whole outage
+CREATE TABLE sync_state (
+    _client VARCHAR(24) PRIMARY KEY,
+    last_success BIGINT NOT NULL
+);
+
+-- ============================================================================
+-- PARTITIONS
+-- ============================================================================
+
+-- Create (if missing) the monthly partition of parent that covers ts
+CREATE OR REPLACE FUNCTION ensure_month_partition(parent TEXT, ts BIGINT)
+RETURNS TEXT AS $$
+DECLARE
+    month_start TIMESTAMP;
+    lower_bound BIGINT;
+    upper_bound BIGINT;
+    partition_name TEXT;
+    default_name TEXT := parent || '_default';
+BEGIN
+    IF ts IS NULL OR ts <= 0 THEN
+        RETURN default_name;
+    END IF;
+
+    month_start := date_trunc('month', to_timestamp(ts) AT TIME ZONE 'UTC');
+    lower_bound := EXTRACT(EPOCH FROM month_start)::BIGINT;
+    upper_bound := EXTRACT(EPOCH FROM month_start + INTERVAL '1 month')::BIGINT;
+    partition_name := parent || '_' || to_char(month_start, 'YYYY_MM');
+
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN partition_name;
+    END IF;
+
+    -- Rows for this month may already sit in the default partition
+    EXECUTE format('CREATE TEMP TABLE _partition_moved ON COMMIT DROP AS
+                    SELECT * FROM %I WHERE date >= %s AND date < %s',
+                   default_name, lower_bound, upper_bound);
+    EXECUTE format('DELETE FROM %I WHERE date >= %s AND date < %s',
+                   default_name, lower_bound, upper_bound);
+    EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%s) TO (%s)',
+                   partition_name, parent, lower_bound, upper_bound);
+    EXECUTE format('INSERT INTO %I SELECT * FROM _partition_moved', parent);
+    DROP TABLE _partition_moved;
+
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
 -- ============================================================================
 -- INDEXES
 -- ============================================================================
@@ -350,6 +482,9 @@ CREATE INDEX idx_products_barcode ON products(barcode);
 CREATE INDEX idx_products_name ON products(name);
 CREATE INDEX idx_products_deleted ON products(deleted);
 CREATE INDEX idx_products_categories ON products USING GIN(categories);
+CREATE INDEX idx_products_name_trgm ON products USING GIN(name gin_trgm_ops);
+CREATE INDEX idx_products_sku_trgm ON products USING GIN(sku gin_trgm_ops);
+CREATE INDEX idx_products_barcode_trgm ON products USING GIN(barcode gin_trgm_ops);
 
 -- Customers
 CREATE INDEX idx_customers_client ON customers(_client);
@@ -368,12 +503,23 @@ CREATE INDEX idx_documents_date ON documents(date);
 CREATE INDEX idx_documents_store ON documents(store);
 CREATE INDEX idx_documents_deleted ON documents(deleted);
 CREATE INDEX idx_documents_number ON documents(number);
+CREATE INDEX idx_documents_search_trgm ON documents USING GIN(search_text gin_trgm_ops);
+-- Keyset paging by (date, _id) in search.ts
+CREATE INDEX idx_documents_keyset ON documents(_client, date DESC, _id DESC);
 
 -- Money Movements
 CREATE INDEX idx_money_movements_client ON money_movements(_client);
 CREATE INDEX idx_money_movements_type ON money_movements(type);
 CREATE INDEX idx_money_movements_date ON money_movements(date);
 CREATE INDEX idx_money_movements_deleted ON money_movements(deleted);
+CREATE INDEX idx_money_movements_keyset ON money_movements(_client, date DESC, _id DESC);
+
+-- Reporting aggregates
+CREATE INDEX idx_daily_sales_day ON daily_sales(_client, day);
+CREATE INDEX idx_daily_product_sales_day ON daily_product_sales(_client, day);
+
+-- Stock ledger
+CREATE INDEX idx_stock_ledger_position ON stock_ledger(_client, product, store, date DESC, seq DESC);
 
 -- Shifts
 CREATE INDEX idx_shifts_client ON shifts(_client);
@@ -407,3 +553,9 @@ COMMENT ON TABLE suppliers IS 'Supplier/vendor records';
 COMMENT ON TABLE documents IS 'All transactions (sales, purchases, movements, returns)';
 COMMENT ON TABLE money_movements IS 'Financial transaction records';
 COMMENT ON TABLE shifts IS 'Cashier shift records';
+COMMENT ON TABLE daily_sales IS 'Daily document totals per store and type, refreshed by the importer';
+COMMENT ON TABLE daily_product_sales IS 'Daily product quantities, revenue and cost, refreshed by the importer';
+COMMENT ON TABLE partition_archive IS 'Archive cutoff of each partitioned table, set when old months are detached';
+COMMENT ON TABLE sync_state IS 'Last successful cycle of the continuous sync, per company';
+COMMENT ON TABLE stock_ledger IS 'Per-store stock movements with running on-hand, rebuilt from documents';
+COMMENT ON COLUMN documents.search_text IS 'Lower-cased number, product names/SKUs/barcodes and customer name for trigram search';
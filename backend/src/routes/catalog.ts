@@ -1,9 +1,42 @@
 import { Router, Request, Response } from 'express';
+import fs from 'fs';
+import path from 'path';
+import zlib from 'zlib';
 import pool from '../config/database';
 import { getCompanyId } from '../middleware/auth';
 
 const router = Router();
 
+// Offline POS catalog written by export_pos_catalog.py
+const POS_CATALOG_FILE = process.env.POS_CATALOG_DIR
+  ? path.join(process.env.POS_CATALOG_DIR, 'catalog.json.gz')
+  : null;
+
+interface PosCatalog {
+  company: string;
+  version: number;
+  deltas_from: number;
+  fields: string[];
+  products: unknown[][];
+  removed: Record<string, number>;
+}
+
+// Parsed snapshot, reloaded when the file changes
+let posCatalogCache: { mtimeMs: number; gzipped: Buffer; catalog: PosCatalog } | null = null;
+
+function loadPosCatalog() {
+  if (!POS_CATALOG_FILE || !fs.existsSync(POS_CATALOG_FILE)) {
+    return null;
+  }
+  const { mtimeMs } = fs.statSync(POS_CATALOG_FILE);
+  if (!posCatalogCache || posCatalogCache.mtimeMs !== mtimeMs) {
+    const gzipped = fs.readFileSync(POS_CATALOG_FILE);
+    const catalog = JSON.parse(zlib.gunzipSync(gzipped).toString('utf8')) as PosCatalog;
+    posCatalogCache = { mtimeMs, gzipped, catalog };
+  }
+  return posCatalogCache;
+}
+
 /**
  * GET /data/:companyId/catalog
  * Get products with pagination
@@ -89,6 +122,56 @@ router.get('/:companyId/catalog/categories', async (req: Request, res: Response)
   }
 });
 
+/**
+ * GET /data/:companyId/catalog/pos?since=<version>
+ * Offline catalog snapshot for registers. Without `since` (or when it is
+ * older than the kept tombstones) the whole gzipped snapshot is sent as
+ * written; otherwise only rows changed after `since` plus removed ids,
+ * which the register merges into its cached copy and lookup maps.
+ */
+router.get('/:companyId/catalog/pos', async (req: Request, res: Response) => {
+  try {
+    const { companyId } = req.params;
+
+    const userCompanyId = getCompanyId(req);
+    if (companyId !== userCompanyId) {
+      return res.status(403).json({ status: false, error: 'Access denied' });
+    }
+
+    const cached = loadPosCatalog();
+    if (!cached || cached.catalog.company !== companyId) {
+      return res.status(404).json({ status: false, error: 'POS catalog not available' });
+    }
+    const { catalog } = cached;
+
+    const since = parseInt(req.query.since as string);
+    if (isNaN(since) || since < catalog.deltas_from) {
+      res.set({ 'Content-Type': 'application/json', 'Content-Encoding': 'gzip' });
+      return res.send(cached.gzipped);
+    }
+
+    const versionIndex = catalog.fields.indexOf('v');
+    const products = catalog.products.filter(row => (row[versionIndex] as number) > since);
+    const removed = Object.keys(catalog.removed).filter(id => catalog.removed[id] > since);
+
+    res.json({
+      status: true,
+      error: null,
+      version: catalog.version,
+      since,
+      fields: catalog.fields,
+      products,
+      removed,
+    });
+  } catch (error) {
+    console.error('POS catalog error:', error);
+    res.status(500).json({
+      status: false,
+      error: 'Failed to load POS catalog',
+    });
+  }
+});
+
 /**
  * POST /data/:companyId/catalog
  * Create new product
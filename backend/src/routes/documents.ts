@@ -149,9 +149,10 @@ router.post('/:companyId/docs', async (req: Request, res: Response) => {
       INSERT INTO documents (
         _id, _client, _user, _app, type, number, status, date, store,
         "from", "to", sum, paid, discount_percent, discount_sum,
-        products, payments, notes, comment, created, updated, created_ms
+        products, payments, notes, comment, created, updated, created_ms,
+        search_text
       )
-      VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17, $18, $19, $20, $21, $22)
+      VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17, $18, $19, $20, $21, $22, $23)
       RETURNING *
     `, [
       _id, companyId, '58c872aa3ce7d5fc688b49bc', 'WAPP',
@@ -160,7 +161,8 @@ router.post('/:companyId/docs', async (req: Request, res: Response) => {
       to ? JSON.stringify(to) : null,
       sum, paid, discount_percent || 0, discount_sum || 0,
       JSON.stringify(products || []), JSON.stringify(payments || []),
-      notes, comment, now, now, now * 1000
+      notes, comment, now, now, now * 1000,
+      buildSearchText(number, products, to)
     ]);
 
     // Update product stock if this is a sale or purchase
@@ -199,6 +201,23 @@ router.post('/:companyId/docs', async (req: Request, res: Response) => {
   }
 });
 
+/**
+ * Searchable text of a document, built the same way as the importer's
+ * document_search_text(): number, product names/SKUs/barcodes, customer name
+ */
+function buildSearchText(number: number, products: any[], to: any): string {
+  const parts: string[] = [String(number)];
+  for (const item of Array.isArray(products) ? products : []) {
+    const embedded = item?.product || {};
+    parts.push(embedded.name || item?.name, embedded.sku || item?.sku, embedded.barcode || item?.barcode);
+  }
+  if (to && to.type === 'clients') {
+    parts.push(to.name);
+  }
+  const unique = Array.from(new Set(parts.filter(Boolean).map(String)));
+  return unique.join(' ').toLowerCase().split(/\s+/).filter(Boolean).join(' ');
+}
+
 function generateObjectId(): string {
   const timestamp = Math.floor(Date.now() / 1000).toString(16).padStart(8, '0');
   const machineId = Math.floor(Math.random() * 16777215).toString(16).padStart(6, '0');
@@ -196,15 +196,22 @@ async function handleSearchRequest(
         
         if (body.type) { params.push(body.type); query += ` AND type = $${params.length}`; }
         if (body.store) { params.push(body.store); query += ` AND store = $${params.length}`; }
+        if (body.from_date) { params.push(body.from_date); query += ` AND date >= $${params.length}`; }
+        if (body.to_date) { params.push(body.to_date); query += ` AND date <= $${params.length}`; }
         
         const countQuery = query.replace('SELECT *', 'SELECT COUNT(*) as total');
-        const countResult = await pool.query(countQuery, params);
+        const total = body.after_id ? null : parseInt((await pool.query(countQuery, params)).rows[0].total);
         
-        query += ` ORDER BY date DESC NULLS LAST OFFSET $${params.length + 1} LIMIT $${params.length + 2}`;
-        params.push(offset, limit);
+        // Keyset cursor from the previous page's last row
+        if (body.after_id) {
+          params.push(parseInt(body.after_date) || 0, body.after_id);
+          query += ` AND (date, _id) < ($${params.length - 1}, $${params.length})`;
+        }
+        query += ` ORDER BY date DESC, _id DESC OFFSET $${params.length + 1} LIMIT $${params.length + 2}`;
+        params.push(body.after_id ? 0 : offset, limit);
         
         const result = await pool.query(query, params);
-        return res.json({ status: true, error: null, objects: result.rows.length, total: parseInt(countResult.rows[0].total), data: result.rows });
+        return res.json({ status: true, error: null, objects: result.rows.length, total, data: result.rows });
       }
       
       case 'money': {
@@ -213,15 +220,22 @@ async function handleSearchRequest(
         
         if (body.type) { params.push(body.type); query += ` AND type = $${params.length}`; }
         if (body.account) { params.push(body.account); query += ` AND account = $${params.length}`; }
+        if (body.from_date) { params.push(body.from_date); query += ` AND date >= $${params.length}`; }
+        if (body.to_date) { params.push(body.to_date); query += ` AND date <= $${params.length}`; }
         
         const countQuery = query.replace('SELECT *', 'SELECT COUNT(*) as total');
-        const countResult = await pool.query(countQuery, params);
+        const total = body.after_id ? null : parseInt((await pool.query(countQuery, params)).rows[0].total);
         
-        query += ` ORDER BY date DESC NULLS LAST OFFSET $${params.length + 1} LIMIT $${params.length + 2}`;
-        params.push(offset, limit);
+        // Keyset cursor from the previous page's last row
+        if (body.after_id) {
+          params.push(parseInt(body.after_date) || 0, body.after_id);
+          query += ` AND (date, _id) < ($${params.length - 1}, $${params.length})`;
+        }
+        query += ` ORDER BY date DESC, _id DESC OFFSET $${params.length + 1} LIMIT $${params.length + 2}`;
+        params.push(body.after_id ? 0 : offset, limit);
         
         const result = await pool.query(query, params);
-        return res.json({ status: true, error: null, objects: result.rows.length, total: parseInt(countResult.rows[0].total), data: result.rows });
+        return res.json({ status: true, error: null, objects: result.rows.length, total, data: result.rows });
       }
       
       case 'catalog': {
@@ -4,16 +4,24 @@ import { getCompanyId } from '../middleware/auth';
 
 const router = Router();
 
+/**
+ * Lower-case and collapse whitespace, matching how search_text is built
+ */
+function normalizeSearch(text: string): string {
+  return text.toLowerCase().split(/\s+/).filter(Boolean).join(' ');
+}
+
 /**
  * POST /search/docs/:companyId/:offset/:limit
- * Search documents with filters
+ * Search documents with filters. Pass after_date/after_id (next_cursor of
+ * the previous page) to page by keyset instead of offset
  */
 router.post('/docs/:companyId/:offset/:limit', async (req: Request, res: Response) => {
   try {
     const companyId = req.params.companyId as string;
     const offset = req.params.offset as string;
     const limit = req.params.limit as string;
-    const { type, types, store, stores, from_date, to_date, from, to, search } = req.body;
+    const { type, types, store, stores, from_date, to_date, from, to, search, after_date, after_id } = req.body;
 
     const userCompanyId = getCompanyId(req);
     if (companyId !== userCompanyId) {
@@ -58,21 +66,34 @@ router.post('/docs/:companyId/:offset/:limit', async (req: Request, res: Respons
       query += ` AND date <= $${params.length}`;
     }
 
+    // search_text holds the normalised number, product names/codes and
+    // customer name, backed by a trigram index (see schema.sql)
     if (search) {
-      params.push(`%${search}%`);
-      query += ` AND (number::text LIKE $${params.length} OR products::text ILIKE $${params.length})`;
+      params.push(`%${normalizeSearch(String(search))}%`);
+      query += ` AND search_text LIKE $${params.length}`;
     }
 
-    // Get total count
+    // Get total count (cursor pages skip it, the first page already had it)
     const countQuery = query.replace('SELECT *', 'SELECT COUNT(*) as total');
-    const countResult = await pool.query(countQuery, params);
-    const total = parseInt(countResult.rows[0].total);
+    const total = after_id ? null : parseInt((await pool.query(countQuery, params)).rows[0].total);
+
+    // Keyset cursor: continue strictly after the last (date, _id) of the
+    // previous page. Added after the count so total stays the full result
+    if (after_id) {
+      params.push(parseInt(after_date) || 0, after_id);
+      query += ` AND (date, _id) < ($${params.length - 1}, $${params.length})`;
+    }
 
     // Add pagination
-    query += ` ORDER BY date DESC NULLS LAST OFFSET $${params.length + 1} LIMIT $${params.length + 2}`;
-    params.push(parseInt(offset) || 0, parseInt(limit) || 1000);
+    const pageSize = parseInt(limit) || 1000;
+    query += ` ORDER BY date DESC, _id DESC OFFSET $${params.length + 1} LIMIT $${params.length + 2}`;
+    params.push(after_id ? 0 : parseInt(offset) || 0, pageSize);
 
     const result = await pool.query(query, params);
+    const lastRow = result.rows[result.rows.length - 1];
+    const nextCursor = result.rows.length === pageSize && lastRow
+      ? { after_date: parseInt(lastRow.date) || 0, after_id: lastRow._id }
+      : null;
 
     // Get all product IDs from documents to lookup costs and details
     const productIds = new Set<string>();
@@ -201,6 +222,7 @@ router.post('/docs/:companyId/:offset/:limit', async (req: Request, res: Respons
       error: null,
       objects: result.rows.length,
       total,
+      next_cursor: nextCursor,
       data: mappedData,
     });
   } catch (error) {
@@ -214,14 +236,14 @@ router.post('/docs/:companyId/:offset/:limit', async (req: Request, res: Respons
 
 /**
  * POST /search/money/:companyId/:offset/:limit
- * Search money movements with filters
+ * Search money movements with filters, by offset or after_date/after_id
  */
 router.post('/money/:companyId/:offset/:limit', async (req: Request, res: Response) => {
   try {
     const companyId = req.params.companyId as string;
     const offset = req.params.offset as string;
     const limit = req.params.limit as string;
-    const { type, account, from_date, to_date } = req.body;
+    const { type, account, from_date, to_date, after_date, after_id } = req.body;
 
     const userCompanyId = getCompanyId(req);
     if (companyId !== userCompanyId) {
@@ -251,22 +273,34 @@ router.post('/money/:companyId/:offset/:limit', async (req: Request, res: Respon
       query += ` AND date <= $${params.length}`;
     }
 
-    // Get total count
+    // Get total count (cursor pages skip it, the first page already had it)
     const countQuery = query.replace('SELECT *', 'SELECT COUNT(*) as total');
-    const countResult = await pool.query(countQuery, params);
-    const total = parseInt(countResult.rows[0].total);
+    const total = after_id ? null : parseInt((await pool.query(countQuery, params)).rows[0].total);
+
+    // Keyset cursor: continue strictly after the last (date, _id) of the
+    // previous page. Added after the count so total stays the full result
+    if (after_id) {
+      params.push(parseInt(after_date) || 0, after_id);
+      query += ` AND (date, _id) < ($${params.length - 1}, $${params.length})`;
+    }
 
     // Add pagination
-    query += ` ORDER BY date DESC NULLS LAST OFFSET $${params.length + 1} LIMIT $${params.length + 2}`;
-    params.push(parseInt(offset) || 0, parseInt(limit) || 1000);
+    const pageSize = parseInt(limit) || 1000;
+    query += ` ORDER BY date DESC, _id DESC OFFSET $${params.length + 1} LIMIT $${params.length + 2}`;
+    params.push(after_id ? 0 : parseInt(offset) || 0, pageSize);
 
     const result = await pool.query(query, params);
+    const lastRow = result.rows[result.rows.length - 1];
+    const nextCursor = result.rows.length === pageSize && lastRow
+      ? { after_date: parseInt(lastRow.date) || 0, after_id: lastRow._id }
+      : null;
 
     res.json({
       status: true,
       error: null,
       objects: result.rows.length,
       total,
+      next_cursor: nextCursor,
       data: result.rows,
     });
   } catch (error) {
@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+"""
+Replay the backend's search query shapes against PostgreSQL
+Loads a synthetic (or the extracted) dataset, runs the document, money and
+catalog searches from backend/src/routes/search.ts at varying filters,
+offsets and data sizes, captures EXPLAIN (ANALYZE, BUFFERS) and recommends
+composite indexes for the slow shapes.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import psycopg2
+from datetime import datetime, timedelta
+
+from import_columns import SCHEMA_PATH, normalize_search
+from import_data_to_postgres import DB_CONFIG, COMPANY_ID, import_table, load_json
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+BENCH_DB = os.environ.get('BENCH_DB', 'ainur_pos_bench')
+
+OFFSETS = [0, 1000, 5000, 9000]
+PAGE_LIMIT = 1000
+REPEATS = 3
+
+# Deep pages slower than this many times the first page get flagged
+DEEP_PAGE_RATIO = 3.0
+
+DOC_TYPES = [('sales', 95), ('movements', 3), ('return_sales', 1),
+             ('purchases', 1), ('changes', 0.4), ('return_purchases', 0.1)]
+STORE_COUNT = 9
+ACCOUNT_COUNT = 22
+PRODUCT_COUNT = 3000
+
+# ============================================================================
+# SYNTHETIC DATA
+# ============================================================================
+
+def object_id(rng):
+    """Random 24-char hex id shaped like a Mongo ObjectId"""
+    return '%024x' % rng.getrandbits(96)
+
+
+def synthetic_dataset(size, seed=42):
+    """Build products, documents and money movements resembling the real tenant"""
+    rng = random.Random(seed)
+    stores = [object_id(rng) for _ in range(STORE_COUNT)]
+    accounts = [object_id(rng) for _ in range(ACCOUNT_COUNT)]
+    types, weights = zip(*DOC_TYPES)
+
+    products = []
+    for i in range(PRODUCT_COUNT):
+        products.append({
+            '_id': object_id(rng),
+            'name': f"Іграшка {rng.choice(['Лего', 'Пазл', 'Лялька', 'Машинка', 'М’яч'])} {i}",
+            'sku': f"SKU{i:06d}",
+            'barcode': f"482{rng.randrange(10**9, 10**10)}",
+            'price': round(rng.uniform(50, 3000), 2),
+            'cost': round(rng.uniform(20, 1500), 2),
+            'total_stock': rng.randrange(0, 50),
+            'deleted': rng.random() < 0.02,
+        })
+
+    now = int(datetime.now().timestamp())
+    span = 2 * 365 * 86400
+    documents, movements = [], []
+    for number in range(1, size + 1):
+        date = now - rng.randrange(span)
+        items = rng.sample(products, rng.randint(1, 5))
+        doc_type = rng.choices(types, weights)[0]
+        store = rng.choice(stores)
+        doc_sum = round(sum(p['price'] for p in items), 2)
+        doc = {
+            '_id': object_id(rng),
+            '_client': COMPANY_ID,
+            'type': doc_type,
+            'number': number,
+            'date': date,
+            'store': store,
+            'from': {'_id': store, 'type': 'stores', 'name': f"Магазин {stores.index(store)}"},
+            'to': {'type': 'clients', 'name': 'Роздрібний покупець'},
+            'sum': doc_sum,
+            'paid': doc_sum,
+            'products': [{'_id': p['_id'], 'qty': rng.randint(1, 3), 'price': p['price'],
+                          'product': {'name': p['name'], 'sku': p['sku'],
+                                      'barcode': p['barcode']}} for p in items],
+            'created': date,
+            'updated': date,
+        }
+        documents.append(doc)
+        movements.append({
+            '_id': object_id(rng),
+            '_client': COMPANY_ID,
+            '_document': doc['_id'],
+            'type': 'credit' if doc_type == 'sales' else 'debit',
+            'sum': doc_sum,
+            'date': date,
+            'account': rng.choice(accounts),
+            'created': date,
+            'updated': date,
+        })
+
+    return {'products': products, 'documents': documents, 'money_movements': movements,
+            'stores': stores, 'accounts': accounts}
+
+
+def load_dataset(conn, dataset):
+    """Replace the benchmark tables' contents with dataset and analyze them"""
+    cursor = conn.cursor()
+    cursor.execute("TRUNCATE products, documents, money_movements")
+    for table in ['products', 'documents', 'money_movements']:
+        import_table(cursor, table, dataset[table])
+    conn.commit()
+
+    conn.autocommit = True
+    cursor.execute("ANALYZE products, documents, money_movements")
+    conn.autocommit = False
+    cursor.close()
+
+
+def extracted_dataset():
+    """Use the extracted JSON files as the benchmark dataset"""
+    documents = load_json('documents.json')
+    movements = load_json('money_movements.json')
+    return {
+        'products': load_json('products.json'),
+        'documents': documents,
+        'money_movements': movements,
+        'stores': sorted({d['store'] for d in documents if d.get('store')}),
+        'accounts': sorted({m['account'] for m in movements if m.get('account')}),
+    }
+
+# ============================================================================
+# QUERY SHAPES (mirroring backend/src/routes/search.ts)
+# ============================================================================
+
+def docs_query(filters):
+    """SELECT for POST /search/docs with the given body filters"""
+    query = 'SELECT * FROM documents WHERE _client = %s'
+    params = [COMPANY_ID]
+    if filters.get('type'):
+        query += ' AND type = %s'
+        params.append(filters['type'])
+    if filters.get('store'):
+        query += ' AND store = %s'
+        params.append(filters['store'])
+    if filters.get('from_date'):
+        query += ' AND date >= %s'
+        params.append(filters['from_date'])
+    if filters.get('to_date'):
+        query += ' AND date <= %s'
+        params.append(filters['to_date'])
+    if filters.get('search'):
+        query += ' AND search_text LIKE %s'
+        params.append(f"%{normalize_search(filters['search'])}%")
+    return query, params, ' ORDER BY date DESC, _id DESC'
+
+
+def money_query(filters):
+    """SELECT for POST /search/money with the given body filters"""
+    query = 'SELECT * FROM money_movements WHERE _client = %s'
+    params = [COMPANY_ID]
+    if filters.get('type'):
+        query += ' AND type = %s'
+        params.append(filters['type'])
+    if filters.get('account'):
+        query += ' AND account = %s'
+        params.append(filters['account'])
+    if filters.get('from_date'):
+        query += ' AND date >= %s'
+        params.append(filters['from_date'])
+    if filters.get('to_date'):
+        query += ' AND date <= %s'
+        params.append(filters['to_date'])
+    return query, params, ' ORDER BY date DESC, _id DESC'
+
+
+def catalog_query(filters):
+    """SELECT for POST /search/catalog with the given body filters"""
+    query = 'SELECT * FROM products WHERE _client = %s AND deleted = false'
+    params = [COMPANY_ID]
+    if filters.get('search'):
+        query += ' AND (name ILIKE %s OR sku ILIKE %s OR barcode ILIKE %s)'
+        params += [f"%{filters['search']}%"] * 3
+    if filters.get('in_stock'):
+        query += ' AND total_stock > 0'
+    return query, params, ' ORDER BY name'
+
+
+SHAPES = {'docs': docs_query, 'money': money_query, 'catalog': catalog_query}
+
+# Equality filters and sort column per shape, used to derive index candidates
+SHAPE_INDEX = {
+    'docs': ('documents', ['type', 'store'], 'date DESC, _id DESC'),
+    'money': ('money_movements', ['type', 'account'], 'date DESC, _id DESC'),
+    'catalog': ('products', [], 'name'),
+}
+
+
+def scenarios(dataset):
+    """Filter combinations to replay for each shape"""
+    now = int(datetime.now().timestamp())
+    month_ago = int((datetime.now() - timedelta(days=30)).timestamp())
+    store = dataset['stores'][0] if dataset['stores'] else None
+    account = dataset['accounts'][0] if dataset['accounts'] else None
+    return [
+        ('docs', 'all', {}),
+        ('docs', 'type=sales', {'type': 'sales'}),
+        ('docs', 'store', {'store': store}),
+        ('docs', 'last 30 days', {'from_date': month_ago, 'to_date': now}),
+        ('docs', 'type+store+30d', {'type': 'sales', 'store': store,
+                                    'from_date': month_ago, 'to_date': now}),
+        ('docs', 'search', {'search': 'Лего'}),
+        ('money', 'all', {}),
+        ('money', 'account', {'account': account}),
+        ('money', 'last 30 days', {'from_date': month_ago, 'to_date': now}),
+        ('catalog', 'all', {}),
+        ('catalog', 'search', {'search': 'лялька'}),
+    ]
+
+# ============================================================================
+# EXPLAIN CAPTURE
+# ============================================================================
+
+def walk(plan):
+    """Yield every node of an EXPLAIN JSON plan tree"""
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from walk(child)
+
+
+def explain(cursor, sql, params):
+    """Run EXPLAIN (ANALYZE, BUFFERS) and summarise the plan"""
+    cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", params)
+    result = cursor.fetchone()[0]
+    if isinstance(result, str):
+        result = json.loads(result)
+    root = result[0]
+    nodes = list(walk(root['Plan']))
+    return {
+        'ms': root['Execution Time'],
+        'hit': root['Plan'].get('Shared Hit Blocks', 0),
+        'read': root['Plan'].get('Shared Read Blocks', 0),
+        'seq_scans': sorted({n['Relation Name'] for n in nodes
+                             if n['Node Type'] == 'Seq Scan'}),
+        'sorted': any(n['Node Type'] in ('Sort', 'Incremental Sort') for n in nodes),
+        'removed': sum(n.get('Rows Removed by Filter', 0) for n in nodes),
+    }
+
+
+def measure(cursor, sql, params):
+    """Median of REPEATS explain runs"""
+    runs = [explain(cursor, sql, params) for _ in range(REPEATS)]
+    best = sorted(runs, key=lambda r: r['ms'])[len(runs) // 2]
+    best['ms'] = statistics.median(r['ms'] for r in runs)
+    return best
+
+
+def replay(cursor, dataset, offsets):
+    """Run every scenario as the count query plus one page per offset"""
+    results = []
+    for shape, label, filters in scenarios(dataset):
+        base, params, order = SHAPES[shape](filters)
+        count_sql = base.replace('SELECT *', 'SELECT COUNT(*) as total', 1)
+        row = {'shape': shape, 'label': label, 'filters': filters,
+               'count': measure(cursor, count_sql, params), 'pages': {}}
+        for offset in offsets:
+            page_sql = f"{base}{order} OFFSET %s LIMIT %s"
+            row['pages'][offset] = measure(cursor, page_sql, params + [offset, PAGE_LIMIT])
+        results.append(row)
+        print_result(row)
+    return results
+
+
+def print_result(row):
+    """One line per scenario: count time plus page times by offset"""
+    pages = '  '.join(f"@{o}:{p['ms']:8.1f}" for o, p in row['pages'].items())
+    flags = []
+    first = next(iter(row['pages'].values()))
+    if first['seq_scans']:
+        flags.append('seq:' + ','.join(first['seq_scans']))
+    if first['sorted']:
+        flags.append('sort')
+    print(f"   {row['shape']:8s} {row['label']:16s} count:{row['count']['ms']:8.1f}  "
+          f"{pages}  {' '.join(flags)}")
+
+# ============================================================================
+# RECOMMENDATIONS
+# ============================================================================
+
+def recommend(results):
+    """Derive composite index / query changes from the captured plans"""
+    indexes = {}
+    notes = []
+    for row in results:
+        table, equality, sort = SHAPE_INDEX[row['shape']]
+        pages = list(row['pages'].values())
+        first, last = pages[0], pages[-1]
+        scanned = first['seq_scans'] or first['sorted'] or row['count']['seq_scans']
+
+        if row['filters'].get('search'):
+            if first['seq_scans']:
+                notes.append(f"{row['shape']} {row['label']}: substring search is not using "
+                             f"its pg_trgm GIN index (run the importer to create it)")
+        elif scanned:
+            columns = ['_client'] + [c for c in equality if row['filters'].get(c)] + [sort]
+            name = 'idx_{}_{}'.format(table, '_'.join(c.split()[0].lstrip('_') for c in columns))
+            where = ' WHERE deleted = false' if table == 'products' else ''
+            indexes[name] = (f"CREATE INDEX {name} ON {table} ({', '.join(columns)}){where};",
+                             f"{row['shape']} {row['label']}")
+
+        if len(pages) > 1 and first['ms'] > 0 and last['ms'] / first['ms'] >= DEEP_PAGE_RATIO:
+            notes.append(f"{row['shape']} {row['label']}: deepest page is "
+                         f"{last['ms'] / first['ms']:.1f}x slower than the first; "
+                         f"OFFSET pagination should move to keyset (date, _id)")
+
+        if row['count']['ms'] > first['ms']:
+            notes.append(f"{row['shape']} {row['label']}: COUNT(*) ({row['count']['ms']:.1f} ms) "
+                         f"costs more than the page itself")
+    return indexes, notes
+
+
+def try_indexes(conn, dataset, offsets, indexes):
+    """Re-run the workload with the recommended indexes, then roll them back"""
+    cursor = conn.cursor()
+    try:
+        for statement, _ in indexes.values():
+            cursor.execute(statement)
+        cursor.execute("ANALYZE products, documents, money_movements")
+        return replay(cursor, dataset, offsets)
+    finally:
+        conn.rollback()
+        cursor.close()
+
+
+def compare(before, after):
+    """Print per-scenario speedups of the first and deepest page"""
+    for b, a in zip(before, after):
+        pages_b, pages_a = list(b['pages'].values()), list(a['pages'].values())
+        first = pages_b[0]['ms'] / max(pages_a[0]['ms'], 0.001)
+        deep = pages_b[-1]['ms'] / max(pages_a[-1]['ms'], 0.001)
+        count = b['count']['ms'] / max(a['count']['ms'], 0.001)
+        print(f"   {b['shape']:8s} {b['label']:16s} count x{count:6.1f}  "
+              f"first page x{first:6.1f}  deepest page x{deep:6.1f}")
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def ensure_schema(conn):
+    """Create the tables in the benchmark database if they are missing"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT to_regclass('public.documents') IS NULL")
+    if cursor.fetchone()[0]:
+        with open(SCHEMA_PATH, 'r') as f:
+            cursor.execute(f.read())
+        conn.commit()
+    cursor.close()
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Replay search.ts query shapes with EXPLAIN ANALYZE")
+    parser.add_argument('--dbname', default=BENCH_DB,
+                        help=f"database to benchmark (default: {BENCH_DB})")
+    parser.add_argument('--dataset', choices=['synthetic', 'extracted', 'existing'],
+                        default='synthetic',
+                        help="load synthetic data, the extracted JSON files, or use the data as is")
+    parser.add_argument('--sizes', default='10000,100000',
+                        help="comma-separated document counts for the synthetic dataset")
+    parser.add_argument('--offsets', default=','.join(map(str, OFFSETS)),
+                        help="comma-separated page offsets to replay")
+    parser.add_argument('--try-indexes', action='store_true',
+                        help="re-run with the recommended indexes (rolled back afterwards)")
+    parser.add_argument('--json', metavar='FILE', help="write the raw results to FILE")
+    return parser.parse_args()
+
+
+def main():
+    """Run the benchmark for every requested data size"""
+    args = parse_args()
+    offsets = [int(o) for o in args.offsets.split(',')]
+
+    if args.dataset != 'existing' and args.dbname == DB_CONFIG['dbname']:
+        print(f"❌ Refusing to load benchmark data into the main database '{args.dbname}'")
+        print("   Use --dataset existing to replay against it read-only.")
+        return
+
+    print("=" * 80)
+    print("🚀 SEARCH QUERY WORKLOAD REPLAY")
+    print("=" * 80)
+    print(f"Started: {datetime.now()}")
+    print(f"Database: {args.dbname} @ {DB_CONFIG['host']}")
+    print("=" * 80)
+
+    conn = psycopg2.connect(**{**DB_CONFIG, 'dbname': args.dbname})
+    conn.autocommit = False
+    report = []
+
+    try:
+        if args.dataset == 'synthetic':
+            runs = [(size, synthetic_dataset(size)) for size in map(int, args.sizes.split(','))]
+        elif args.dataset == 'extracted':
+            runs = [('extracted', extracted_dataset())]
+        else:
+            runs = [('existing', {'stores': [], 'accounts': []})]
+            cursor = conn.cursor()
+            cursor.execute("SELECT DISTINCT store FROM documents WHERE store IS NOT NULL LIMIT 1")
+            runs[0][1]['stores'] = [r[0] for r in cursor.fetchall()]
+            cursor.execute("SELECT DISTINCT account FROM money_movements WHERE account IS NOT NULL LIMIT 1")
+            runs[0][1]['accounts'] = [r[0] for r in cursor.fetchall()]
+            conn.rollback()
+
+        for size, dataset in runs:
+            if args.dataset != 'existing':
+                ensure_schema(conn)
+                print(f"\n📥 Loading {size} dataset...")
+                load_dataset(conn, dataset)
+
+            print(f"\n⏱️  Replaying query shapes ({size}, ms, median of {REPEATS})...")
+            cursor = conn.cursor()
+            results = replay(cursor, dataset, offsets)
+            conn.rollback()
+            cursor.close()
+
+            indexes, notes = recommend(results)
+            print("\n💡 Recommendations:")
+            for statement, reason in indexes.values():
+                print(f"   {statement}   -- {reason}")
+            for note in dict.fromkeys(notes):
+                print(f"   - {note}")
+
+            entry = {'size': size, 'results': results,
+                     'indexes': [s for s, _ in indexes.values()], 'notes': notes}
+            if args.try_indexes and indexes:
+                print("\n🧪 Replaying with recommended indexes...")
+                entry['with_indexes'] = try_indexes(conn, dataset, offsets, indexes)
+                print("\n📈 Speedup with recommended indexes:")
+                compare(results, entry['with_indexes'])
+            report.append(entry)
+    finally:
+        conn.close()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"\n📁 Results saved to: {args.json}")
+
+    print("\n" + "=" * 80)
+    print("✅ BENCHMARK COMPLETE!")
+    print(f"🕐 Finished: {datetime.now()}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Compact ObjectId handling for large extractions
+Ainur ids are 24-char hex ObjectIds. As Python strings each costs ~75 bytes
+plus its set/dict slot; as raw bytes it is 12. ObjectIdSet keeps seen ids in
+one open-addressing bytearray table, and intern_refs makes every record that
+references the same user, company or store share a single string.
+"""
+
+import sys
+from hashlib import blake2b
+
+ID_BYTES = 12
+
+# Keys whose values point at another entity and repeat across many records
+REF_KEYS = frozenset([
+    '_user', '_client', '_store', '_target', '_document', '_shift', '_register',
+    'store', 'to_store', 'account', 'customer', 'source', 'register',
+])
+
+
+def compact_id(value) -> bytes:
+    """12-byte key for an id: the raw ObjectId, or a digest for anything else"""
+    if isinstance(value, str) and len(value) == 24:
+        try:
+            return bytes.fromhex(value)
+        except ValueError:
+            pass
+    return blake2b(str(value).encode(), digest_size=ID_BYTES).digest()
+
+
+def intern_refs(obj: dict) -> dict:
+    """json object_hook: share one string per distinct reference id
+
+    Use as response.json(object_hook=intern_refs) or
+    json.load(f, object_hook=intern_refs).
+    """
+    for key in REF_KEYS.intersection(obj):
+        value = obj[key]
+        if type(value) is str:
+            obj[key] = sys.intern(value)
+    return obj
+
+
+class ObjectIdSet:
+    """Set of ids stored as 12-byte keys in an open-addressing table
+
+    Between 22 and 45 bytes per id depending on how full the table is,
+    against well over 100 for a set of strings. Only add and membership
+    are supported.
+    """
+
+    LOAD = 0.6
+
+    def __init__(self, capacity: int = 1024):
+        slots = 16
+        while slots * self.LOAD < capacity:
+            slots *= 2
+        self._allocate(slots)
+
+    def _allocate(self, slots: int):
+        self._slots = slots
+        self._mask = slots - 1
+        self._keys = bytearray(slots * ID_BYTES)
+        self._used = bytearray(slots)
+        self._limit = int(slots * self.LOAD)
+        self._count = 0
+
+    def _find(self, key: bytes):
+        """(slot, found) for key using linear probing"""
+        keys, used, mask = self._keys, self._used, self._mask
+        slot = hash(key) & mask
+        while used[slot]:
+            start = slot * ID_BYTES
+            if keys[start:start + ID_BYTES] == key:
+                return slot, True
+            slot = (slot + 1) & mask
+        return slot, False
+
+    def _grow(self):
+        keys, used = self._keys, self._used
+        self._allocate(self._slots * 2)
+        for slot in range(len(used)):
+            if used[slot]:
+                start = slot * ID_BYTES
+                self._insert(bytes(keys[start:start + ID_BYTES]))
+
+    def _insert(self, key: bytes) -> bool:
+        slot, found = self._find(key)
+        if found:
+            return False
+        start = slot * ID_BYTES
+        self._keys[start:start + ID_BYTES] = key
+        self._used[slot] = 1
+        self._count += 1
+        return True
+
+    def add(self, value) -> bool:
+        """Add an id; True when it was not in the set yet"""
+        if self._count >= self._limit:
+            self._grow()
+        return self._insert(compact_id(value))
+
+    def __contains__(self, value) -> bool:
+        return self._find(compact_id(value))[1]
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the table"""
+        return len(self._keys) + len(self._used)
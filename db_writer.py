@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Pipelined staging writer for the importer
+Fills a table's staging table through a psycopg 3 connection pool, with
+every connection in pipeline mode: each batch is one INSERT of a JSON array
+(jsonb_populate_recordset), and several batches are sent before waiting for
+any result. Round trips to a remote database then overlap instead of adding
+up. The hash-guarded upsert out of the staging table stays in
+import_data_to_postgres.py.
+
+Needs psycopg 3 and psycopg_pool (pip install "psycopg[binary]" psycopg_pool);
+the importer only loads this module for --writer pipeline.
+"""
+
+import os
+import queue
+import threading
+import uuid
+
+from psycopg_pool import ConnectionPool
+
+# Connections filling a staging table at once
+DB_CONNECTIONS = int(os.environ.get('IMPORT_DB_CONNECTIONS', 4))
+
+# Rows per INSERT statement
+DB_BATCH_ROWS = int(os.environ.get('IMPORT_DB_BATCH', 2000))
+
+# Statements sent on a connection before waiting for their results
+DB_IN_FLIGHT = int(os.environ.get('IMPORT_DB_IN_FLIGHT', 4))
+
+
+class PipelinedWriter:
+    """Pool of pipelined connections that load JSON batches into staging tables"""
+
+    def __init__(self, db_config, connections=DB_CONNECTIONS, batch_rows=DB_BATCH_ROWS,
+                 in_flight=DB_IN_FLIGHT):
+        self.connections = max(1, connections)
+        self.batch_rows = max(1, batch_rows)
+        self.in_flight = max(1, in_flight)
+        self.pool = ConnectionPool('', kwargs=dict(db_config), min_size=self.connections,
+                                   max_size=self.connections, open=True)
+        # Staging tables are named per writer so concurrent imports never share one
+        self.run = uuid.uuid4().hex[:12]
+        self.stages = []
+
+    def drop_stages(self):
+        """Drop the staging tables this writer created that still exist
+
+        The importer drops a staging table inside its own transaction, so a
+        failed or rolled-back import would otherwise leave it behind.
+        """
+        if not self.stages:
+            return
+        with self.pool.connection() as conn:
+            for stage in self.stages:
+                conn.execute(f"DROP TABLE IF EXISTS {stage}")
+        self.stages.clear()
+
+    def close(self):
+        try:
+            self.drop_stages()
+        finally:
+            self.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def stage(self, spec, batches):
+        """Load JSON array batches into a fresh staging table for spec
+
+        The staging table is a committed UNLOGGED table, so the importer's
+        own connection can upsert from it and drop it in its transaction;
+        close() drops whatever is left. Returns (staging table, rows staged).
+        """
+        stage = f"_pipeline_stage_{self.run}_{spec.name}"
+        with self.pool.connection() as conn:
+            conn.execute(f"CREATE UNLOGGED TABLE {stage} (LIKE {spec.name} INCLUDING DEFAULTS)")
+        self.stages.append(stage)
+
+        insert = (f"INSERT INTO {stage} ({spec.column_list}) "
+                  f"SELECT {spec.column_list} FROM jsonb_populate_recordset(NULL::{stage}, %s::jsonb)")
+        pending = queue.Queue(maxsize=self.connections * self.in_flight)
+        failed = []
+
+        def work():
+            try:
+                with self.pool.connection() as conn, conn.pipeline() as pipeline, \
+                        conn.cursor() as cursor:
+                    sent = 0
+                    while True:
+                        batch = pending.get()
+                        if batch is None:
+                            break
+                        cursor.execute(insert, (batch,))
+                        sent += 1
+                        if sent % self.in_flight == 0:
+                            pipeline.sync()
+            except Exception as e:
+                failed.append(e)
+                # Keep draining so the producer never blocks on a dead worker
+                while pending.get() is not None:
+                    pass
+
+        workers = [threading.Thread(target=work, daemon=True) for _ in range(self.connections)]
+        for worker in workers:
+            worker.start()
+        try:
+            for batch in batches:
+                if failed:
+                    break
+                if batch:
+                    pending.put(batch)
+        finally:
+            for _ in workers:
+                pending.put(None)
+            for worker in workers:
+                worker.join()
+        if failed:
+            raise failed[0]
+
+        with self.pool.connection() as conn:
+            staged = conn.execute(f"SELECT COUNT(*) FROM {stage}").fetchone()[0]
+        return stage, staged
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Diff two extractions into change sets
+Walks the _id-sorted indexes of the old and new snapshot of each resource in
+one sort-merge pass, comparing content digests, so memory grows with the
+number of changes rather than the dataset. For every table it writes
+<table>.upserts.snap (added and changed records, read from the new
+snapshot) and <table>.deleted.txt, which
+`import_data_to_postgres.py --apply-changes DIR` applies directly.
+
+Usage:
+    python diff_snapshots.py OLD_DIR NEW_DIR --out CHANGES_DIR
+"""
+
+import argparse
+import json
+import os
+from datetime import datetime
+
+from snapshot_store import SnapshotReader, SnapshotWriter
+
+# Resources with snapshots, in the importer's load order
+DIFF_TABLES = ['stores', 'accounts', 'money_sources', 'products', 'customers',
+               'suppliers', 'documents', 'money_movements']
+
+MANIFEST = '_changes.json'
+
+
+def last_entries(snapshot):
+    """Yield (position, entry) for the last entry of every run of equal _ids"""
+    count = len(snapshot) if snapshot else 0
+    for position in range(count):
+        entry = snapshot.entry_at(position)
+        if position + 1 == count or snapshot.key_at(position + 1) != entry[0]:
+            yield position, entry
+
+
+def merge_index(old, new):
+    """Yield (status, _id, new entry position) from two id-sorted indexes
+
+    status is 'added', 'changed' or 'deleted'; unchanged ids are skipped.
+    An _id stored more than once counts once, by its last entry, as
+    SnapshotWriter keeps it.
+    """
+    old_entries, new_entries = last_entries(old), last_entries(new)
+    _, old_entry = next(old_entries, (None, None))
+    j, new_entry = next(new_entries, (None, None))
+
+    while old_entry or new_entry:
+        if new_entry and (old_entry is None or new_entry[0] < old_entry[0]):
+            yield 'added', new_entry[0], j
+            j, new_entry = next(new_entries, (None, None))
+        elif old_entry and (new_entry is None or old_entry[0] < new_entry[0]):
+            yield 'deleted', old_entry[0], None
+            _, old_entry = next(old_entries, (None, None))
+        else:
+            if old_entry[4] != new_entry[4]:
+                yield 'changed', new_entry[0], j
+            _, old_entry = next(old_entries, (None, None))
+            j, new_entry = next(new_entries, (None, None))
+
+
+def diff_table(old_path, new_path, out_dir, table):
+    """Write one table's change set; returns added/changed/deleted counts"""
+    counts = {'added': 0, 'changed': 0, 'deleted': 0}
+    old = SnapshotReader(old_path) if old_path and os.path.exists(old_path) else None
+    new = SnapshotReader(new_path)
+    try:
+        with SnapshotWriter(os.path.join(out_dir, f"{table}.upserts.snap")) as upserts, \
+                open(os.path.join(out_dir, f"{table}.deleted.txt"), 'w', encoding='utf-8') as deleted:
+            for status, _id, position in merge_index(old, new):
+                counts[status] += 1
+                if status == 'deleted':
+                    deleted.write(_id + '\n')
+                else:
+                    _, offset, length, _, _ = new.entry_at(position)
+                    upserts.add(new.read(offset, length))
+    finally:
+        new.close()
+        if old:
+            old.close()
+    return counts
+
+
+def read_change_set(changes_dir, table):
+    """(upsert records, deleted ids) of one table from a change set directory"""
+    upserts, deleted = [], []
+    snap = os.path.join(changes_dir, f"{table}.upserts.snap")
+    if os.path.exists(snap):
+        with SnapshotReader(snap) as reader:
+            upserts = list(reader)
+    ids = os.path.join(changes_dir, f"{table}.deleted.txt")
+    if os.path.exists(ids):
+        with open(ids, 'r', encoding='utf-8') as f:
+            deleted = [line.rstrip('\n') for line in f if line.strip()]
+    return upserts, deleted
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Diff two extractions into change sets")
+    parser.add_argument('old_dir', help="directory with the previous extraction's .snap files")
+    parser.add_argument('new_dir', help="directory with the current extraction's .snap files")
+    parser.add_argument('--out', required=True, metavar='DIR', help="where to write the change set")
+    parser.add_argument('--tables', nargs='+', choices=DIFF_TABLES, default=DIFF_TABLES,
+                        help="only diff these tables")
+    return parser.parse_args()
+
+
+def main():
+    """Diff every table that has a new snapshot"""
+    args = parse_args()
+
+    print("=" * 80)
+    print("🔀 SNAPSHOT DIFF")
+    print("=" * 80)
+    print(f"Old: {args.old_dir}")
+    print(f"New: {args.new_dir}")
+    print(f"Changes: {args.out}")
+    print("=" * 80)
+
+    os.makedirs(args.out, exist_ok=True)
+    manifest = {'created': datetime.now().isoformat(), 'old': args.old_dir,
+                'new': args.new_dir, 'tables': {}}
+
+    for table in args.tables:
+        new_path = os.path.join(args.new_dir, f"{table}.snap")
+        if not os.path.exists(new_path):
+            print(f"   ⚠️  {table}: no snapshot in {args.new_dir}, skipped")
+            continue
+        counts = diff_table(os.path.join(args.old_dir, f"{table}.snap"), new_path,
+                            args.out, table)
+        manifest['tables'][table] = counts
+        print(f"   {table:20s}: +{counts['added']:>8,} ~{counts['changed']:>8,} "
+              f"-{counts['deleted']:>8,}")
+
+    with open(os.path.join(args.out, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    print("\n" + "=" * 80)
+    print("✅ DIFF COMPLETE!")
+    print(f"📁 Apply with: python import_data_to_postgres.py --apply-changes {args.out}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Offline catalog snapshot for POS registers
+Writes the active products with their price, per-store stock and store
+prices as one gzipped JSON file with prebuilt barcode/sku/code lookup maps,
+so a register can cache it and resolve a scan locally. Every export that
+changes anything bumps the version; each product row carries the version
+it last changed in and removed products are kept as tombstones, so a
+register holding version N only needs the rows newer than N (served by
+GET /data/:companyId/catalog/pos?since=N).
+
+Usage:
+    python export_pos_catalog.py --out pos_catalog
+"""
+
+import argparse
+import gzip
+import json
+import os
+import psycopg2
+from datetime import datetime
+from decimal import Decimal
+
+from import_data_to_postgres import DB_CONFIG, COMPANY_ID
+
+CATALOG_FILE = 'catalog.json.gz'
+STATE_FILE = 'catalog.state.json'
+FORMAT = 1
+
+# Row layout; 'v' is the version the row last changed in
+FIELDS = ['_id', 'name', 'sku', 'barcode', 'code', 'price', 'stock', 'store_prices',
+          'unit', 'is_weighed', 'free_price', 'tax_free', 'v']
+
+# Columns with a lookup map in the snapshot
+LOOKUP_KEYS = ['barcode', 'sku', 'code']
+
+# Tombstones older than this many versions are dropped; registers further
+# behind reload the whole snapshot
+TOMBSTONE_VERSIONS = int(os.environ.get('POS_TOMBSTONE_VERSIONS', 100))
+
+
+def json_value(value):
+    return float(value) if isinstance(value, Decimal) else str(value)
+
+
+def lookup_key(value):
+    """Normalised scan key: trimmed, None when empty"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def load_state(out_dir):
+    """Previous export's version, product digests and tombstones"""
+    path = os.path.join(out_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {'version': 0, 'products': {}, 'removed': {}}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def write_atomic(path, data):
+    with open(f"{path}.tmp", 'wb') as f:
+        f.write(data)
+    os.replace(f"{path}.tmp", path)
+
+
+def build_lookups(rows):
+    """{key column: {value: row position}}; a value shared by several
+    products maps to the list of their positions"""
+    lookups = {}
+    for key in LOOKUP_KEYS:
+        column = FIELDS.index(key)
+        lookup = {}
+        for position, row in enumerate(rows):
+            value = lookup_key(row[column])
+            if value is None:
+                continue
+            if value not in lookup:
+                lookup[value] = position
+            elif isinstance(lookup[value], list):
+                lookup[value].append(position)
+            else:
+                lookup[value] = [lookup[value], position]
+        lookups[key] = lookup
+    return lookups
+
+
+def export_catalog(cursor, out_dir):
+    """Write the catalog snapshot for COMPANY_ID; returns a summary dict"""
+    os.makedirs(out_dir, exist_ok=True)
+    state = load_state(out_dir)
+
+    # Changes are detected from a digest of the exported values themselves,
+    # so backend edits (prices, barcodes, sale stock) bump a row's version too
+    cursor.execute("""
+        SELECT _id, name, sku, barcode, code, price, stock, store_prices,
+               unit, is_weighed, free_price, tax_free,
+               md5(ROW(name, sku, barcode, code, price, stock, store_prices,
+                       unit, is_weighed, free_price, tax_free)::text)
+        FROM products
+        WHERE _client = %s AND NOT deleted
+        ORDER BY _id
+    """, (COMPANY_ID,))
+    current = cursor.fetchall()
+
+    previous = state['products']
+    live = {row[0] for row in current}
+    changed = {row[0] for row in current
+               if row[0] not in previous or previous[row[0]][0] != row[-1]}
+    removed = [_id for _id in previous if _id not in live]
+
+    version = state['version']
+    if changed or removed or not os.path.exists(os.path.join(out_dir, CATALOG_FILE)):
+        version += 1
+
+    products, rows = {}, []
+    for row in current:
+        _id, digest = row[0], row[-1]
+        row_version = version if _id in changed else previous[_id][1]
+        products[_id] = [digest, row_version]
+        rows.append(list(row[:-1]) + [row_version])
+
+    tombstones = {_id: v for _id, v in state['removed'].items()
+                  if v > version - TOMBSTONE_VERSIONS and _id not in live}
+    tombstones.update({_id: version for _id in removed})
+
+    snapshot = {
+        'format': FORMAT,
+        'company': COMPANY_ID,
+        'version': version,
+        'created': datetime.now().isoformat(),
+        # Deltas since an older version would miss dropped tombstones
+        'deltas_from': max(0, version - TOMBSTONE_VERSIONS),
+        'fields': FIELDS,
+        'products': rows,
+        'lookups': build_lookups(rows),
+        'removed': tombstones,
+    }
+    data = json.dumps(snapshot, ensure_ascii=False, separators=(',', ':'),
+                      default=json_value).encode()
+    write_atomic(os.path.join(out_dir, CATALOG_FILE), gzip.compress(data, 9))
+    write_atomic(os.path.join(out_dir, STATE_FILE), json.dumps(
+        {'version': version, 'products': products, 'removed': tombstones}).encode())
+
+    return {
+        'version': version,
+        'products': len(rows),
+        'changed': len(changed),
+        'removed': len(removed),
+        'bytes': os.path.getsize(os.path.join(out_dir, CATALOG_FILE)),
+        'shared_keys': {key: sum(isinstance(p, list) for p in lookup.values())
+                        for key, lookup in snapshot['lookups'].items()},
+    }
+
+
+def print_export(summary, out_dir):
+    """One-line outcome of an export"""
+    print(f"   ✅ Version {summary['version']}: {summary['products']:,} products "
+          f"({summary['changed']:,} changed, {summary['removed']:,} removed), "
+          f"{summary['bytes'] / 1024:,.1f} KB → {os.path.join(out_dir, CATALOG_FILE)}")
+    shared = ', '.join(f"{count:,} {key}s" for key, count in summary['shared_keys'].items() if count)
+    if shared:
+        print(f"   ⚠️  Shared by several products: {shared}")
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Export the POS catalog snapshot")
+    parser.add_argument('--out', default=os.environ.get('POS_CATALOG_DIR', 'pos_catalog'),
+                        help="output directory (default $POS_CATALOG_DIR or pos_catalog)")
+    return parser.parse_args()
+
+
+def main():
+    """Export from the database"""
+    args = parse_args()
+
+    print("=" * 80)
+    print("🛒 POS CATALOG EXPORT")
+    print("=" * 80)
+    print(f"Database: {DB_CONFIG['dbname']} @ {DB_CONFIG['host']}")
+    print(f"Output: {args.out}")
+    print("=" * 80)
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        cursor = conn.cursor()
+        print_export(export_catalog(cursor, args.out), args.out)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -9,8 +9,15 @@ import json
 import time
 import os
 from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Iterator, Tuple
+
+from compact_ids import ObjectIdSet
+
+from projections import project_page
+from snapshot_store import write_snapshot, snapshot_path
+from month_shards import SHARDED, write_shards
 
 # ============================================================================
 # CONFIGURATION
@@ -31,21 +38,63 @@ COOKIES = {
     'connect.sid': SESSION_COOKIE
 }
 
+REQUEST_TIMEOUT = 60
+
+# Adaptive page size: pages grow or shrink towards whichever target is hit
+# first, response size or response time, and stay within the bounds
+PAGE_MIN = int(os.environ.get('AINUR_PAGE_MIN', 100))
+PAGE_MAX = int(os.environ.get('AINUR_PAGE_MAX', 5000))
+PAGE_START = int(os.environ.get('AINUR_PAGE_START', 1000))
+PAGE_TARGET_BYTES = int(os.environ.get('AINUR_PAGE_TARGET_BYTES', 2 * 1024 * 1024))
+PAGE_TARGET_SECONDS = float(os.environ.get('AINUR_PAGE_TARGET_SECONDS', 8))
+
+# How search endpoints are walked: 'offset' pages by offset/limit, 'keyset'
+# by (date, _id) boundaries using to_date, 'cursor' with after_date/after_id
+# (only understood by our own backend)
+SEARCH_MODE = os.environ.get('AINUR_SEARCH_MODE', 'offset')
+
+# Paginated pages are slimmed to the fields the importer uses as they
+# arrive (see projections.py); AINUR_RAW_DIR keeps the untouched pages
+PROJECT_FIELDS = os.environ.get('AINUR_PROJECTION', '1') != '0'
+RAW_DIR = os.environ.get('AINUR_RAW_DIR')
+
+# Also write <name>.snap (see snapshot_store.py) next to each JSON file
+WRITE_SNAPSHOTS = os.environ.get('AINUR_SNAPSHOTS', '1') != '0'
+
+# Also write documents/ and money_movements/ as month shards (see month_shards.py)
+WRITE_SHARDS = os.environ.get('AINUR_SHARDS', '1') != '0'
+
+# Per-resource crawl settings chosen by extraction_planner.py, keyed like
+# PAGE_SIZERS ('data:catalog', 'search:docs'): page size, concurrency and
+# date windows. Resources without a plan use the adaptive defaults.
+RESOURCE_PLANS: Dict[str, Dict[str, Any]] = {}
+
 # ============================================================================
 # API FUNCTIONS
 # ============================================================================
 
-def make_request(path: str, method: str = 'GET', body: Optional[Dict] = None) -> Optional[Dict]:
-    """Make API request through Ainur proxy"""
+def make_request(path: str, method: str = 'GET', body: Optional[Dict] = None,
+                 stats: Optional[Dict] = None) -> Optional[Dict]:
+    """Make API request through Ainur proxy
+    
+    When a stats dict is passed it receives the response size in bytes,
+    the elapsed seconds and whether the request timed out.
+    """
     encoded_path = quote(path, safe='')
     url = f"{BASE_URL}?path={encoded_path}&timezone={TIMEZONE}"
+    if stats is not None:
+        stats.update(bytes=0, seconds=0.0, timeout=False)
+    started = time.time()
     
     try:
         if method == 'GET':
-            response = requests.get(url, headers=HEADERS, cookies=COOKIES, timeout=60)
+            response = requests.get(url, headers=HEADERS, cookies=COOKIES, timeout=REQUEST_TIMEOUT)
         elif method == 'POST':
-            response = requests.post(url, headers=HEADERS, cookies=COOKIES, json=body or {}, timeout=60)
+            response = requests.post(url, headers=HEADERS, cookies=COOKIES, json=body or {},
+                                     timeout=REQUEST_TIMEOUT)
         
+        if stats is not None:
+            stats.update(bytes=len(response.content), seconds=time.time() - started)
         if response.status_code == 200:
             return response.json()
         else:
@@ -53,43 +102,177 @@ def make_request(path: str, method: str = 'GET', body: Optional[Dict] = None) ->
             return None
     except requests.exceptions.Timeout:
         print(f"  ⚠️  Timeout for {path}")
+        if stats is not None:
+            stats.update(seconds=time.time() - started, timeout=True)
         return None
     except Exception as e:
         print(f"  ⚠️  Error for {path}: {e}")
         return None
 
-def get_paginated(resource: str, limit: int = 1000) -> List[Dict]:
-    """Get all data from paginated GET endpoint"""
-    all_data = []
+class PageSizer:
+    """Pick the next page size for one resource from what previous pages cost"""
+    
+    def __init__(self, start: int = PAGE_START, low: int = PAGE_MIN, high: int = PAGE_MAX):
+        self.low, self.high = low, high
+        self.size = max(low, min(high, start))
+    
+    def observe(self, records: int, nbytes: int, seconds: float):
+        """Move towards the size that hits the byte or time target, at most 2x per page"""
+        if not records:
+            return
+        by_bytes = PAGE_TARGET_BYTES * records / max(nbytes, 1)
+        by_time = PAGE_TARGET_SECONDS * records / max(seconds, 0.001)
+        wanted = min(by_bytes, by_time, self.size * 2)
+        self.size = max(self.low, min(self.high, int(wanted)))
+    
+    def shrink(self) -> bool:
+        """Halve the page after a timeout; False once already at the minimum
+        
+        The halved size also becomes the ceiling, so the sizer does not keep
+        growing back into the size that timed out.
+        """
+        if self.size <= self.low:
+            return False
+        self.size = self.high = max(self.low, self.size // 2)
+        return True
+
+# Learned page sizes, so later calls for the same resource start well
+PAGE_SIZERS: Dict[str, PageSizer] = {}
+
+def page_sizer(key: str, limit: Optional[int]) -> PageSizer:
+    """Fixed sizer when a limit is given, otherwise the resource's adaptive one"""
+    if limit:
+        return PageSizer(limit, limit, limit)
+    if key not in PAGE_SIZERS:
+        PAGE_SIZERS[key] = PageSizer()
+    return PAGE_SIZERS[key]
+
+def fetch_page(path_for, sizer: PageSizer, method: str = 'GET',
+               body: Optional[Dict] = None) -> Tuple[Optional[Dict], int]:
+    """Request path_for(limit), retrying at a smaller size when a page times out
+    
+    Returns the response and the limit it was requested with.
+    """
+    stats: Dict[str, Any] = {}
+    while True:
+        limit = sizer.size
+        result = make_request(path_for(limit), method, body, stats)
+        if result is not None or not stats['timeout']:
+            break
+        if not sizer.shrink():
+            print(f"  ⚠️  Giving up after timeouts at {sizer.size} records per page")
+            return None, limit
+        print(f"  ↘️  Retrying with {sizer.size} records per page")
+    
+    if result and result.get('status'):
+        batch = result.get('data') or []
+        if isinstance(batch, list):
+            sizer.observe(len(batch), stats['bytes'], stats['seconds'])
+    return result, limit
+
+def deliver(resource: str, batch: List[Dict]) -> List[Dict]:
+    """Page as handed to callers: projected, with the raw copy archived"""
+    if not PROJECT_FIELDS:
+        return batch
+    return project_page(resource, batch, RAW_DIR)
+
+def iter_paginated(resource: str, limit: Optional[int] = None) -> Iterator[List[Dict]]:
+    """Yield pages from paginated GET endpoint as they arrive
+    
+    Without a limit the page size adapts to the resource (see PageSizer).
+    """
+    sizer = page_sizer(f"data:{resource}", limit)
     offset = 0
     
     while True:
-        path = f"/data/{COMPANY_ID}/{resource}?offset={offset}&limit={limit}"
-        result = make_request(path)
+        result, size = fetch_page(
+            lambda n: f"/data/{COMPANY_ID}/{resource}?offset={offset}&limit={n}", sizer)
         
         if result and result.get('status'):
             batch = result.get('data', [])
             if not batch:
                 break
-            all_data.extend(batch)
-            if len(batch) < limit:
+            yield deliver(resource, batch)
+            if len(batch) < size:
                 break
-            offset += limit
+            offset += len(batch)
             time.sleep(0.2)
         else:
             break
+
+def get_paginated(resource: str, limit: Optional[int] = None) -> List[Dict]:
+    """Get all data from paginated GET endpoint"""
+    plan = RESOURCE_PLANS.get(f"data:{resource}")
+    if plan and limit is None:
+        if plan['concurrency'] > 1:
+            return get_offsets_parallel(resource, plan['count'], plan['page_size'],
+                                        plan['concurrency'])
+        limit = plan['page_size']
     
+    all_data = []
+    for batch in iter_paginated(resource, limit):
+        all_data.extend(batch)
     return all_data
 
-def search_paginated(endpoint: str, body: Optional[Dict] = None, limit: int = 1000) -> List[Dict]:
-    """Get all data from paginated POST search endpoint"""
+def get_offsets_parallel(resource: str, count: int, limit: int, workers: int) -> List[Dict]:
+    """Fetch a paginated GET endpoint with several pages in flight
+    
+    Offsets up to the planned count are requested concurrently; records
+    added since the count was taken are picked up sequentially after it.
+    A page that times out is fetched in halved pieces through fetch_page.
+    """
+    def page(offset):
+        end = offset + limit
+        sizer = PageSizer(limit, min(PAGE_MIN, limit), limit)
+        batch = []
+        while offset < end:
+            result, size = fetch_page(
+                lambda n: f"/data/{COMPANY_ID}/{resource}?offset={offset}&limit={min(n, end - offset)}",
+                sizer)
+            if not (result and result.get('status')):
+                raise RuntimeError(f"page at offset {offset} failed")
+            records = result.get('data') or []
+            batch.extend(records)
+            if len(records) < min(size, end - offset):
+                break
+            offset += len(records)
+        return batch
+    
     all_data = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for batch in pool.map(page, range(0, count, limit)):
+            all_data.extend(deliver(resource, batch))
+    
+    # A full last page means the resource grew after it was counted
+    offset = len(all_data)
+    while offset >= count:
+        batch = page(offset)
+        if not batch:
+            break
+        all_data.extend(deliver(resource, batch))
+        if len(batch) < limit:
+            break
+        offset += len(batch)
+    return all_data
+
+def iter_search(endpoint: str, body: Optional[Dict] = None,
+                limit: Optional[int] = None) -> Iterator[List[Dict]]:
+    """Yield pages from paginated POST search endpoint as they arrive
+    
+    Without a limit the page size adapts to the endpoint (see PageSizer).
+    """
+    if SEARCH_MODE != 'offset':
+        yield from iter_keyset(endpoint, body, limit, cursor=SEARCH_MODE == 'cursor')
+        return
+    
+    sizer = page_sizer(f"search:{endpoint}", limit)
     offset = 0
+    fetched = 0
     total = None
     
     while True:
-        path = f"/search/{endpoint}/{COMPANY_ID}/{offset}/{limit}"
-        result = make_request(path, 'POST', body or {})
+        result, size = fetch_page(
+            lambda n: f"/search/{endpoint}/{COMPANY_ID}/{offset}/{n}", sizer, 'POST', body or {})
         
         if result and result.get('status'):
             batch = result.get('data', [])
@@ -99,18 +282,113 @@ def search_paginated(endpoint: str, body: Optional[Dict] = None, limit: int = 10
             if not batch:
                 break
             
-            all_data.extend(batch)
+            yield deliver(endpoint, batch)
+            fetched += len(batch)
             
-            if len(batch) < limit or (total and len(all_data) >= total):
+            if len(batch) < size or (total and fetched >= total):
                 break
             
-            offset += limit
+            offset += len(batch)
             time.sleep(0.2)
         else:
             break
+
+def iter_keyset(endpoint: str, body: Optional[Dict] = None, limit: Optional[int] = None,
+                cursor: bool = False) -> Iterator[List[Dict]]:
+    """Yield search pages by (date, _id) boundaries instead of offsets
+    
+    Results come newest first. Upstream only filters by date, so each page
+    asks for to_date = the oldest date seen so far and drops the records
+    already yielded at that second; only a second holding a full page of
+    records needs an offset within it. With cursor=True after_date/after_id make
+    our backend continue strictly after the last row. Every page costs the
+    same and records added mid-crawl do not shift later pages.
+    """
+    sizer = page_sizer(f"search:{endpoint}", limit)
+    query = dict(body or {})
+    boundary_ids = set()
+    offset = 0
+    
+    while True:
+        result, size = fetch_page(
+            lambda n: f"/search/{endpoint}/{COMPANY_ID}/{offset}/{n}", sizer, 'POST', query)
+        if not result or not result.get('status'):
+            break
+        batch = result.get('data', [])
+        if not batch:
+            break
+        
+        if cursor:
+            yield deliver(endpoint, batch)
+            last = batch[-1]
+            query.update(after_date=last.get('date') or 0, after_id=last.get('_id'))
+        else:
+            fresh = [r for r in batch if r.get('_id') not in boundary_ids]
+            if fresh:
+                yield deliver(endpoint, fresh)
+            
+            oldest = min(r.get('date') or 0 for r in batch)
+            if not oldest:
+                print(f"  ⚠️  Records without a date cannot be reached by keyset, "
+                      f"use AINUR_SEARCH_MODE=offset for {endpoint}")
+                break
+            if oldest != query.get('to_date'):
+                boundary_ids = set()
+            query['to_date'] = oldest
+            boundary_ids.update(r.get('_id') for r in batch if (r.get('date') or 0) == oldest)
+            # Records at the boundary second come first; skip the ones seen
+            # only while a single second fills whole pages
+            offset = len(boundary_ids) if len(boundary_ids) >= size else 0
+        
+        if len(batch) < size:
+            break
+        time.sleep(0.2)
+
+def search_paginated(endpoint: str, body: Optional[Dict] = None,
+                     limit: Optional[int] = None) -> List[Dict]:
+    """Get all data from paginated POST search endpoint"""
+    all_data = []
+    for batch in iter_search(endpoint, body, limit):
+        all_data.extend(batch)
+    return all_data
+
+def search_windows(endpoint: str, windows: List[Tuple[int, int]], limit: Optional[int] = None,
+                   workers: int = 1) -> List[Dict]:
+    """Search every [from_date, to_date) window, several windows at a time
     
+    Windows are crawled independently and merged newest first; a record
+    seen in two windows (its date edited mid-crawl) is kept once.
+    """
+    def crawl(window):
+        start, end = window
+        return search_paginated(endpoint, {'from_date': start, 'to_date': end - 1}, limit)
+    
+    seen = ObjectIdSet()
+    all_data = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for batch in pool.map(crawl, sorted(windows, reverse=True)):
+            all_data.extend(r for r in batch if r.get('_id') is None or seen.add(r['_id']))
     return all_data
 
+def search_planned(endpoint: str) -> List[Dict]:
+    """Whole search endpoint, windowed and parallel when the planner said so"""
+    plan = RESOURCE_PLANS.get(f"search:{endpoint}")
+    if not plan:
+        return search_paginated(endpoint, {})
+    if plan['windows']:
+        print(f"   {len(plan['windows']):,} {plan['granularity']} windows, "
+              f"{plan['concurrency']} at a time")
+        data = search_windows(endpoint, plan['windows'], plan['page_size'], plan['concurrency'])
+        # Date filters never match undated records; rather fail than lose them quietly
+        # (the lower of the planned and current totals, records may be deleted meanwhile)
+        current = search_total(endpoint)
+        expected = plan['count'] if current is None else min(plan['count'], current)
+        if len(data) < expected:
+            raise RuntimeError(f"/search/{endpoint} windows returned {len(data):,} of "
+                               f"{expected:,} records (undated records?)")
+        return data
+    return search_paginated(endpoint, {}, plan['page_size'])
+
 def get_simple(resource: str) -> List[Dict]:
     """Get data from non-paginated GET endpoint"""
     path = f"/data/{COMPANY_ID}/{resource}"
@@ -125,10 +403,18 @@ def get_simple(resource: str) -> List[Dict]:
             return [data]
     return []
 
-def get_count(resource: str) -> int:
+def search_total(endpoint: str, body: Optional[Dict] = None,
+                 stats: Optional[Dict] = None) -> Optional[int]:
+    """Total the search endpoint reports for a query (one single-record request)"""
+    result = make_request(f"/search/{endpoint}/{COMPANY_ID}/0/1", 'POST', body or {}, stats)
+    if result and result.get('status'):
+        return result.get('total') or 0
+    return None
+
+def get_count(resource: str, stats: Optional[Dict] = None) -> int:
     """Get count from endpoint"""
     path = f"/count/{COMPANY_ID}/{resource}"
-    result = make_request(path)
+    result = make_request(path, stats=stats)
     
     if result and result.get('status'):
         data = result.get('data', {})
@@ -242,7 +528,7 @@ def extract_documents():
     print("\n📄 Extracting DOCUMENTS...")
     
     # Use search endpoint with pagination
-    data = search_paginated('docs', {})
+    data = search_planned('docs')
     print(f"   ✅ Extracted: {len(data):,} documents")
     
     # Analyze by type
@@ -261,7 +547,7 @@ def extract_money_movements():
     """Extract all money movements/financial transactions"""
     print("\n💵 Extracting MONEY MOVEMENTS...")
     
-    data = search_paginated('money', {})
+    data = search_planned('money')
     print(f"   ✅ Extracted: {len(data):,} money movements")
     
     # Analyze by type
@@ -410,6 +696,14 @@ def main():
         with open(filepath, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
         
+        # Random-access copy for lookups and partial reloads
+        if WRITE_SNAPSHOTS and isinstance(data, list) and data and \
+                all(isinstance(r, dict) and '_id' in r for r in data):
+            write_snapshot(snapshot_path(filepath), data)
+        
+        if WRITE_SHARDS and name in SHARDED and isinstance(data, list):
+            write_shards(OUTPUT_DIR, name, data)
+        
         if isinstance(data, list):
             count = len(data)
         elif isinstance(data, dict):
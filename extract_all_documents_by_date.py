@@ -11,6 +11,9 @@ import os
 from urllib.parse import quote
 from datetime import datetime, timedelta
 
+from compact_ids import ObjectIdSet, intern_refs
+from month_shards import write_shards
+
 # Configuration
 BASE_URL = "https://web.ainur.app/proxy"
 COMPANY_ID = "58c872aa3ce7d5fc688b49bd"
@@ -51,7 +54,8 @@ def search_with_date_filter(endpoint, from_date=None, to_date=None, limit=1000):
             if response.status_code != 200:
                 break
             
-            result = response.json()
+            # Reference ids repeat in every record; share one string each
+            result = response.json(object_hook=intern_refs)
             
             if not result.get('status'):
                 break
@@ -123,8 +127,8 @@ def main():
     
     all_documents = []
     all_money = []
-    seen_doc_ids = set()
-    seen_money_ids = set()
+    seen_doc_ids = ObjectIdSet()
+    seen_money_ids = ObjectIdSet()
     
     # Extract documents by date range
     print("\n" + "=" * 80)
@@ -135,10 +139,8 @@ def main():
         period = f"{start.strftime('%Y-%m')}"
         docs, total = search_with_date_filter('docs', start, end)
         
-        # Deduplicate
-        new_docs = [d for d in docs if d['_id'] not in seen_doc_ids]
-        for d in new_docs:
-            seen_doc_ids.add(d['_id'])
+        # Deduplicate (add() is False for ids already seen)
+        new_docs = [d for d in docs if seen_doc_ids.add(d['_id'])]
         
         if new_docs:
             all_documents.extend(new_docs)
@@ -156,9 +158,7 @@ def main():
         money, total = search_with_date_filter('money', start, end)
         
         # Deduplicate
-        new_money = [m for m in money if m['_id'] not in seen_money_ids]
-        for m in new_money:
-            seen_money_ids.add(m['_id'])
+        new_money = [m for m in money if seen_money_ids.add(m['_id'])]
         
         if new_money:
             all_money.extend(new_money)
@@ -187,6 +187,11 @@ def main():
     size_mb = os.path.getsize(money_file) / (1024 * 1024)
     print(f"  Money movements: {len(all_money):,} records ({size_mb:.2f} MB)")
     
+    # Month shards for parallel and selective reloads
+    for name, records in [('documents', all_documents), ('money_movements', all_money)]:
+        manifest = write_shards(OUTPUT_DIR, name, records)
+        print(f"  {name}/: {len(manifest['months']):,} month shards")
+    
     # Analysis
     print("\n" + "=" * 80)
     print("📊 ANALYSIS")
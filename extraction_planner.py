@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Cost-based extraction planner
+Before crawling, asks the count endpoints how large every paginated
+resource is and samples one page for the average record size and response
+time. From that it estimates requests, bytes and wall time and picks a page
+size, a concurrency and (for searches) a date-window granularity per
+resource, within a global request budget. Small resources become a single
+request; large tenants get parallel windowed crawls.
+
+Usage:
+    python extraction_planner.py --dry-run      # print the plan only
+    python extraction_planner.py                # plan, then extract with it
+"""
+
+import argparse
+import math
+import os
+import time
+from calendar import monthrange
+from datetime import datetime, timezone
+
+import extract_all_ainur_data as extractor
+from extract_all_ainur_data import (
+    COMPANY_ID, PAGE_MIN, PAGE_MAX, PAGE_TARGET_BYTES, PAGE_TARGET_SECONDS,
+    RESOURCE_PLANS, make_request, get_count, search_total
+)
+
+# Records fetched by the sampling request
+SAMPLE_SIZE = int(os.environ.get('PLAN_SAMPLE_SIZE', 100))
+
+# Requests in flight at once; resources are crawled one after another,
+# so each may use all of it
+MAX_CONCURRENCY = int(os.environ.get('PLAN_MAX_CONCURRENCY', 8))
+
+# Total requests the extraction may make (0 = unlimited); page sizes grow
+# up to PAGE_MAX to stay inside it
+REQUEST_BUDGET = int(os.environ.get('PLAN_REQUEST_BUDGET', 0))
+
+# A resource whose sequential crawl is estimated below this many seconds
+# is not worth parallelising
+PARALLEL_AFTER_SECONDS = float(os.environ.get('PLAN_PARALLEL_AFTER', 30))
+
+# Search windows aim to hold at most this many records, which keeps every
+# window inside the API's 10k offset window
+WINDOW_RECORDS = int(os.environ.get('PLAN_WINDOW_RECORDS', 10000))
+
+# Nothing older exists upstream (see extract_all_documents_by_date.py)
+EARLIEST_DATE = int(datetime(2017, 1, 1, tzinfo=timezone.utc).timestamp())
+
+# Pause between sequential pages (see iter_paginated/iter_search)
+PAGE_PAUSE = 0.2
+
+# plan key -> (label, kind, resource or endpoint)
+PLAN_RESOURCES = [
+    ('data:catalog', "Products", 'data', 'catalog'),
+    ('data:clients', "Customers", 'data', 'clients'),
+    ('search:docs', "Documents", 'search', 'docs'),
+    ('search:money', "Money movements", 'search', 'money'),
+]
+
+# Coarsest first; the first one that keeps windows under WINDOW_RECORDS wins
+GRANULARITIES = ['month', 'week', 'day']
+
+# ============================================================================
+# PROBING
+# ============================================================================
+
+def probe(kind, name):
+    """Count, per-record size and timing of one resource from two small requests
+
+    The count request returns almost nothing, so its time stands in for the
+    fixed per-request latency; the sample page's extra time is per record.
+    """
+    stats = {}
+    if kind == 'data':
+        count = get_count(name, stats)
+        sample_path = f"/data/{COMPANY_ID}/{name}?offset=0&limit={SAMPLE_SIZE}"
+    else:
+        count = search_total(name, None, stats) or 0
+        sample_path = f"/search/{name}/{COMPANY_ID}/0/{SAMPLE_SIZE}"
+    latency = stats.get('seconds', 0.0)
+
+    sample_stats = {}
+    result = make_request(sample_path, 'GET' if kind == 'data' else 'POST', {}, sample_stats)
+    records = (result.get('data') or []) if result and result.get('status') else []
+    sampled = len(records) if isinstance(records, list) else 0
+
+    return {
+        'count': count,
+        'latency': latency,
+        'bytes_per_record': sample_stats.get('bytes', 0) / sampled if sampled else 0,
+        'seconds_per_record': max(0.0, sample_stats.get('seconds', 0.0) - latency) / sampled
+                              if sampled else 0,
+        'newest': max((r.get('date') or 0 for r in records), default=0) if sampled else 0,
+        'probe_requests': 2,
+    }
+
+
+def oldest_date(endpoint, newest, info):
+    """Day of the oldest record, by bisecting to_date with single-record totals"""
+    lo, hi = EARLIEST_DATE, max(newest, EARLIEST_DATE)
+    while hi - lo > 86400:
+        mid = (lo + hi) // 2
+        total = search_total(endpoint, {'to_date': mid})
+        info['probe_requests'] += 1
+        if total is None:
+            break
+        if total:
+            hi = mid
+        else:
+            lo = mid
+    return lo
+
+# ============================================================================
+# PLANNING
+# ============================================================================
+
+def window_start(moment, granularity):
+    """Start of the month/week/day containing moment (UTC)"""
+    day = datetime.fromtimestamp(moment, timezone.utc).replace(hour=0, minute=0, second=0)
+    if granularity == 'month':
+        day = day.replace(day=1)
+    elif granularity == 'week':
+        day = datetime.fromtimestamp(day.timestamp() - day.weekday() * 86400, timezone.utc)
+    return int(day.timestamp())
+
+
+def window_end(start, granularity):
+    """Start of the next window"""
+    if granularity == 'month':
+        day = datetime.fromtimestamp(start, timezone.utc)
+        return start + monthrange(day.year, day.month)[1] * 86400
+    return start + (7 if granularity == 'week' else 1) * 86400
+
+
+def date_windows(oldest, newest, granularity):
+    """[start, end) windows covering oldest..newest, open-ended at both ends
+
+    The first window starts at 0, so records dated before oldest (or before
+    EARLIEST_DATE) are still crawled; undated ones are left to the count
+    check in search_planned.
+    """
+    windows = []
+    start = window_start(oldest, granularity)
+    while start <= newest:
+        end = window_end(start, granularity)
+        windows.append((start, end))
+        start = end
+    if windows:
+        # Records created while crawling land in the newest window
+        windows[-1] = (windows[-1][0], 2 ** 31 - 1)
+        windows[0] = (0, windows[0][1])
+    return windows
+
+
+def page_size_for(info):
+    """Page size that hits the byte or time target, as PageSizer would settle on"""
+    sizes = [PAGE_MAX]
+    if info['bytes_per_record']:
+        sizes.append(PAGE_TARGET_BYTES / info['bytes_per_record'])
+    if info['seconds_per_record']:
+        sizes.append(PAGE_TARGET_SECONDS / info['seconds_per_record'])
+    return max(PAGE_MIN, min(PAGE_MAX, int(min(sizes))))
+
+
+def plan_resource(kind, name, info, page_size=None):
+    """Page size, windows and concurrency for one probed resource"""
+    count = info['count']
+    page_size = page_size or page_size_for(info)
+    plan = {'count': count, 'windows': [], 'granularity': None, 'concurrency': 1}
+
+    # Everything fits into one (short) page: a single request
+    plan.update(page_size=page_size, requests=max(1, math.ceil(count / page_size)))
+
+    if kind == 'search' and count > WINDOW_RECORDS and info['newest']:
+        if 'oldest' not in info:
+            info['oldest'] = oldest_date(name, info['newest'], info)
+        oldest = info['oldest']
+        for granularity in GRANULARITIES:
+            windows = date_windows(oldest, info['newest'], granularity)
+            if count / max(len(windows), 1) <= WINDOW_RECORDS:
+                break
+        per_window = count / max(len(windows), 1)
+        plan.update(windows=windows, granularity=granularity,
+                    requests=len(windows) * max(1, math.ceil(per_window / page_size)))
+
+    request_seconds = info['latency'] + page_size * info['seconds_per_record']
+    sequential = plan['requests'] * (request_seconds + PAGE_PAUSE)
+    units = len(plan['windows']) if kind == 'search' else plan['requests']
+    if sequential > PARALLEL_AFTER_SECONDS and units > 1:
+        plan['concurrency'] = min(MAX_CONCURRENCY, units)
+
+    plan.update(
+        bytes=int(count * info['bytes_per_record']),
+        seconds=sequential / plan['concurrency'],
+    )
+    return plan
+
+
+def fit_budget(plans, probes, budget):
+    """Grow page sizes until the estimated requests fit the budget
+
+    Returns False when even PAGE_MAX pages do not fit.
+    """
+    if not budget:
+        return True
+    while True:
+        total = sum(p['requests'] for p in plans.values())
+        if total <= budget:
+            return True
+        growable = [key for key, p in plans.items() if p['page_size'] < PAGE_MAX and p['requests'] > 1]
+        if not growable:
+            return False
+        # The resource spending the most requests gets larger pages first
+        key = max(growable, key=lambda k: plans[k]['requests'])
+        kind, name = key.split(':', 1)
+        bigger = min(PAGE_MAX, plans[key]['page_size'] * 2)
+        plans[key] = plan_resource(kind, name, probes[key], bigger)
+
+
+def build_plan(budget=REQUEST_BUDGET):
+    """Probe every resource and plan the crawl; returns (plans, probes, fits)"""
+    plans, probes = {}, {}
+    for key, label, kind, name in PLAN_RESOURCES:
+        print(f"   🔎 {label}...")
+        probes[key] = probe(kind, name)
+        plans[key] = plan_resource(kind, name, probes[key])
+    fits = fit_budget(plans, probes, budget)
+    return plans, probes, fits
+
+
+def print_plan(plans, probes, budget, fits):
+    """Table of what the extraction is expected to cost"""
+    print(f"\n   {'':16s} {'records':>10s} {'page':>6s} {'requests':>9s} {'windows':>12s} "
+          f"{'parallel':>8s} {'MB':>8s} {'time':>8s}")
+    totals = {'requests': 0, 'bytes': 0, 'seconds': 0.0}
+    for key, label, _, _ in PLAN_RESOURCES:
+        plan = plans[key]
+        windows = f"{len(plan['windows'])} {plan['granularity']}" if plan['windows'] else '-'
+        print(f"   {label:16s} {plan['count']:>10,} {plan['page_size']:>6,} "
+              f"{plan['requests']:>9,} {windows:>12s} {plan['concurrency']:>8} "
+              f"{plan['bytes'] / 1024 / 1024:>8.1f} {plan['seconds']:>7.0f}s")
+        for total in totals:
+            totals[total] += plan[total]
+    probe_requests = sum(p['probe_requests'] for p in probes.values())
+    print("-" * 80)
+    print(f"   {'TOTAL':16s} {'':>10s} {'':>6s} {totals['requests']:>9,} {'':>12s} {'':>8s} "
+          f"{totals['bytes'] / 1024 / 1024:>8.1f} {totals['seconds']:>7.0f}s")
+    print(f"   Planning used {probe_requests} requests; other resources are one request each")
+    if budget:
+        verdict = "fits" if fits else "⚠️  does NOT fit, even at the largest page size"
+        print(f"   Request budget {budget:,}: {verdict}")
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Plan (and run) the Ainur extraction")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="print the plan without extracting")
+    parser.add_argument('--budget', type=int, default=REQUEST_BUDGET,
+                        help=f"maximum requests for the whole extraction, 0 for no limit "
+                             f"(default {REQUEST_BUDGET})")
+    parser.add_argument('--concurrency', type=int, default=MAX_CONCURRENCY,
+                        help=f"requests in flight at once (default {MAX_CONCURRENCY})")
+    return parser.parse_args()
+
+
+def main():
+    """Probe, plan, and unless --dry-run extract with the plan"""
+    global MAX_CONCURRENCY
+    args = parse_args()
+    MAX_CONCURRENCY = args.concurrency
+
+    print("=" * 80)
+    print("🧭 AINUR EXTRACTION PLAN")
+    print("=" * 80)
+    print(f"Started: {datetime.now()}")
+    print(f"Company ID: {COMPANY_ID}")
+    print(f"Concurrency: {args.concurrency}, budget: {args.budget or 'unlimited'}")
+    print("=" * 80)
+
+    started = time.time()
+    plans, probes, fits = build_plan(args.budget)
+    print_plan(plans, probes, args.budget, fits)
+    print(f"   Planned in {time.time() - started:.1f}s")
+    print("=" * 80)
+
+    if args.dry_run:
+        return
+    RESOURCE_PLANS.update(plans)
+    extractor.main()
+
+
+if __name__ == "__main__":
+    main()
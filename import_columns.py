@@ -0,0 +1,569 @@
+"""
+Declarative column specs for the Ainur → PostgreSQL importer
+
+Every imported table is described once here. From the spec we generate a
+specialised row-extractor function per table (compiled once at import
+time), the INSERT/COPY column list, a consistency check against
+backend/src/database/schema.sql and per-row validators built from the
+column types declared there.
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import uuid
+from functools import lru_cache
+
+COMPANY_ID = '58c872aa3ce7d5fc688b49bd'
+
+# Every imported table carries a hash of the row content computed here,
+# so upserts can skip rows that have not changed
+HASH_COLUMN = '_hash'
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'backend/src/database/schema.sql')
+
+
+class Column:
+    """One target column and how to read it from an extracted record"""
+
+    __slots__ = ('name', 'key', 'default', 'jsonb', 'max_length', 'coerce', 'compute')
+
+    def __init__(self, name, key=None, default=None, jsonb=False,
+                 max_length=None, coerce=None, compute=None):
+        self.name = name
+        self.key = key or name
+        self.default = default
+        self.jsonb = jsonb
+        self.max_length = max_length
+        # 'int'    - keep the value only if it is an int, else NULL
+        # 'truthy' - fall back to default for any falsy value
+        self.coerce = coerce
+        # Derived columns are computed from the whole record instead
+        self.compute = compute
+
+
+class TableSpec:
+    """Column spec for one table plus the code generated from it"""
+
+    def __init__(self, name, columns, update, partition_by=None):
+        self.name = name
+        self.columns = columns
+        self.column_names = [c.name for c in columns] + [HASH_COLUMN]
+        self.update = update
+        # The content hash covers exactly the columns an upsert rewrites, so a
+        # change anywhere else can never mark a stale row as in sync
+        self.hashed = [i for i, c in enumerate(columns) if c.name in update]
+        # Range-partitioned tables carry the partition column in their key
+        self.partition_by = partition_by
+        self.key = ['_id', partition_by] if partition_by else ['_id']
+        self.row = compile_row_extractor(name, columns)
+
+    @property
+    def column_list(self):
+        """Quoted column list for INSERT/COPY statements"""
+        return ', '.join(f'"{c}"' for c in self.column_names)
+
+
+def content_hash(line):
+    """Hash of a rendered row, stored in HASH_COLUMN"""
+    return hashlib.blake2b(line.encode(), digest_size=16).hexdigest()
+
+
+def row_hash(spec, fields):
+    """content_hash of the COPY-rendered fields the spec's upsert writes"""
+    return content_hash('\t'.join(fields[i] for i in spec.hashed))
+
+
+_encode = json.JSONEncoder(ensure_ascii=False).encode
+
+
+def _json(value):
+    return None if value is None else _encode(value)
+
+
+def _clip(value, length):
+    return value[:length] if isinstance(value, str) else value
+
+
+def _int(value):
+    return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+
+def normalize_search(text):
+    """Lower-case and collapse whitespace, as search.ts does for the search term"""
+    return ' '.join(str(text).lower().split())
+
+
+def document_search_text(item):
+    """Searchable text of a document: number, product names/codes, customer name"""
+    parts = [item.get('number')]
+    for product in item.get('products') or []:
+        if not isinstance(product, dict):
+            continue
+        embedded = product.get('product') or {}
+        parts += [embedded.get('name') or product.get('name'),
+                  embedded.get('sku') or product.get('sku'),
+                  embedded.get('barcode') or product.get('barcode')]
+    to = item.get('to')
+    if isinstance(to, dict) and to.get('type') == 'clients':
+        parts.append(to.get('name'))
+    return normalize_search(' '.join(dict.fromkeys(str(p) for p in parts if p)))
+
+
+def compile_row_extractor(table, columns):
+    """Generate a function turning a record into a row tuple for table
+
+    JSONB columns come out already serialised, so the tuple can go
+    straight to COPY. Missing JSONB keys reuse a pre-serialised default.
+    """
+    namespace = {'_json': _json, '_clip': _clip, '_int': _int}
+    parts = []
+    for i, col in enumerate(columns):
+        default = f'_d{i}'
+        namespace[default] = col.default
+        if col.compute:
+            namespace[f'_c{i}'] = col.compute
+            parts.append(f'_c{i}(item)')
+            continue
+        if col.jsonb and col.default is not None and not col.coerce:
+            namespace[f'_j{i}'] = _json(col.default)
+            parts.append(f'(_j{i} if (v := g({col.key!r}, {default})) is {default} '
+                         f'else _json(v))')
+            continue
+        if col.coerce == 'truthy':
+            expr = f'(g({col.key!r}) or {default})'
+        elif col.default is None:
+            expr = f'g({col.key!r})'
+        else:
+            expr = f'g({col.key!r}, {default})'
+        if col.coerce == 'int':
+            expr = f'_int({expr})'
+        if col.max_length:
+            expr = f'_clip({expr}, {col.max_length})'
+        if col.jsonb:
+            expr = f'_json({expr})'
+        parts.append(expr)
+
+    source = (f"def {table}_row(item):\n"
+              f"    g = item.get\n"
+              f"    return ({', '.join(parts)},)\n")
+    exec(compile(source, f'<{table}_row>', 'exec'), namespace)
+    return namespace[f'{table}_row']
+
+
+# ============================================================================
+# TABLE SPECS
+# ============================================================================
+
+TABLES = {spec.name: spec for spec in [
+    TableSpec('stores', [
+        Column('_id'),
+        Column('uuid'),
+        Column('_user'),
+        Column('_client', default=COMPANY_ID),
+        Column('_register'),
+        Column('_app'),
+        Column('name'),
+        Column('shortname'),
+        Column('address'),
+        Column('description'),
+        Column('type', default='store'),
+        Column('default', default=False),
+        Column('include', default=True),
+        Column('balance', default={}, jsonb=True),
+        Column('bank_details', default=[], jsonb=True),
+        Column('taxes', default=[], jsonb=True),
+        Column('info', default={}, jsonb=True),
+        Column('_stat_docs', default={}, jsonb=True),
+        Column('created'),
+        Column('updated'),
+        Column('created_ms'),
+        Column('deleted', default=False),
+    ], update=['name', 'address', 'balance', 'updated', 'deleted']),
+
+    TableSpec('accounts', [
+        Column('_id'),
+        Column('uuid'),
+        Column('_user'),
+        Column('_client', default=COMPANY_ID),
+        Column('_app'),
+        Column('name'),
+        Column('type'),
+        Column('balance', default={}, jsonb=True),
+        Column('bank_details', default=[], jsonb=True),
+        Column('include', default=True),
+        Column('use_terminal', default=False),
+        Column('created'),
+        Column('updated'),
+        Column('created_ms'),
+        Column('deleted', default=False),
+    ], update=['name', 'balance', 'updated', 'deleted']),
+
+    TableSpec('money_sources', [
+        Column('_id'),
+        Column('id'),
+        Column('title'),
+        Column('type'),
+        Column('country'),
+    ], update=['title', 'type']),
+
+    TableSpec('categories', [
+        Column('_id'),
+        Column('_client', default=COMPANY_ID),
+        Column('name'),
+        Column('sort_order', default=0),
+        Column('deleted', default=False),
+    ], update=['name', 'deleted']),
+
+    TableSpec('products', [
+        Column('_id'),
+        Column('uuid'),
+        Column('_user'),
+        Column('_client', default=COMPANY_ID),
+        Column('_app'),
+        Column('name', default='', max_length=500),
+        Column('sku'),
+        Column('barcode'),
+        Column('code'),
+        Column('type', default='inventory'),
+        Column('price', default=0),
+        Column('cost', default=0),
+        Column('purchase', default=0),
+        Column('discount', default=0),
+        Column('total_stock', default=0),
+        Column('stock', default={}, jsonb=True),
+        Column('_stock', default=[], jsonb=True),
+        Column('store_prices', default={}, jsonb=True),
+        Column('_store_prices', default=[], jsonb=True),
+        Column('categories', default=[], jsonb=True),
+        Column('unit'),
+        Column('country'),
+        Column('supplier'),
+        Column('description'),
+        Column('pic'),
+        Column('taxes', default=[], jsonb=True),
+        Column('tax_free', default=False),
+        Column('free_price', default=False),
+        Column('is_weighed', default=False),
+        Column('component', default=[], jsonb=True),
+        Column('container', default=[], jsonb=True),
+        Column('imported', coerce='int'),
+        Column('id_group'),
+        Column('created'),
+        Column('updated'),
+        Column('created_ms'),
+        Column('deleted', default=False),
+    ], update=['name', 'price', 'cost', 'total_stock', 'stock', 'updated', 'deleted']),
+
+    TableSpec('customers', [
+        Column('_id'),
+        Column('uuid'),
+        Column('_user'),
+        Column('_client', default=COMPANY_ID),
+        Column('_app'),
+        Column('name', default='Unknown'),
+        Column('type', default='person'),
+        Column('sex'),
+        Column('description'),
+        Column('address', jsonb=True),
+        Column('phones', default=[], jsonb=True),
+        Column('emails', default=[], jsonb=True),
+        Column('bank_details', default=[], jsonb=True),
+        Column('details', default=[], jsonb=True, coerce='truthy'),
+        Column('discount', default=0),
+        Column('discount_card'),
+        Column('loyalty_type'),
+        Column('cashback_rate', default=0),
+        Column('bonus_balance', default=0),
+        Column('bonus_spent', default=0),
+        Column('debt', default=0),
+        Column('enable_savings', default=False),
+        Column('bday'),
+        Column('default', default=False),
+        Column('info', default={}, jsonb=True),
+        Column('created'),
+        Column('updated'),
+        Column('created_ms'),
+        Column('deleted', default=False),
+    ], update=['name', 'phones', 'emails', 'debt', 'updated', 'deleted']),
+
+    TableSpec('suppliers', [
+        Column('_id'),
+        Column('uuid'),
+        Column('_user'),
+        Column('_client', default=COMPANY_ID),
+        Column('_app'),
+        Column('name', default='Unknown'),
+        Column('site'),
+        Column('address', jsonb=True),
+        Column('description'),
+        Column('phones', default=[], jsonb=True),
+        Column('emails', default=[], jsonb=True),
+        Column('bank_details', default=[], jsonb=True),
+        Column('details', default={}, jsonb=True, coerce='truthy'),
+        Column('debt', default=0),
+        Column('rdebt', default=0),
+        Column('default', default=False),
+        Column('created'),
+        Column('updated'),
+        Column('created_ms'),
+        Column('deleted', default=False),
+    ], update=['name', 'phones', 'emails', 'debt', 'updated', 'deleted']),
+
+    TableSpec('documents', [
+        Column('_id'),
+        Column('uuid'),
+        Column('_user'),
+        Column('_client', default=COMPANY_ID),
+        Column('_shift'),
+        Column('_app'),
+        Column('type', default='sale'),
+        Column('number'),
+        Column('status', default=True),
+        Column('date', default=0, coerce='truthy'),
+        Column('store'),
+        Column('from', default={}, jsonb=True),
+        Column('to', default={}, jsonb=True),
+        Column('sum', default=0),
+        Column('paid', default=0),
+        Column('discount_percent', default=0),
+        Column('discount_sum', default=0),
+        Column('tax_total', default=0),
+        Column('products', default=[], jsonb=True),
+        Column('payments', default=[], jsonb=True),
+        Column('notes'),
+        Column('comment'),
+        Column('info', default={}, jsonb=True),
+        Column('created'),
+        Column('updated'),
+        Column('created_ms'),
+        Column('deleted', default=False),
+        Column('search_text', compute=document_search_text),
+    ], update=['status', 'sum', 'paid', 'updated', 'search_text', 'deleted'],
+       partition_by='date'),
+
+    TableSpec('money_movements', [
+        Column('_id'),
+        Column('uuid'),
+        Column('_user'),
+        Column('_client', default=COMPANY_ID),
+        Column('_document'),
+        Column('_shift'),
+        Column('_app'),
+        Column('type', default='debit'),
+        Column('sum', default=0),
+        Column('date', default=0, coerce='truthy'),
+        Column('from', default={}, jsonb=True),
+        Column('to', default={}, jsonb=True),
+        Column('account'),
+        Column('source', default={}, jsonb=True),
+        Column('reason'),
+        Column('description'),
+        Column('comment'),
+        Column('info', default={}, jsonb=True),
+        Column('created'),
+        Column('updated'),
+        Column('created_ms'),
+        Column('deleted', default=False),
+    ], update=['sum', 'updated', 'deleted'], partition_by='date'),
+]}
+
+
+# ============================================================================
+# SCHEMA.SQL CONSISTENCY
+# ============================================================================
+
+def parse_schema(schema_sql):
+    """Return {table: {column: type}} for every CREATE TABLE in schema_sql"""
+    tables = {}
+    for match in re.finditer(r'CREATE TABLE (\w+)\s*\((.*?)\n\)[^;]*;', schema_sql, re.S):
+        columns = {}
+        for line in match.group(2).splitlines():
+            line = line.strip().rstrip(',')
+            col = re.match(r'("?)(\w+)\1\s+(\w+(?:\s*\([\d,\s]+\))?)', line)
+            if col and col.group(2).upper() not in ('PRIMARY', 'UNIQUE', 'CONSTRAINT'):
+                columns[col.group(2)] = col.group(3).upper().replace(' ', '')
+        tables[match.group(1)] = columns
+    return tables
+
+
+def check_schema(schema_sql):
+    """List every way the table specs disagree with schema_sql"""
+    schema = parse_schema(schema_sql)
+    problems = []
+    for spec in TABLES.values():
+        columns = schema.get(spec.name)
+        if columns is None:
+            problems.append(f"{spec.name}: table missing from schema.sql")
+            continue
+        if HASH_COLUMN not in columns:
+            problems.append(f"{spec.name}.{HASH_COLUMN}: column missing from schema.sql")
+        for col in spec.columns:
+            sql_type = columns.get(col.name)
+            if sql_type is None:
+                problems.append(f"{spec.name}.{col.name}: column missing from schema.sql")
+                continue
+            if col.jsonb != (sql_type == 'JSONB'):
+                problems.append(f"{spec.name}.{col.name}: spec jsonb={col.jsonb}, schema has {sql_type}")
+            length = re.match(r'VARCHAR\((\d+)\)', sql_type)
+            if col.max_length and (not length or int(length.group(1)) != col.max_length):
+                problems.append(f"{spec.name}.{col.name}: max_length {col.max_length}, schema has {sql_type}")
+    return problems
+
+
+# ============================================================================
+# ROW VALIDATION
+# ============================================================================
+#
+# Each checker takes an extracted value and returns (value, problem). Safe
+# conversions (numeric strings, integral floats, scalars stored as text)
+# return the converted value; anything PostgreSQL would refuse returns a
+# problem, and the row is quarantined instead of failing the COPY.
+
+_INT_RANGES = {
+    'SMALLINT': 2 ** 15,
+    'INTEGER': 2 ** 31,
+    'BIGINT': 2 ** 63,
+}
+
+
+def _text_checker(max_length=None):
+    def check(value):
+        if value is None or type(value) is str:
+            pass
+        elif isinstance(value, bool):
+            value = 'true' if value else 'false'
+        elif isinstance(value, (int, float)):
+            value = str(value)
+        else:
+            return value, f"expected text, got {type(value).__name__}"
+        if max_length and value is not None and len(value) > max_length:
+            return value, f"{len(value)} chars exceeds VARCHAR({max_length})"
+        return value, None
+    return check
+
+
+def _int_checker(sql_type):
+    bound = _INT_RANGES[sql_type]
+
+    def check(value):
+        if value is None:
+            return value, None
+        if type(value) is not int:
+            if isinstance(value, bool):
+                value = int(value)
+            elif isinstance(value, float) and value.is_integer():
+                value = int(value)
+            elif isinstance(value, str):
+                try:
+                    number = float(value.strip())
+                except ValueError:
+                    return value, f"{value[:40]!r} is not a number"
+                if not number.is_integer():
+                    return value, f"{value[:40]!r} is not an integer"
+                value = int(number)
+            else:
+                return value, f"expected {sql_type}, got {type(value).__name__}"
+        if not -bound <= value < bound:
+            return value, f"{value} out of {sql_type} range"
+        return value, None
+    return check
+
+
+def _decimal_checker(precision, scale):
+    limit = 10 ** (precision - scale)
+
+    def check(value):
+        if value is None:
+            return value, None
+        if isinstance(value, str):
+            try:
+                value = float(value.strip().replace(',', '.'))
+            except ValueError:
+                return value, f"{value[:40]!r} is not a number"
+        elif isinstance(value, bool) or not isinstance(value, (int, float)):
+            return value, f"expected DECIMAL({precision},{scale}), got {type(value).__name__}"
+        if isinstance(value, float) and not math.isfinite(value):
+            return value, f"{value} is not a finite number"
+        if abs(round(value, scale)) >= limit:
+            return value, f"{value} overflows DECIMAL({precision},{scale})"
+        return value, None
+    return check
+
+
+def _bool_checker(value):
+    if value is None or isinstance(value, bool):
+        return value, None
+    if value in (0, 1):
+        return bool(value), None
+    if isinstance(value, str) and value.strip().lower() in ('true', 'false', 't', 'f', '1', '0'):
+        return value.strip().lower() in ('true', 't', '1'), None
+    return value, f"{str(value)[:40]!r} is not a boolean"
+
+
+def _uuid_checker(value):
+    if value is None:
+        return value, None
+    try:
+        return str(uuid.UUID(str(value))), None
+    except ValueError:
+        return value, f"{str(value)[:40]!r} is not a UUID"
+
+
+def _column_checker(sql_type):
+    """Checker for one schema.sql column type, or None when nothing needs checking"""
+    varchar = re.match(r'VARCHAR\((\d+)\)', sql_type)
+    decimal = re.match(r'(?:DECIMAL|NUMERIC)\((\d+),(\d+)\)', sql_type)
+    if varchar:
+        return _text_checker(int(varchar.group(1)))
+    if sql_type == 'TEXT':
+        return _text_checker()
+    if sql_type in _INT_RANGES:
+        return _int_checker(sql_type)
+    if decimal:
+        return _decimal_checker(int(decimal.group(1)), int(decimal.group(2)))
+    if sql_type == 'BOOLEAN':
+        return _bool_checker
+    if sql_type == 'UUID':
+        return _uuid_checker
+    return None
+
+
+@lru_cache(maxsize=None)
+def schema_types():
+    """{table: {column: type}} from schema.sql, read once per process"""
+    with open(SCHEMA_PATH, 'r') as f:
+        return parse_schema(f.read())
+
+
+@lru_cache(maxsize=None)
+def row_validator(table):
+    """validate(row) -> (row, problems) for rows produced by TABLES[table].row
+
+    Key columns must be present. JSONB values are serialised by the
+    extractor already and need no check.
+    """
+    spec = TABLES[table]
+    types = schema_types().get(table, {})
+    checkers = [(i, col.name, _column_checker(types.get(col.name, '')))
+                for i, col in enumerate(spec.columns) if not col.jsonb]
+    checkers = [(i, name, check) for i, name, check in checkers if check]
+    keys = [(i, col.name) for i, col in enumerate(spec.columns) if col.name in spec.key]
+
+    def validate(row):
+        problems = [f"{name}: missing" for i, name in keys if row[i] in (None, '')]
+        fixed = None
+        for i, name, check in checkers:
+            value, problem = check(row[i])
+            if problem:
+                problems.append(f"{name}: {problem}")
+            elif value is not row[i]:
+                if fixed is None:
+                    fixed = list(row)
+                fixed[i] = value
+        return (tuple(fixed) if fixed else row), problems
+
+    return validate
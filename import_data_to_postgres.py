@@ -3,11 +3,22 @@
 Import Ainur extracted data into PostgreSQL
 """
 
+import argparse
+import io
 import json
 import os
+import re
 import psycopg2
-from psycopg2.extras import execute_values, Json
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from itertools import repeat
+
+from import_columns import (
+    TABLES, HASH_COLUMN, SCHEMA_PATH, check_schema, row_hash, row_validator
+)
+from snapshot_store import SnapshotReader, snapshot_path
+from month_shards import shards_current, shard_entries, read_shard
+from diff_snapshots import DIFF_TABLES, read_change_set
 
 # Configuration
 DB_CONFIG = {
@@ -22,10 +33,56 @@ DATA_DIR = '/Users/andriiliudvichuk/Projects/ainur-pos-clone/extracted_data'
 COMPANY_ID = '58c872aa3ce7d5fc688b49bd'
 USER_ID = '58c872aa3ce7d5fc688b49bc'
 
+# Row transformation for the large tables runs in worker processes
+IMPORT_WORKERS = int(os.environ.get('IMPORT_WORKERS', os.cpu_count() or 1))
+TRANSFORM_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', 2000))
+
+# Local day boundaries for the daily reporting aggregates
+REPORT_TIMEZONE = os.environ.get('REPORT_TIMEZONE', 'Europe/Kyiv')
+
+# 'copy' stages rows with COPY on the import connection, 'pipeline' through
+# the pooled pipelined connections of db_writer.py (needs psycopg 3)
+IMPORT_WRITER = os.environ.get('IMPORT_WRITER', 'copy')
+WRITER = None
+
+# Rows that fail validation are written here, one directory per run,
+# instead of aborting the load
+REJECT_DIR = os.path.join(os.environ.get('IMPORT_REJECT_DIR', os.path.join(DATA_DIR, '_rejects')),
+                          datetime.now().strftime('%Y%m%d_%H%M%S'))
+REJECTED = {}
+
+# Refuse to delete more than this share of a table's active rows in one
+# run; a truncated extraction otherwise looks like a mass deletion
+MAX_DELETE_FRACTION = float(os.environ.get('DELETE_MAX_FRACTION', 0.05))
+
+# Trigram indexes backing substring search in search.ts
+SEARCH_INDEXES = [
+    ('idx_products_name_trgm', 'products', 'name'),
+    ('idx_products_sku_trgm', 'products', 'sku'),
+    ('idx_products_barcode_trgm', 'products', 'barcode'),
+    ('idx_documents_search_trgm', 'documents', 'search_text'),
+]
+
+# B-tree indexes backing (date, _id) keyset paging in search.ts
+KEYSET_INDEXES = [
+    ('idx_documents_keyset', 'documents'),
+    ('idx_money_movements_keyset', 'money_movements'),
+]
+
 
 def load_json(filename):
-    """Load JSON file from extracted data directory"""
+    """Load JSON file from extracted data directory
+    
+    A snapshot written by the same extraction (documents.snap next to
+    documents.json) is read instead when it is at least as new.
+    """
     filepath = os.path.join(DATA_DIR, filename)
+    snapshot = snapshot_path(filepath)
+    if os.path.exists(snapshot) and (not os.path.exists(filepath) or
+                                     os.path.getmtime(snapshot) >= os.path.getmtime(filepath)):
+        with SnapshotReader(snapshot) as reader:
+            return list(reader)
+    
     if not os.path.exists(filepath):
         print(f"  ⚠️  File not found: {filename}")
         return []
@@ -47,112 +104,741 @@ def safe_get(obj, key, default=None):
     return obj.get(key, default)
 
 
+def copy_escape(value):
+    """Render a single value in PostgreSQL COPY text format"""
+    if value is None:
+        return '\\N'
+    if value is True:
+        return 't'
+    if value is False:
+        return 'f'
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, ensure_ascii=False)
+    else:
+        value = str(value)
+    return (value.replace('\\', '\\\\')
+                 .replace('\t', '\\t')
+                 .replace('\n', '\\n')
+                 .replace('\r', '\\r'))
+
+
+def transform_chunk(table, items, fmt='copy'):
+    """Validate a chunk of records and turn the good ones into a ready-to-COPY
+    text buffer (runs in a worker)
+    
+    Values are checked against the schema.sql column types; rows that
+    cannot be loaded are returned as rejects with their reasons instead.
+    With fmt='json' the buffer is a JSON array of row objects for
+    db_writer.py, hashed exactly like the COPY rows. Returns (buffer, rejects).
+    """
+    spec = TABLES[table]
+    row = spec.row
+    validate = row_validator(table)
+    lines, rejects = [], []
+    for item in items:
+        try:
+            values, problems = validate(row(item))
+        except Exception as e:
+            values, problems = None, [f"unreadable record: {e}"]
+        if problems:
+            _id = item.get('_id') if isinstance(item, dict) else None
+            rejects.append({'table': table, '_id': _id, 'problems': problems, 'record': item})
+            continue
+        fields = list(map(copy_escape, values))
+        if fmt == 'json':
+            lines.append(json_row(spec, values, row_hash(spec, fields)))
+        else:
+            lines.append('\t'.join(fields) + f"\t{row_hash(spec, fields)}")
+    if not lines:
+        return '', rejects
+    if fmt == 'json':
+        return '[' + ','.join(lines) + ']', rejects
+    return '\n'.join(lines) + '\n', rejects
+
+
+def json_row(spec, values, digest):
+    """One row as a JSON object; JSONB values are already encoded and go in as is"""
+    fields = [f'"{column.name}":' + (value if column.jsonb and value is not None
+                                     else json.dumps(value, ensure_ascii=False, default=str))
+              for column, value in zip(spec.columns, values)]
+    fields.append(f'"{HASH_COLUMN}":"{digest}"')
+    return '{' + ','.join(fields) + '}'
+
+
+def quarantine(table, result):
+    """COPY buffer of a transformed chunk; its rejects go to the table's reject file"""
+    buffer, rejects = result
+    if rejects:
+        os.makedirs(REJECT_DIR, exist_ok=True)
+        path = os.path.join(REJECT_DIR, f"{table}.rejects.ndjson")
+        with open(path, 'a', encoding='utf-8') as f:
+            for reject in rejects:
+                f.write(json.dumps(reject, ensure_ascii=False, default=str) + '\n')
+        REJECTED[table] = REJECTED.get(table, 0) + len(rejects)
+    return buffer
+
+
+def parallel_transform(data, table, fmt='copy', chunk_size=TRANSFORM_CHUNK_SIZE):
+    """Yield buffers for data, transforming chunks over a process pool"""
+    chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+    
+    if IMPORT_WORKERS <= 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            yield quarantine(table, transform_chunk(table, chunk, fmt))
+        return
+    
+    with ProcessPoolExecutor(max_workers=IMPORT_WORKERS) as pool:
+        for result in pool.map(transform_chunk, repeat(table), chunks, repeat(fmt)):
+            yield quarantine(table, result)
+
+
+def shard_transform(table, path, sha256, fmt='copy'):
+    """Read, check and transform one month shard (runs in a worker)"""
+    return transform_chunk(table, read_shard(path, sha256), fmt)
+
+
+def sharded_transform(table, entries, fmt='copy'):
+    """Yield one buffer per month shard, a shard per worker process"""
+    paths = [path for _, path, _ in entries]
+    hashes = [entry['sha256'] for _, _, entry in entries]
+    if IMPORT_WORKERS <= 1 or len(paths) <= 1:
+        for path, sha256 in zip(paths, hashes):
+            yield quarantine(table, shard_transform(table, path, sha256, fmt))
+        return
+    
+    with ProcessPoolExecutor(max_workers=IMPORT_WORKERS) as pool:
+        for result in pool.map(shard_transform, repeat(table), paths, hashes, repeat(fmt)):
+            yield quarantine(table, result)
+
+
+def copy_upsert(cursor, spec, buffers, before_upsert=None):
+    """COPY buffers into a staging table, then upsert them into the spec's table
+    
+    Existing rows are only rewritten when their content hash differs or the
+    incoming record is newer. before_upsert(cursor, stage) runs once the
+    batch is staged. Returns inserted/updated/unchanged counts.
+    """
+    stage = f"_stage_{spec.name}"
+    cursor.execute(f"""
+        CREATE TEMP TABLE {stage} (LIKE {spec.name} INCLUDING DEFAULTS) ON COMMIT DROP
+    """)
+    staged = 0
+    for buffer in buffers:
+        if buffer:
+            cursor.copy_expert(f"COPY {stage} ({spec.column_list}) FROM STDIN",
+                               io.StringIO(buffer))
+            staged += buffer.count('\n')
+    return upsert_staged(cursor, spec, stage, staged, before_upsert)
+
+
+def upsert_staged(cursor, spec, stage, staged, before_upsert=None):
+    """Upsert a filled staging table into the spec's table, then drop it"""
+    table = spec.name
+    column_list = spec.column_list
+    set_clause = ', '.join(f'"{c}" = EXCLUDED."{c}"'
+                           for c in spec.update + [HASH_COLUMN])
+    changed = f'{table}."{HASH_COLUMN}" IS DISTINCT FROM EXCLUDED."{HASH_COLUMN}"'
+    if 'updated' in spec.column_names:
+        changed += f' OR EXCLUDED.updated > {table}.updated'
+    
+    # Archived rows go first, so the hook only sees rows that are upserted
+    moved = archived = 0
+    if spec.partition_by:
+        archived = skip_archived(cursor, table, stage, spec.partition_by)
+    
+    if before_upsert:
+        before_upsert(cursor, stage)
+    
+    if spec.partition_by:
+        moved = prepare_partitions(cursor, table, stage, spec.partition_by)
+    
+    cursor.execute(f"""
+        WITH upserted AS (
+            INSERT INTO {table} ({column_list})
+            SELECT {column_list} FROM {stage}
+            ON CONFLICT ({', '.join(spec.key)}) DO UPDATE SET {set_clause}
+            WHERE {changed}
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted)
+        FROM upserted
+    """)
+    inserted, updated = cursor.fetchone()
+    cursor.execute(f"DROP TABLE {stage}")
+    
+    # Rows re-inserted into another partition were really updates
+    inserted, updated = inserted - moved, updated + moved
+    return {'inserted': inserted, 'updated': updated,
+            'unchanged': staged - archived - inserted - updated, 'archived': archived}
+
+
+def skip_archived(cursor, table, stage, column):
+    """Drop staged rows dated before the table's archive cutoff
+    
+    Their months were detached by detach_partitions, so loading them again
+    would land them in the default partition next to the archived copy.
+    Returns how many rows were skipped.
+    """
+    cursor.execute(f"""
+        DELETE FROM {stage} s USING partition_archive a
+        WHERE a.parent = %s AND s.{column} > 0 AND s.{column} < a.before
+    """, (table,))
+    return cursor.rowcount
+
+
+def prepare_partitions(cursor, table, stage, column):
+    """Create the monthly partitions a staged batch needs
+    
+    A record whose date changed upstream belongs to a different partition,
+    so its old row is removed first. Returns how many rows were moved.
+    """
+    cursor.execute(f"""
+        DELETE FROM {table} t USING {stage} s
+        WHERE t._id = s._id AND t.{column} <> s.{column}
+    """)
+    moved = cursor.rowcount
+    
+    cursor.execute(f"""
+        SELECT ensure_month_partition(%s, MIN({column})) FROM {stage}
+        GROUP BY date_trunc('month', to_timestamp({column}) AT TIME ZONE 'UTC')
+    """, (table,))
+    return moved
+
+
+def detach_partitions(cursor, table, before, archive_schema=None):
+    """Detach the monthly partitions of table that end before the YYYY-MM month
+    
+    Detached partitions stay as plain tables (optionally moved into
+    archive_schema) and can be dumped, dropped or attached again later.
+    The cutoff is recorded in partition_archive so later imports skip the
+    archived months instead of loading them into the default partition.
+    """
+    cursor.execute("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+        ORDER BY c.relname
+    """, (table,))
+    cutoff = f"{table}_{before.replace('-', '_')}"
+    
+    detached = []
+    for (name,) in cursor.fetchall():
+        if name == f"{table}_default" or name >= cutoff:
+            continue
+        cursor.execute(f'ALTER TABLE {table} DETACH PARTITION "{name}"')
+        if archive_schema:
+            cursor.execute(f'CREATE SCHEMA IF NOT EXISTS "{archive_schema}"')
+            cursor.execute(f'ALTER TABLE "{name}" SET SCHEMA "{archive_schema}"')
+        detached.append(name)
+    
+    start = datetime.strptime(before, '%Y-%m').replace(tzinfo=timezone.utc)
+    cursor.execute("""
+        INSERT INTO partition_archive (parent, before) VALUES (%s, %s)
+        ON CONFLICT (parent) DO UPDATE
+        SET before = GREATEST(partition_archive.before, EXCLUDED.before)
+    """, (table, int(start.timestamp())))
+    return detached
+
+
+# Sign of a document's unpaid remainder (sum - paid) in the counterparty's
+# debt, and of a free-standing money movement (no _document) by direction
+DEBT_RULES = {
+    'customers': {
+        'party': 'clients',
+        'documents': {'sales': 1, 'return_sales': -1},
+        'movements': {'credit': -1, 'debit': 1},
+    },
+    'suppliers': {
+        'party': 'suppliers',
+        'documents': {'purchases': 1, 'return_purchases': -1},
+        'movements': {'debit': -1, 'credit': 1},
+    },
+}
+
+
+def recompute_debts(cursor):
+    """Derive customer and supplier debt from documents and money movements
+    
+    One set-based pass per table: unpaid document remainders plus payments
+    not tied to a document, grouped by the counterparty in from/to. Only
+    rows whose debt actually changes are updated; counterparties without
+    any history keep their snapshot value. Returns {table: rows updated}.
+    """
+    updated = {}
+    for table, rules in DEBT_RULES.items():
+        party = rules['party']
+        counterparty = f"""COALESCE(
+            CASE WHEN "to"->>'type' = '{party}' THEN "to"->>'_id' END,
+            CASE WHEN "from"->>'type' = '{party}' THEN "from"->>'_id' END)"""
+        doc_sign = ' '.join(f"WHEN '{t}' THEN {sign}" for t, sign in rules['documents'].items())
+        money_sign = ' '.join(f"WHEN '{t}' THEN {sign}" for t, sign in rules['movements'].items())
+        
+        cursor.execute(f"""
+            WITH flows AS (
+                SELECT {counterparty} AS party,
+                       (CASE type {doc_sign} END) * (COALESCE(sum, 0) - COALESCE(paid, 0)) AS amount
+                FROM documents
+                WHERE _client = %(client)s AND NOT deleted
+                  AND type = ANY(%(doc_types)s)
+                UNION ALL
+                SELECT {counterparty} AS party,
+                       (CASE type {money_sign} END) * COALESCE(sum, 0) AS amount
+                FROM money_movements
+                WHERE _client = %(client)s AND NOT deleted
+                  AND COALESCE(_document, '') = ''
+                  AND type = ANY(%(money_types)s)
+            ),
+            debts AS (
+                SELECT party, ROUND(SUM(amount), 2) AS debt
+                FROM flows WHERE party IS NOT NULL
+                GROUP BY party
+            )
+            UPDATE {table} t SET debt = debts.debt
+            FROM debts
+            WHERE t._id = debts.party AND t.debt IS DISTINCT FROM debts.debt
+        """, {'client': COMPANY_ID,
+              'doc_types': list(rules['documents']),
+              'money_types': list(rules['movements'])})
+        updated[table] = cursor.rowcount
+    return updated
+
+
+def ensure_search_indexes(cursor):
+    """Make sure the search column, trigram and keyset indexes exist
+    
+    schema.sql creates them on a fresh database; this brings databases
+    created before they were added up to date without a reset.
+    """
+    cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    cursor.execute("ALTER TABLE documents ADD COLUMN IF NOT EXISTS search_text TEXT")
+    for name, table, column in SEARCH_INDEXES:
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS {name} ON {table} USING GIN({column} gin_trgm_ops)
+        """)
+    for name, table in KEYSET_INDEXES:
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS {name} ON {table} (_client, date DESC, _id DESC)
+        """)
+
+
+def schema_table(schema_sql, table):
+    """schema.sql's CREATE TABLE statement for table, made idempotent"""
+    statement = re.search(rf'CREATE TABLE {table} \(.*?\n\)[^;]*;', schema_sql, re.S).group(0)
+    return statement.replace('CREATE TABLE', 'CREATE TABLE IF NOT EXISTS', 1)
+
+
+def schema_indexes(schema_sql, table):
+    """schema.sql's CREATE INDEX statements on table, made idempotent"""
+    return [statement.replace('CREATE INDEX', 'CREATE INDEX IF NOT EXISTS', 1)
+            for statement in re.findall(rf'CREATE INDEX \w+ ON {table}\b[^;]*;', schema_sql)]
+
+
+def ensure_partitioning(cursor, schema_sql):
+    """Range-partition documents and money_movements created before partitioning
+    
+    The plain table is renamed, the partitioned one is created from
+    schema.sql, the monthly partitions its rows need are created and the
+    rows are copied over before the old table is dropped.
+    """
+    functions = re.search(r'CREATE OR REPLACE FUNCTION ensure_month_partition.*?LANGUAGE plpgsql;',
+                          schema_sql, re.S)
+    cursor.execute(functions.group(0))
+    cursor.execute(schema_table(schema_sql, 'partition_archive'))
+    cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    
+    for table in ['documents', 'money_movements']:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+        if cursor.fetchone()[0] != 'r':
+            continue
+        old = f"_{table}_unpartitioned"
+        cursor.execute(f"ALTER TABLE {table} RENAME TO {old}")
+        cursor.execute(f"ALTER INDEX IF EXISTS {table}_pkey RENAME TO {old}_pkey")
+        cursor.execute(schema_table(schema_sql, table))
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT")
+        
+        cursor.execute("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = %s
+        """, (old,))
+        existing = {name for (name,) in cursor.fetchall()}
+        columns = [c for c in TABLES[table].column_names if c in existing]
+        column_list = ', '.join(f'"{c}"' for c in columns)
+        select_list = ', '.join('COALESCE(date, 0)' if c == 'date' else f'"{c}"'
+                                for c in columns)
+        
+        cursor.execute(f"""
+            SELECT ensure_month_partition(%s, MIN(date)) FROM {old}
+            GROUP BY date_trunc('month', to_timestamp(date) AT TIME ZONE 'UTC')
+        """, (table,))
+        cursor.execute(f"INSERT INTO {table} ({column_list}) SELECT {select_list} FROM {old}")
+        moved = cursor.rowcount
+        cursor.execute(f"DROP TABLE {old}")
+        for statement in schema_indexes(schema_sql, table):
+            cursor.execute(statement)
+        print(f"   ✅ {table} partitioned by month ({moved:,} rows moved)")
+
+
+def ensure_daily_aggregates(cursor, schema_sql):
+    """Create daily_sales / daily_product_sales on databases that predate them
+    
+    Newly created tables are filled from all of documents right away, since
+    the incremental refresh only covers the store-days an import touches.
+    """
+    cursor.execute("SELECT to_regclass('public.daily_sales') IS NULL")
+    missing = cursor.fetchone()[0]
+    for table in ['daily_sales', 'daily_product_sales']:
+        cursor.execute(schema_table(schema_sql, table))
+        for statement in schema_indexes(schema_sql, table):
+            cursor.execute(statement)
+    if missing:
+        days = refresh_daily_aggregates(cursor, rebuild=True)
+        print(f"   ✅ Daily aggregates created for {days:,} store-days")
+
+
+def ensure_hash_columns(cursor):
+    """Add the content hash column to tables created before it existed
+    
+    Existing rows get a NULL hash, so the next import rewrites them once.
+    """
+    for spec in TABLES.values():
+        cursor.execute(f'''
+            ALTER TABLE {spec.name} ADD COLUMN IF NOT EXISTS "{HASH_COLUMN}" VARCHAR(32)
+        ''')
+
+
+def ensure_schema(cursor, reset=False):
+    """Check the column specs against schema.sql and create the schema if needed"""
+    with open(SCHEMA_PATH, 'r') as f:
+        schema_sql = f.read()
+    
+    # The column specs must match the schema the tables come from
+    problems = check_schema(schema_sql)
+    if problems:
+        for problem in problems:
+            print(f"   ❌ {problem}")
+        raise RuntimeError("Column specs are out of sync with schema.sql")
+    
+    # schema.sql drops every table, so only run it on a fresh database
+    # or when asked; re-imports then only write rows that changed
+    cursor.execute("SELECT to_regclass('public.documents') IS NULL")
+    if reset or cursor.fetchone()[0]:
+        print("\n📐 Running database schema...")
+        cursor.execute(schema_sql)
+        print("   ✅ Schema created!")
+    
+    # Databases created from an older schema.sql are brought up to date
+    ensure_partitioning(cursor, schema_sql)
+    ensure_hash_columns(cursor)
+    ensure_search_indexes(cursor)
+    ensure_daily_aggregates(cursor, schema_sql)
+
+
+def upsert_buffers(cursor, table, buffers, before_upsert=None):
+    """Stage buffers(fmt) with the active writer and upsert them"""
+    spec = TABLES[table]
+    if WRITER is not None:
+        stage, staged = WRITER.stage(spec, buffers('json'))
+        return upsert_staged(cursor, spec, stage, staged, before_upsert)
+    return copy_upsert(cursor, spec, buffers('copy'), before_upsert)
+
+
+def import_table(cursor, table, data, before_upsert=None):
+    """Transform records with the table's column spec and upsert them"""
+    chunk_size = WRITER.batch_rows if WRITER is not None else TRANSFORM_CHUNK_SIZE
+    return upsert_buffers(cursor, table,
+                          lambda fmt: parallel_transform(data, table, fmt, chunk_size),
+                          before_upsert)
+
+
+def import_dated(cursor, table, months=None, before_upsert=None):
+    """Import a dated table from its month shards when they are current
+    
+    With months only those shards are loaded; otherwise the whole table
+    comes from the shards, or from <table>.json when there are none.
+    """
+    if not months and not shards_current(DATA_DIR, table):
+        return import_table(cursor, table, load_json(f"{table}.json"), before_upsert)
+    
+    entries = shard_entries(DATA_DIR, table, months)
+    missing = sorted(set(months or []) - {month for month, _, _ in entries})
+    if missing:
+        print(f"   ⚠️  No {table} records for {', '.join(missing)}")
+    print(f"   {len(entries):,} month shards, "
+          f"{sum(entry['count'] for _, _, entry in entries):,} records")
+    return upsert_buffers(cursor, table, lambda fmt: sharded_transform(table, entries, fmt),
+                          before_upsert)
+
+
+def open_writer(name):
+    """PipelinedWriter for --writer pipeline, or None to COPY on the import connection"""
+    if name != 'pipeline':
+        return None
+    try:
+        from db_writer import PipelinedWriter
+    except ImportError as e:
+        print(f"   ⚠️  Pipelined writer unavailable ({e}), staging with COPY")
+        return None
+    writer = PipelinedWriter(DB_CONFIG)
+    print(f"   ✅ Pipelined writer: {writer.connections} connections, "
+          f"{writer.batch_rows:,} rows per batch, {writer.in_flight} batches in flight")
+    return writer
+
+
+def create_affected_days(cursor):
+    """Temp table of store-days whose daily aggregates need a refresh"""
+    cursor.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS _affected_days (
+            _client VARCHAR(24), store VARCHAR(24), day DATE
+        ) ON COMMIT DROP
+    """)
+
+
+def stage_ids(cursor, name, ids):
+    """COPY a set of _ids into a temp table with a primary key"""
+    cursor.execute(f"CREATE TEMP TABLE {name} (_id TEXT PRIMARY KEY) ON COMMIT DROP")
+    cursor.copy_expert(f"COPY {name} FROM STDIN",
+                       io.StringIO(''.join(f"{copy_escape(i)}\n" for i in set(ids))))
+
+
+def mark_deleted(cursor, table, match, params=None):
+    """Mark the not yet deleted rows of table matching the SQL condition on t
+    
+    The content hash is cleared so a record that reappears upstream is
+    rewritten by the next upsert, which also writes its deleted flag back.
+    Returns rows marked.
+    """
+    if table == 'documents':
+        create_affected_days(cursor)
+        cursor.execute(f"""
+            INSERT INTO _affected_days
+            SELECT t._client, COALESCE(t.store, ''),
+                   (to_timestamp(t.date) AT TIME ZONE %(tz)s)::date
+            FROM documents t
+            WHERE NOT t.deleted AND {match}
+        """, dict(params or {}, tz=REPORT_TIMEZONE))
+    
+    cursor.execute(f"""
+        UPDATE {table} t SET deleted = true, "{HASH_COLUMN}" = NULL
+        WHERE NOT t.deleted AND {match}
+    """, params)
+    return cursor.rowcount
+
+
+def soft_delete(cursor, table, ids, max_fraction=None):
+    """Mark this company's rows of table whose _id is in ids as deleted
+    
+    When more than max_fraction of the active rows would go, nothing is
+    marked. Returns (matched, active, marked).
+    """
+    stage_ids(cursor, '_delete_ids', ids)
+    listed = """t._client = %(client)s
+                AND EXISTS (SELECT 1 FROM _delete_ids d WHERE d._id = t._id)"""
+    params = {'client': COMPANY_ID}
+    
+    cursor.execute(f"""
+        SELECT COUNT(*) FILTER (WHERE {listed}), COUNT(*)
+        FROM {table} t WHERE NOT t.deleted AND t._client = %(client)s
+    """, params)
+    count, active = cursor.fetchone()
+    
+    marked = 0
+    if count and (max_fraction is None or count <= max_fraction * active):
+        marked = mark_deleted(cursor, table, listed, params)
+    cursor.execute("DROP TABLE _delete_ids")
+    return count, active, marked
+
+
+def propagate_deletions(cursor, table, live_ids, max_fraction=None):
+    """Soft-delete this company's imported rows of table whose _id is not in live_ids
+    
+    live_ids must be the complete set of ids that still exist upstream.
+    Missing rows are found with one anti-join against a temp table. Only
+    rows the importer wrote (they carry a content hash) are considered;
+    rows the backend created itself never existed upstream. When more than
+    max_fraction of the active imported rows would go, nothing is marked.
+    Returns (missing, active, marked).
+    """
+    stage_ids(cursor, '_live_ids', live_ids)
+    missing = f"""t._client = %(client)s AND t."{HASH_COLUMN}" IS NOT NULL
+                  AND NOT EXISTS (SELECT 1 FROM _live_ids l WHERE l._id = t._id)"""
+    params = {'client': COMPANY_ID}
+    
+    cursor.execute(f"""
+        SELECT COUNT(*) FILTER (WHERE {missing}), COUNT(*)
+        FROM {table} t
+        WHERE NOT t.deleted AND t._client = %(client)s AND t."{HASH_COLUMN}" IS NOT NULL
+    """, params)
+    count, active = cursor.fetchone()
+    
+    marked = 0
+    if count and (max_fraction is None or count <= max_fraction * active):
+        marked = mark_deleted(cursor, table, missing, params)
+    cursor.execute("DROP TABLE _live_ids")
+    return count, active, marked
+
+
+def apply_changes(cursor, changes_dir, max_fraction=MAX_DELETE_FRACTION):
+    """Apply a diff_snapshots.py change set: upsert changed records, mark deletions
+    
+    A table whose deletions exceed max_fraction of its active rows keeps
+    them all (None lifts the limit). Returns per-table counts like the full
+    import, plus 'deleted'.
+    """
+    results = {}
+    for table in DIFF_TABLES:
+        upserts, deleted = read_change_set(changes_dir, table)
+        if not upserts and not deleted:
+            continue
+        hook = track_affected_days if table == 'documents' else None
+        counts = import_table(cursor, table, upserts, hook)
+        counts['deleted'] = 0
+        if deleted and 'deleted' in TABLES[table].column_names:
+            matched, active, counts['deleted'] = soft_delete(cursor, table, deleted, max_fraction)
+            if matched and not counts['deleted']:
+                print(f"   ⚠️  {table}: not deleting {matched:,} of {active:,} active rows, "
+                      f"more than {max_fraction:.0%}; check the extraction or use --force")
+        print(f"   ✅ {table:20s}: {counts['inserted']:,} inserted, {counts['updated']:,} updated, "
+              f"{counts['deleted']:,} deleted")
+        results[table] = counts
+    
+    if 'documents' in results:
+        days = refresh_daily_aggregates(cursor)
+        print(f"   ✅ Daily aggregates refreshed for {days:,} store-days")
+    return results
+
+
+def track_affected_days(cursor, stage):
+    """Record the store-days touched by new or changed staged documents
+    
+    Both the incoming and the currently stored version count, so a document
+    that moved to another day or store refreshes both places.
+    """
+    create_affected_days(cursor)
+    cursor.execute(f"""
+        WITH changed AS (
+            SELECT s._client AS new_client, s.store AS new_store, s.date AS new_date,
+                   d._client AS old_client, d.store AS old_store, d.date AS old_date
+            FROM {stage} s
+            LEFT JOIN documents d ON d._id = s._id
+            WHERE d._id IS NULL
+               OR d._hash IS DISTINCT FROM s._hash
+               OR s.updated > d.updated
+        )
+        INSERT INTO _affected_days
+        SELECT new_client, COALESCE(new_store, ''),
+               (to_timestamp(new_date) AT TIME ZONE %(tz)s)::date FROM changed
+        UNION
+        SELECT old_client, COALESCE(old_store, ''),
+               (to_timestamp(old_date) AT TIME ZONE %(tz)s)::date FROM changed
+        WHERE old_date IS NOT NULL
+    """, {'tz': REPORT_TIMEZONE})
+
+
+def refresh_daily_aggregates(cursor, rebuild=False):
+    """Recompute daily_sales / daily_product_sales for the affected store-days
+    
+    With rebuild=True every store-day in documents is recomputed.
+    Returns the number of store-days refreshed.
+    """
+    create_affected_days(cursor)
+    if rebuild:
+        cursor.execute("""
+            INSERT INTO _affected_days
+            SELECT DISTINCT _client, COALESCE(store, ''),
+                   (to_timestamp(date) AT TIME ZONE %(tz)s)::date
+            FROM documents
+        """, {'tz': REPORT_TIMEZONE})
+    
+    # Day boundaries as epoch seconds so documents are found by date range
+    cursor.execute("""
+        CREATE TEMP TABLE _refresh_days ON COMMIT DROP AS
+        SELECT DISTINCT _client, store, day,
+               EXTRACT(EPOCH FROM day::timestamp AT TIME ZONE %(tz)s)::BIGINT AS day_start,
+               EXTRACT(EPOCH FROM (day + 1)::timestamp AT TIME ZONE %(tz)s)::BIGINT AS day_end
+        FROM _affected_days
+    """, {'tz': REPORT_TIMEZONE})
+    refreshed = cursor.rowcount
+    
+    for table in ['daily_sales', 'daily_product_sales']:
+        cursor.execute(f"""
+            DELETE FROM {table} t USING _refresh_days r
+            WHERE t._client = r._client AND t.store = r.store AND t.day = r.day
+        """)
+    
+    affected_documents = """
+        FROM _refresh_days r
+        JOIN documents doc ON doc._client = r._client
+                          AND COALESCE(doc.store, '') = r.store
+                          AND doc.date >= r.day_start AND doc.date < r.day_end
+    """
+    cursor.execute(f"""
+        INSERT INTO daily_sales (_client, store, day, type, count, sum, paid, discount, tax)
+        SELECT r._client, r.store, r.day, doc.type, COUNT(*),
+               COALESCE(SUM(doc.sum), 0), COALESCE(SUM(doc.paid), 0),
+               COALESCE(SUM(doc.discount_sum), 0), COALESCE(SUM(doc.tax_total), 0)
+        {affected_documents}
+        WHERE NOT doc.deleted
+        GROUP BY r._client, r.store, r.day, doc.type
+    """)
+    cursor.execute(f"""
+        INSERT INTO daily_product_sales (_client, product, store, day, type, qty, revenue, cost)
+        SELECT r._client, line.product, r.store, r.day, doc.type,
+               SUM(line.qty), SUM(line.qty * line.price),
+               SUM(line.qty * COALESCE(line.cost, p.cost, 0))
+        {affected_documents}
+        CROSS JOIN LATERAL (
+            SELECT COALESCE(item->>'_id', item->'product'->>'_id') AS product,
+                   ABS(COALESCE(NULLIF(item->>'qty', '')::numeric, 0)) AS qty,
+                   COALESCE(NULLIF(item->>'price', '')::numeric, 0) AS price,
+                   NULLIF(item->>'cost', '')::numeric AS cost
+            FROM jsonb_array_elements(CASE WHEN jsonb_typeof(doc.products) = 'array'
+                                           THEN doc.products ELSE '[]' END) item
+        ) line
+        LEFT JOIN products p ON p._id = line.product
+        WHERE NOT doc.deleted AND line.product IS NOT NULL
+        GROUP BY r._client, line.product, r.store, r.day, doc.type
+    """)
+    
+    cursor.execute("DROP TABLE _refresh_days")
+    cursor.execute("TRUNCATE _affected_days")
+    return refreshed
+
+
+def report(counts, label):
+    """Print the per-table upsert outcome"""
+    print(f"   ✅ {label}: {counts['inserted']:,} inserted, "
+          f"{counts['updated']:,} updated, {counts['unchanged']:,} unchanged")
+    if counts.get('archived'):
+        print(f"   🗄️  {counts['archived']:,} rows before the archive cutoff skipped")
+    return counts
+
+
 def import_stores(cursor):
     """Import stores"""
     print("\n🏪 Importing STORES...")
     data = load_json('stores.json')
-    
-    for item in data:
-        cursor.execute("""
-            INSERT INTO stores (_id, uuid, _user, _client, _register, _app, name, shortname, 
-                              address, description, type, "default", include, balance, 
-                              bank_details, taxes, info, _stat_docs, created, updated, 
-                              created_ms, deleted)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 
-                   %s, %s, %s, %s)
-            ON CONFLICT (_id) DO UPDATE SET
-                name = EXCLUDED.name,
-                address = EXCLUDED.address,
-                balance = EXCLUDED.balance,
-                updated = EXCLUDED.updated
-        """, (
-            item.get('_id'),
-            item.get('uuid'),
-            item.get('_user'),
-            item.get('_client', COMPANY_ID),
-            item.get('_register'),
-            item.get('_app'),
-            item.get('name'),
-            item.get('shortname'),
-            item.get('address'),
-            item.get('description'),
-            item.get('type', 'store'),
-            item.get('default', False),
-            item.get('include', True),
-            Json(item.get('balance', {})),
-            Json(item.get('bank_details', [])),
-            Json(item.get('taxes', [])),
-            Json(item.get('info', {})),
-            Json(item.get('_stat_docs', {})),
-            item.get('created'),
-            item.get('updated'),
-            item.get('created_ms'),
-            item.get('deleted', False)
-        ))
-    
-    print(f"   ✅ Imported {len(data)} stores")
-    return len(data)
+    return report(import_table(cursor, 'stores', data), "Stores")
 
 
 def import_accounts(cursor):
     """Import financial accounts"""
     print("\n🏦 Importing ACCOUNTS...")
     data = load_json('accounts.json')
-    
-    for item in data:
-        cursor.execute("""
-            INSERT INTO accounts (_id, uuid, _user, _client, _app, name, type, balance,
-                                bank_details, include, use_terminal, created, updated, 
-                                created_ms, deleted)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (_id) DO UPDATE SET
-                name = EXCLUDED.name,
-                balance = EXCLUDED.balance,
-                updated = EXCLUDED.updated
-        """, (
-            item.get('_id'),
-            item.get('uuid'),
-            item.get('_user'),
-            item.get('_client', COMPANY_ID),
-            item.get('_app'),
-            item.get('name'),
-            item.get('type'),
-            Json(item.get('balance', {})),
-            Json(item.get('bank_details', [])),
-            item.get('include', True),
-            item.get('use_terminal', False),
-            item.get('created'),
-            item.get('updated'),
-            item.get('created_ms'),
-            item.get('deleted', False)
-        ))
-    
-    print(f"   ✅ Imported {len(data)} accounts")
-    return len(data)
+    return report(import_table(cursor, 'accounts', data), "Accounts")
 
 
 def import_money_sources(cursor):
     """Import money sources (payment methods)"""
     print("\n💳 Importing MONEY SOURCES...")
     data = load_json('money_sources.json')
-    
-    for item in data:
-        cursor.execute("""
-            INSERT INTO money_sources (_id, id, title, type, country)
-            VALUES (%s, %s, %s, %s, %s)
-            ON CONFLICT (_id) DO UPDATE SET
-                title = EXCLUDED.title,
-                type = EXCLUDED.type
-        """, (
-            item.get('_id'),
-            item.get('id'),
-            item.get('title'),
-            item.get('type'),
-            item.get('country')
-        ))
-    
-    print(f"   ✅ Imported {len(data)} money sources")
-    return len(data)
+    return report(import_table(cursor, 'money_sources', data), "Money sources")
+
+
+def category_records(data):
+    """Categories from Ainur are just strings, we need to create records
+    with an ID generated from the category position"""
+    return [{'_id': f"cat_{i:05d}", 'name': name, 'sort_order': i}
+            for i, name in enumerate(data) if isinstance(name, str)]
 
 
 def import_categories(cursor):
@@ -160,304 +846,90 @@ def import_categories(cursor):
     print("\n📁 Importing CATEGORIES...")
     data = load_json('categories.json')
     
-    # Categories from Ainur are just strings, we need to create records
-    for i, category_name in enumerate(data):
-        if isinstance(category_name, str):
-            # Generate an ID based on the category name
-            cat_id = f"cat_{i:05d}"
-            cursor.execute("""
-                INSERT INTO categories (_id, _client, name, sort_order, deleted)
-                VALUES (%s, %s, %s, %s, %s)
-                ON CONFLICT (_id) DO UPDATE SET
-                    name = EXCLUDED.name
-            """, (
-                cat_id,
-                COMPANY_ID,
-                category_name,
-                i,
-                False
-            ))
-    
-    print(f"   ✅ Imported {len(data)} categories")
-    return len(data)
+    return report(import_table(cursor, 'categories', category_records(data)), "Categories")
 
 
 def import_products(cursor):
     """Import products"""
     print("\n📦 Importing PRODUCTS...")
     data = load_json('products.json')
-    
-    batch = []
-    for item in data:
-        batch.append((
-            item.get('_id'),
-            item.get('uuid'),
-            item.get('_user'),
-            item.get('_client', COMPANY_ID),
-            item.get('_app'),
-            item.get('name', '')[:500],  # Truncate to fit
-            item.get('sku'),
-            item.get('barcode'),
-            item.get('code'),
-            item.get('type', 'inventory'),
-            item.get('price', 0),
-            item.get('cost', 0),
-            item.get('purchase', 0),
-            item.get('discount', 0),
-            item.get('total_stock', 0),
-            Json(item.get('stock', {})),
-            Json(item.get('_stock', [])),
-            Json(item.get('store_prices', {})),
-            Json(item.get('_store_prices', [])),
-            Json(item.get('categories', [])),
-            item.get('unit'),
-            item.get('country'),
-            item.get('supplier'),
-            item.get('description'),
-            item.get('pic'),
-            Json(item.get('taxes', [])),
-            item.get('tax_free', False),
-            item.get('free_price', False),
-            item.get('is_weighed', False),
-            Json(item.get('component', [])),
-            Json(item.get('container', [])),
-            item.get('imported') if isinstance(item.get('imported'), int) else None,
-            item.get('id_group'),
-            item.get('created'),
-            item.get('updated'),
-            item.get('created_ms'),
-            item.get('deleted', False)
-        ))
-    
-    # Bulk insert using execute_values for better performance
-    execute_values(cursor, """
-        INSERT INTO products (_id, uuid, _user, _client, _app, name, sku, barcode, code,
-                            type, price, cost, purchase, discount, total_stock, stock,
-                            _stock, store_prices, _store_prices, categories, unit, country,
-                            supplier, description, pic, taxes, tax_free, free_price,
-                            is_weighed, component, container, imported, id_group,
-                            created, updated, created_ms, deleted)
-        VALUES %s
-        ON CONFLICT (_id) DO UPDATE SET
-            name = EXCLUDED.name,
-            price = EXCLUDED.price,
-            cost = EXCLUDED.cost,
-            total_stock = EXCLUDED.total_stock,
-            stock = EXCLUDED.stock,
-            updated = EXCLUDED.updated
-    """, batch, page_size=500)
-    
-    print(f"   ✅ Imported {len(data)} products")
-    return len(data)
+    return report(import_table(cursor, 'products', data), "Products")
 
 
 def import_customers(cursor):
     """Import customers"""
     print("\n👥 Importing CUSTOMERS...")
     data = load_json('customers.json')
-    
-    for item in data:
-        cursor.execute("""
-            INSERT INTO customers (_id, uuid, _user, _client, _app, name, type, sex,
-                                 description, address, phones, emails, bank_details,
-                                 details, discount, discount_card, loyalty_type,
-                                 cashback_rate, bonus_balance, bonus_spent, debt,
-                                 enable_savings, bday, "default", info, created, updated,
-                                 created_ms, deleted)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                   %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (_id) DO UPDATE SET
-                name = EXCLUDED.name,
-                phones = EXCLUDED.phones,
-                emails = EXCLUDED.emails,
-                debt = EXCLUDED.debt,
-                updated = EXCLUDED.updated
-        """, (
-            item.get('_id'),
-            item.get('uuid'),
-            item.get('_user'),
-            item.get('_client', COMPANY_ID),
-            item.get('_app'),
-            item.get('name', 'Unknown'),
-            item.get('type', 'person'),
-            item.get('sex'),
-            item.get('description'),
-            Json(item.get('address')) if isinstance(item.get('address'), dict) else item.get('address'),
-            Json(item.get('phones', [])),
-            Json(item.get('emails', [])),
-            Json(item.get('bank_details', [])),
-            Json(item.get('details') if item.get('details') else []),
-            item.get('discount', 0),
-            item.get('discount_card'),
-            item.get('loyalty_type'),
-            item.get('cashback_rate', 0),
-            item.get('bonus_balance', 0),
-            item.get('bonus_spent', 0),
-            item.get('debt', 0),
-            item.get('enable_savings', False),
-            item.get('bday'),
-            item.get('default', False),
-            Json(item.get('info', {})),
-            item.get('created'),
-            item.get('updated'),
-            item.get('created_ms'),
-            item.get('deleted', False)
-        ))
-    
-    print(f"   ✅ Imported {len(data)} customers")
-    return len(data)
+    return report(import_table(cursor, 'customers', data), "Customers")
 
 
 def import_suppliers(cursor):
     """Import suppliers"""
     print("\n🏭 Importing SUPPLIERS...")
     data = load_json('suppliers.json')
-    
-    for item in data:
-        cursor.execute("""
-            INSERT INTO suppliers (_id, uuid, _user, _client, _app, name, site, address,
-                                 description, phones, emails, bank_details, details,
-                                 debt, rdebt, "default", created, updated, created_ms, deleted)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                   %s, %s, %s)
-            ON CONFLICT (_id) DO UPDATE SET
-                name = EXCLUDED.name,
-                phones = EXCLUDED.phones,
-                emails = EXCLUDED.emails,
-                debt = EXCLUDED.debt,
-                updated = EXCLUDED.updated
-        """, (
-            item.get('_id'),
-            item.get('uuid'),
-            item.get('_user'),
-            item.get('_client', COMPANY_ID),
-            item.get('_app'),
-            item.get('name', 'Unknown'),
-            item.get('site'),
-            Json(item.get('address')) if isinstance(item.get('address'), dict) else item.get('address'),
-            item.get('description'),
-            Json(item.get('phones', [])),
-            Json(item.get('emails', [])),
-            Json(item.get('bank_details', [])),
-            Json(item.get('details') if item.get('details') else {}),
-            item.get('debt', 0),
-            item.get('rdebt', 0),
-            item.get('default', False),
-            item.get('created'),
-            item.get('updated'),
-            item.get('created_ms'),
-            item.get('deleted', False)
-        ))
-    
-    print(f"   ✅ Imported {len(data)} suppliers")
-    return len(data)
-
-
-def import_documents(cursor):
+    return report(import_table(cursor, 'suppliers', data), "Suppliers")
+
+
+def import_documents(cursor, months=None):
     """Import documents (sales, purchases, movements, etc.)"""
     print("\n📄 Importing DOCUMENTS...")
-    data = load_json('documents.json')
-    
-    batch = []
-    for item in data:
-        batch.append((
-            item.get('_id'),
-            item.get('uuid'),
-            item.get('_user'),
-            item.get('_client', COMPANY_ID),
-            item.get('_shift'),
-            item.get('_app'),
-            item.get('type', 'sale'),
-            item.get('number'),
-            item.get('status', True),
-            item.get('date'),
-            item.get('store'),
-            Json(item.get('from', {})),
-            Json(item.get('to', {})),
-            item.get('sum', 0),
-            item.get('paid', 0),
-            item.get('discount_percent', 0),
-            item.get('discount_sum', 0),
-            item.get('tax_total', 0),
-            Json(item.get('products', [])),
-            Json(item.get('payments', [])),
-            item.get('notes'),
-            item.get('comment'),
-            Json(item.get('info', {})),
-            item.get('created'),
-            item.get('updated'),
-            item.get('created_ms'),
-            item.get('deleted', False)
-        ))
-    
-    # Bulk insert
-    execute_values(cursor, """
-        INSERT INTO documents (_id, uuid, _user, _client, _shift, _app, type, number,
-                             status, date, store, "from", "to", sum, paid, discount_percent,
-                             discount_sum, tax_total, products, payments, notes, comment,
-                             info, created, updated, created_ms, deleted)
-        VALUES %s
-        ON CONFLICT (_id) DO UPDATE SET
-            status = EXCLUDED.status,
-            sum = EXCLUDED.sum,
-            paid = EXCLUDED.paid,
-            updated = EXCLUDED.updated
-    """, batch, page_size=500)
-    
-    print(f"   ✅ Imported {len(data)} documents")
-    return len(data)
-
-
-def import_money_movements(cursor):
+    counts = report(import_dated(cursor, 'documents', months, track_affected_days),
+                    "Documents")
+    
+    days = refresh_daily_aggregates(cursor)
+    print(f"   ✅ Daily aggregates refreshed for {days:,} store-days")
+    return counts
+
+
+def import_money_movements(cursor, months=None):
     """Import money movements (financial transactions)"""
     print("\n💵 Importing MONEY MOVEMENTS...")
-    data = load_json('money_movements.json')
-    
-    batch = []
-    for item in data:
-        batch.append((
-            item.get('_id'),
-            item.get('uuid'),
-            item.get('_user'),
-            item.get('_client', COMPANY_ID),
-            item.get('_document'),
-            item.get('_shift'),
-            item.get('_app'),
-            item.get('type', 'debit'),
-            item.get('sum', 0),
-            item.get('date'),
-            Json(item.get('from', {})),
-            Json(item.get('to', {})),
-            item.get('account'),
-            Json(item.get('source', {})),
-            item.get('reason'),
-            item.get('description'),
-            item.get('comment'),
-            Json(item.get('info', {})),
-            item.get('created'),
-            item.get('updated'),
-            item.get('created_ms'),
-            item.get('deleted', False)
-        ))
-    
-    # Bulk insert
-    execute_values(cursor, """
-        INSERT INTO money_movements (_id, uuid, _user, _client, _document, _shift, _app,
-                                   type, sum, date, "from", "to", account, source,
-                                   reason, description, comment, info, created, updated,
-                                   created_ms, deleted)
-        VALUES %s
-        ON CONFLICT (_id) DO UPDATE SET
-            sum = EXCLUDED.sum,
-            updated = EXCLUDED.updated
-    """, batch, page_size=500)
-    
-    print(f"   ✅ Imported {len(data)} money movements")
-    return len(data)
+    return report(import_dated(cursor, 'money_movements', months), "Money movements")
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Import Ainur extracted data into PostgreSQL")
+    parser.add_argument('--reset-schema', action='store_true',
+                        help="drop and recreate all tables from schema.sql before importing")
+    parser.add_argument('--rebuild-aggregates', action='store_true',
+                        help="recompute the daily reporting aggregates for all history")
+    parser.add_argument('--detach-before', metavar='YYYY-MM', type=month_arg,
+                        help="detach document/money partitions older than this month")
+    parser.add_argument('--archive-schema', metavar='SCHEMA',
+                        help="move detached partitions into this schema")
+    parser.add_argument('--apply-changes', metavar='DIR',
+                        help="apply a diff_snapshots.py change set instead of a full import")
+    parser.add_argument('--force', action='store_true',
+                        help="apply change-set deletions even beyond the DELETE_MAX_FRACTION "
+                             f"limit ({MAX_DELETE_FRACTION} of a table's active rows)")
+    parser.add_argument('--months', nargs='+', metavar='YYYY-MM', type=month_arg,
+                        help="only reload these months of documents and money movements "
+                             "from their month shards")
+    parser.add_argument('--pos-catalog', metavar='DIR', default=os.environ.get('POS_CATALOG_DIR'),
+                        help="write the offline POS catalog snapshot to DIR after importing "
+                             "(default $POS_CATALOG_DIR)")
+    parser.add_argument('--writer', choices=['copy', 'pipeline'], default=IMPORT_WRITER,
+                        help="how rows reach the staging tables: COPY on the import "
+                             "connection or pooled pipelined connections "
+                             f"(default {IMPORT_WRITER})")
+    return parser.parse_args()
+
+
+def month_arg(value):
+    """argparse type for YYYY-MM months"""
+    try:
+        datetime.strptime(value, '%Y-%m')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM, got {value!r}")
+    return value
 
 
 def main():
     """Main import process"""
+    global WRITER
+    args = parse_args()
+    
     print("=" * 80)
     print("🚀 AINUR DATA IMPORT TO POSTGRESQL")
     print("=" * 80)
@@ -473,32 +945,51 @@ def main():
         conn.autocommit = False
         cursor = conn.cursor()
         print("   ✅ Connected!")
+        WRITER = open_writer(args.writer)
     except Exception as e:
         print(f"   ❌ Connection failed: {e}")
         return
     
     try:
-        # Run schema first
-        print("\n📐 Running database schema...")
-        schema_path = os.path.join(os.path.dirname(__file__), 
-                                   'backend/src/database/schema.sql')
-        with open(schema_path, 'r') as f:
-            schema_sql = f.read()
-        cursor.execute(schema_sql)
+        ensure_schema(cursor, args.reset_schema)
         conn.commit()
-        print("   ✅ Schema created!")
         
         # Import data
         results = {}
-        results['stores'] = import_stores(cursor)
-        results['accounts'] = import_accounts(cursor)
-        results['money_sources'] = import_money_sources(cursor)
-        results['categories'] = import_categories(cursor)
-        results['products'] = import_products(cursor)
-        results['customers'] = import_customers(cursor)
-        results['suppliers'] = import_suppliers(cursor)
-        results['documents'] = import_documents(cursor)
-        results['money_movements'] = import_money_movements(cursor)
+        if args.apply_changes:
+            print(f"\n🔀 Applying change set {args.apply_changes}...")
+            results = apply_changes(cursor, args.apply_changes,
+                                    None if args.force else MAX_DELETE_FRACTION)
+        elif args.months:
+            print(f"\n🗓️  Reloading {', '.join(args.months)}...")
+            results['documents'] = import_documents(cursor, args.months)
+            results['money_movements'] = import_money_movements(cursor, args.months)
+        else:
+            results['stores'] = import_stores(cursor)
+            results['accounts'] = import_accounts(cursor)
+            results['money_sources'] = import_money_sources(cursor)
+            results['categories'] = import_categories(cursor)
+            results['products'] = import_products(cursor)
+            results['customers'] = import_customers(cursor)
+            results['suppliers'] = import_suppliers(cursor)
+            results['documents'] = import_documents(cursor)
+            results['money_movements'] = import_money_movements(cursor)
+        
+        print("\n💳 Recomputing customer and supplier debt...")
+        for table, count in recompute_debts(cursor).items():
+            print(f"   ✅ {table}: {count:,} debts changed")
+        
+        if args.rebuild_aggregates:
+            print("\n📊 Rebuilding daily aggregates...")
+            days = refresh_daily_aggregates(cursor, rebuild=True)
+            print(f"   ✅ Rebuilt {days:,} store-days")
+        
+        if args.detach_before:
+            print(f"\n🗄️  Detaching partitions before {args.detach_before}...")
+            for table in ['documents', 'money_movements']:
+                for name in detach_partitions(cursor, table, args.detach_before,
+                                              args.archive_schema):
+                    print(f"   ✅ Detached {name}")
         
         # Commit all changes
         conn.commit()
@@ -508,22 +999,37 @@ def main():
         print("📊 IMPORT SUMMARY")
         print("=" * 80)
         
-        total = 0
-        for name, count in results.items():
-            total += count
-            print(f"   {name:20s}: {count:>10,}")
+        print(f"   {'':20s}  {'inserted':>10s} {'updated':>10s} {'unchanged':>10s}")
+        totals = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+        for name, counts in results.items():
+            for key in totals:
+                totals[key] += counts[key]
+            print(f"   {name:20s}: {counts['inserted']:>10,} {counts['updated']:>10,} "
+                  f"{counts['unchanged']:>10,}")
         
         print("-" * 80)
-        print(f"   {'TOTAL':20s}: {total:>10,}")
+        print(f"   {'TOTAL':20s}: {totals['inserted']:>10,} {totals['updated']:>10,} "
+              f"{totals['unchanged']:>10,}")
         print("=" * 80)
         
-        # Verify data
-        print("\n🔍 Verifying imported data...")
-        for table in ['stores', 'accounts', 'products', 'customers', 'suppliers', 
-                      'documents', 'money_movements']:
-            cursor.execute(f"SELECT COUNT(*) FROM {table}")
-            count = cursor.fetchone()[0]
-            print(f"   {table:20s}: {count:>10,} rows in DB")
+        if REJECTED:
+            print(f"\n⚠️  Quarantined rows (see {REJECT_DIR}):")
+            for table, count in REJECTED.items():
+                print(f"   {table:20s}: {count:>10,}")
+        
+        # Verify data: source and DB content hashes per table and month
+        # (verify_import imports this module, so it is loaded here)
+        if args.apply_changes:
+            print("\n🔍 Change set applied; run verify_import.py against the new extraction")
+        else:
+            from verify_import import verify_tables, print_verification
+            print("\n🔍 Verifying imported data...")
+            print_verification(verify_tables(months=args.months))
+        
+        if args.pos_catalog:
+            from export_pos_catalog import export_catalog, print_export
+            print("\n🛒 Exporting POS catalog...")
+            print_export(export_catalog(cursor, args.pos_catalog), args.pos_catalog)
         
         print("\n" + "=" * 80)
         print("✅ IMPORT COMPLETE!")
@@ -535,8 +1041,12 @@ def main():
         print(f"\n❌ Error during import: {e}")
         raise
     finally:
+        # The import connection goes first so it holds no lock on a staging
+        # table the writer still has to drop
         cursor.close()
         conn.close()
+        if WRITER is not None:
+            WRITER.close()
 
 
 if __name__ == "__main__":
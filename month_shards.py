@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Month-sharded NDJSON files for the dated resources
+documents and money_movements are written as one NDJSON file per UTC month
+(documents/2024-05.ndjson), matching the monthly table partitions, plus a
+_manifest.json with each shard's record count, size and SHA-256. The
+importer can then transform shards in parallel, or reload only some months.
+
+Usage:
+    python month_shards.py split documents.json
+    python month_shards.py verify documents
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+# Resources written as month shards
+SHARDED = ['documents', 'money_movements']
+
+MANIFEST = '_manifest.json'
+
+# Shard for records without a usable date
+UNDATED = 'undated'
+
+
+def month_key(record):
+    """YYYY-MM (UTC) of a record's date, or UNDATED"""
+    try:
+        date = int(record.get('date') or 0)
+    except (TypeError, ValueError):
+        date = 0
+    if date <= 0:
+        return UNDATED
+    return datetime.fromtimestamp(date, timezone.utc).strftime('%Y-%m')
+
+
+def shard_dir(data_dir, name):
+    return os.path.join(data_dir, name)
+
+# ============================================================================
+# WRITING
+# ============================================================================
+
+def write_shards(data_dir, name, records):
+    """Write records as month shards plus the manifest; returns the manifest
+
+    Every shard is written under a temporary name and renamed, and the
+    manifest goes last, so a reader never trusts a half-written shard.
+    """
+    by_month = {}
+    for record in records:
+        if isinstance(record, dict):
+            by_month.setdefault(month_key(record), []).append(record)
+
+    directory = shard_dir(data_dir, name)
+    os.makedirs(directory, exist_ok=True)
+    months = {}
+    for month in sorted(by_month):
+        path = os.path.join(directory, f"{month}.ndjson")
+        digest = hashlib.sha256()
+        size = 0
+        with open(f"{path}.tmp", 'wb') as f:
+            for record in by_month[month]:
+                line = (json.dumps(record, ensure_ascii=False) + '\n').encode()
+                digest.update(line)
+                size += len(line)
+                f.write(line)
+        os.replace(f"{path}.tmp", path)
+        months[month] = {'count': len(by_month[month]), 'bytes': size,
+                         'sha256': digest.hexdigest()}
+
+    manifest = {
+        'name': name,
+        'created': datetime.now().isoformat(),
+        'total': sum(m['count'] for m in months.values()),
+        'months': months,
+    }
+    with open(os.path.join(directory, f"{MANIFEST}.tmp"), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(os.path.join(directory, f"{MANIFEST}.tmp"), os.path.join(directory, MANIFEST))
+    return manifest
+
+# ============================================================================
+# READING
+# ============================================================================
+
+def read_manifest(data_dir, name):
+    """The resource's shard manifest, or None"""
+    path = os.path.join(shard_dir(data_dir, name), MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def shards_current(data_dir, name):
+    """True when the shards are at least as new as <name>.json and <name>.snap"""
+    manifest = os.path.join(shard_dir(data_dir, name), MANIFEST)
+    if not os.path.exists(manifest):
+        return False
+    newest = max((os.path.getmtime(os.path.join(data_dir, f"{name}{ext}"))
+                  for ext in ('.json', '.snap')
+                  if os.path.exists(os.path.join(data_dir, f"{name}{ext}"))), default=0)
+    return os.path.getmtime(manifest) >= newest
+
+
+def shard_entries(data_dir, name, months=None):
+    """(month, path, manifest entry) of every shard, or only of the given months"""
+    manifest = read_manifest(data_dir, name) or {'months': {}}
+    return [(month, os.path.join(shard_dir(data_dir, name), f"{month}.ndjson"), entry)
+            for month, entry in sorted(manifest['months'].items())
+            if not months or month in months]
+
+
+def read_shard(path, sha256=None):
+    """Records of one shard, checked against the manifest hash when given"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if sha256 and hashlib.sha256(data).hexdigest() != sha256:
+        raise ValueError(f"{path} does not match its manifest hash")
+    return [json.loads(line) for line in data.splitlines() if line.strip()]
+
+# ============================================================================
+# COMMAND LINE
+# ============================================================================
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Write and check month shards")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    split = commands.add_parser('split', help="shard a JSON dump next to it")
+    split.add_argument('json_file')
+
+    verify = commands.add_parser('verify', help="check every shard against the manifest")
+    verify.add_argument('shard_dir')
+    return parser.parse_args()
+
+
+def main():
+    """Run one shard command"""
+    args = parse_args()
+
+    if args.command == 'split':
+        with open(args.json_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        data_dir = os.path.dirname(os.path.abspath(args.json_file))
+        name = os.path.splitext(os.path.basename(args.json_file))[0]
+        manifest = write_shards(data_dir, name, data if isinstance(data, list) else [data])
+        print(f"✅ {manifest['total']:,} records → {len(manifest['months']):,} shards "
+              f"in {shard_dir(data_dir, name)}")
+        return
+
+    directory = os.path.abspath(args.shard_dir.rstrip('/'))
+    data_dir, name = os.path.dirname(directory), os.path.basename(directory)
+    bad = 0
+    for month, path, entry in shard_entries(data_dir, name):
+        try:
+            count = len(read_shard(path, entry['sha256']))
+            problem = None if count == entry['count'] else \
+                f"{count:,} records, manifest says {entry['count']:,}"
+        except (OSError, ValueError) as e:
+            problem = str(e)
+        if problem:
+            bad += 1
+            print(f"   ❌ {month}: {problem}")
+    if bad:
+        sys.exit(1)
+    print(f"✅ All shards of {name} match the manifest")
+
+
+if __name__ == "__main__":
+    main()
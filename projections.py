@@ -0,0 +1,112 @@
+"""
+Field projections applied to extracted pages as they arrive
+Records carry bulky nested copies (the full info.user object, a product
+snapshot inside every document line, _stat_docs) that nothing downstream
+reads. A projection keeps the top-level keys the import column specs use
+and slims nested objects down to the keys listed here. The untouched
+pages can be kept in a gzipped NDJSON sidecar.
+"""
+
+import gzip
+import json
+import os
+
+from import_columns import TABLES
+
+# Paginated API resources and the table their records are imported into
+RESOURCE_TABLES = {
+    'catalog': 'products',
+    'clients': 'customers',
+    'docs': 'documents',
+    'money': 'money_movements',
+}
+
+# Top-level keys kept besides the table's columns
+EXTRA_KEYS = {
+    # extract_product_stock reads the per-store stocks map
+    'products': ['stocks'],
+}
+
+# Nested paths slimmed to the listed keys; "name[]" walks every list item
+NESTED_KEYS = {
+    'documents': {
+        'info.user': ['_id', 'name'],
+        'products[].product': ['_id', 'name', 'sku', 'barcode', 'code'],
+        'from': ['_id', 'type', 'name'],
+        'to': ['_id', 'type', 'name'],
+    },
+    'money_movements': {
+        'info.user': ['_id', 'name'],
+        'from': ['_id', 'type', 'name'],
+        'to': ['_id', 'type', 'name'],
+    },
+    'customers': {
+        'info.user': ['_id', 'name'],
+    },
+}
+
+
+def _slim(obj, parts, keep):
+    """Copy of obj with the object(s) at parts reduced to the keep keys
+
+    Only the containers along the path are copied; the input is not changed.
+    """
+    if not isinstance(obj, dict):
+        return obj
+    name, rest = parts[0], parts[1:]
+    many = name.endswith('[]')
+    name = name[:-2] if many else name
+    if name not in obj:
+        return obj
+
+    def reduce(value):
+        if rest:
+            return _slim(value, rest, keep)
+        if isinstance(value, dict):
+            return {k: value[k] for k in keep if k in value}
+        return value
+
+    value = obj[name]
+    copy = dict(obj)
+    copy[name] = [reduce(v) for v in value] if many and isinstance(value, list) else reduce(value)
+    return copy
+
+
+class Projection:
+    """Keep-lists for one table, prepared once"""
+
+    def __init__(self, table):
+        spec = TABLES[table]
+        self.keys = frozenset([c.key for c in spec.columns if not c.compute]
+                              + EXTRA_KEYS.get(table, []))
+        self.nested = [(path.split('.'), keep)
+                       for path, keep in NESTED_KEYS.get(table, {}).items()]
+
+    def __call__(self, record):
+        if not isinstance(record, dict):
+            return record
+        slim = {k: v for k, v in record.items() if k in self.keys}
+        for parts, keep in self.nested:
+            slim = _slim(slim, parts, keep)
+        return slim
+
+
+PROJECTIONS = {resource: Projection(table) for resource, table in RESOURCE_TABLES.items()}
+
+
+def project_page(resource, page, raw_dir=None):
+    """Projected copy of a page; the raw page goes to raw_dir if given"""
+    if raw_dir:
+        write_raw(raw_dir, resource, page)
+    projection = PROJECTIONS.get(resource)
+    if projection is None:
+        return page
+    return [projection(record) for record in page]
+
+
+def write_raw(raw_dir, resource, page):
+    """Append a page to the resource's raw sidecar (one gzip member per page)"""
+    os.makedirs(raw_dir, exist_ok=True)
+    path = os.path.join(raw_dir, f"{resource}.raw.ndjson.gz")
+    with gzip.open(path, 'at', encoding='utf-8') as f:
+        f.writelines(json.dumps(record, ensure_ascii=False) + '\n' for record in page)
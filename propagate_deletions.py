@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Propagate upstream deletions into PostgreSQL
+The importer only upserts, so records removed in Ainur stay active here.
+This fetches the set of live _ids per resource, anti-joins it against the
+database and soft-deletes (deleted = true) the rows that are gone. A table
+is skipped when its id fetch looks incomplete compared with the count the
+API reports, or when too large a share of its rows would be deleted.
+
+The API has no id-only listing or server-side projection, so a live fetch
+crawls full record pages. With --snapshots DIR the paginated tables' ids
+are read from the index of the extractor's <table>.snap files instead,
+without decompressing a record; the API is then only asked for counts, and
+a snapshot holding fewer ids than upstream reports (records added since)
+is skipped.
+"""
+
+import argparse
+import os
+import psycopg2
+from datetime import datetime
+
+from extract_all_ainur_data import (
+    get_simple, get_count, iter_paginated, iter_keyset, search_total
+)
+from import_data_to_postgres import (
+    DB_CONFIG, MAX_DELETE_FRACTION, propagate_deletions, refresh_daily_aggregates,
+    recompute_debts
+)
+from snapshot_store import SnapshotReader
+
+# ============================================================================
+# LIVE ID SETS
+# ============================================================================
+
+def page_ids(pages):
+    """Every _id from a page iterator"""
+    return [record['_id'] for page in pages for record in page if record.get('_id')]
+
+
+# table -> (live ids, count reported by the API or None when the list is
+# complete by construction). Searches walk keyset pages so they are not
+# held to the API's 10k offset window.
+LIVE_SOURCES = {
+    'stores': lambda: (page_ids([get_simple('stores')]), None),
+    'accounts': lambda: (page_ids([get_simple('accounts')]), None),
+    'suppliers': lambda: (page_ids([get_simple('suppliers')]), None),
+    'products': lambda: (page_ids(iter_paginated('catalog')), get_count('catalog')),
+    'customers': lambda: (page_ids(iter_paginated('clients')), get_count('clients')),
+    'documents': lambda: (page_ids(iter_keyset('docs')), search_total('docs')),
+    'money_movements': lambda: (page_ids(iter_keyset('money')), search_total('money')),
+}
+
+# Paginated tables whose ids --snapshots reads from a snapshot -> count the
+# API reports, checked against it; the single-request lists stay live
+SNAPSHOT_COUNTS = {
+    'products': lambda: get_count('catalog'),
+    'customers': lambda: get_count('clients'),
+    'documents': lambda: search_total('docs'),
+    'money_movements': lambda: search_total('money'),
+}
+
+
+def snapshot_ids(snapshot_dir, table):
+    """(ids in <table>.snap, count the API reports now); ids are [] without a snapshot"""
+    path = os.path.join(snapshot_dir, f"{table}.snap")
+    if not os.path.exists(path):
+        return [], None
+    with SnapshotReader(path) as reader:
+        ids = [reader.key_at(i) for i in range(len(reader))]
+    return ids, SNAPSHOT_COUNTS[table]()
+
+
+def check_live_ids(ids, reported):
+    """Reason the id set cannot be trusted, or None"""
+    if not ids:
+        return "no ids fetched"
+    if reported is not None and len(set(ids)) < reported:
+        return f"fetched {len(set(ids)):,} ids but the API reports {reported:,}"
+    return None
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Soft-delete rows removed upstream")
+    parser.add_argument('--tables', nargs='+', choices=list(LIVE_SOURCES),
+                        default=list(LIVE_SOURCES), help="only reconcile these tables")
+    parser.add_argument('--max-fraction', type=float, default=MAX_DELETE_FRACTION,
+                        help=f"largest share of active rows deleted per table "
+                             f"(default {MAX_DELETE_FRACTION})")
+    parser.add_argument('--force', action='store_true',
+                        help="ignore the --max-fraction limit")
+    parser.add_argument('--snapshots', metavar='DIR',
+                        help="take live ids from the extractor's .snap files in DIR "
+                             "instead of crawling the API")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="report what would be deleted and roll back")
+    return parser.parse_args()
+
+
+def main():
+    """Reconcile every requested table"""
+    args = parse_args()
+
+    print("=" * 80)
+    print("🧹 DELETION PROPAGATION")
+    print("=" * 80)
+    print(f"Started: {datetime.now()}")
+    print(f"Database: {DB_CONFIG['dbname']} @ {DB_CONFIG['host']}")
+    print(f"Tables: {', '.join(args.tables)}")
+    print(f"Live ids: {args.snapshots or 'API crawl'}")
+    if args.dry_run:
+        print("Dry run: nothing will be committed")
+    print("=" * 80)
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    conn.autocommit = False
+    cursor = conn.cursor()
+    max_fraction = None if args.force else args.max_fraction
+
+    try:
+        marked_any = {}
+        for table in args.tables:
+            print(f"\n🔎 {table}...")
+            if args.snapshots and table in SNAPSHOT_COUNTS:
+                ids, reported = snapshot_ids(args.snapshots, table)
+            else:
+                ids, reported = LIVE_SOURCES[table]()
+            problem = check_live_ids(ids, reported)
+            if problem:
+                print(f"   ⚠️  Skipped: {problem}")
+                continue
+
+            missing, active, marked = propagate_deletions(cursor, table, ids, max_fraction)
+            print(f"   {len(set(ids)):,} live upstream, {active:,} active in DB, "
+                  f"{missing:,} missing upstream")
+            if missing and not marked:
+                print(f"   ⚠️  Not deleting: {missing:,} of {active:,} rows exceeds "
+                      f"--max-fraction {args.max_fraction}")
+            elif marked:
+                verb = "Would mark" if args.dry_run else "Marked"
+                print(f"   ✅ {verb} {marked:,} rows deleted")
+            marked_any[table] = marked
+
+        if marked_any.get('documents'):
+            days = refresh_daily_aggregates(cursor)
+            print(f"\n📊 Daily aggregates refreshed for {days:,} store-days")
+        if any(marked_any.values()):
+            print("\n💳 Recomputing customer and supplier debt...")
+            for table, count in recompute_debts(cursor).items():
+                print(f"   ✅ {table}: {count:,} debts changed")
+
+        if args.dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"\n❌ Error during deletion propagation: {e}")
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+    print("\n" + "=" * 80)
+    print("✅ DELETION PROPAGATION COMPLETE!" if not args.dry_run else "✅ DRY RUN COMPLETE!")
+    print(f"🕐 Finished: {datetime.now()}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Rebuild the per-store stock ledger from document history
+Replays sales, purchases, movements, returns and stock changes in date
+order, computes running on-hand quantities per product and store with
+grouped numpy passes, bulk-writes them to stock_ledger and checks the
+result against the products.stock snapshot.
+"""
+
+import argparse
+import csv
+import io
+import os
+import time
+import numpy as np
+import psycopg2
+from datetime import datetime
+
+from import_data_to_postgres import (
+    DB_CONFIG, COMPANY_ID, SCHEMA_PATH, load_json, schema_table, schema_indexes
+)
+
+# Stock effect of one line quantity, per document type. Movements take
+# stock out of the source store and into the target store; changes carry
+# the signed adjustment in qty.
+STOCK_EFFECT = {
+    'sales': -1,
+    'return_sales': 1,
+    'purchases': 1,
+    'return_purchases': -1,
+    'movements': -1,
+}
+SIGNED_TYPES = {'changes'}
+
+# Snapshot differences below this are rounding noise
+TOLERANCE = 0.001
+
+# ============================================================================
+# LOADING
+# ============================================================================
+
+def load_documents(source):
+    """Documents with the fields the ledger needs, deleted ones left out"""
+    if source == 'files':
+        return [doc for doc in load_json('documents.json') if not doc.get('deleted')]
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT _id, type, date, store, "from", "to", products
+            FROM documents WHERE _client = %s AND NOT deleted
+        """, (COMPANY_ID,))
+        names = [c[0] for c in cursor.description]
+        return [dict(zip(names, row)) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def load_snapshot(source):
+    """{product_id: {store_id: qty}} from the catalog snapshot"""
+    if source == 'files':
+        products = load_json('products.json')
+        return {p['_id']: p.get('stock') or {} for p in products if p.get('_id')}
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT _id, stock FROM products WHERE _client = %s", (COMPANY_ID,))
+        return {pid: stock or {} for pid, stock in cursor.fetchall()}
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def explode_lines(documents):
+    """Flatten document lines into stock deltas (one flat pass, then arrays)"""
+    products, stores, dates, deltas, doc_ids, doc_types = [], [], [], [], [], []
+
+    def add(product, store, date, delta, doc):
+        products.append(product)
+        stores.append(store)
+        dates.append(date)
+        deltas.append(delta)
+        doc_ids.append(doc.get('_id') or '')
+        doc_types.append(doc.get('type') or '')
+
+    for doc in documents:
+        doc_type = doc.get('type')
+        if doc_type not in STOCK_EFFECT and doc_type not in SIGNED_TYPES:
+            continue
+        source = doc.get('from') if isinstance(doc.get('from'), dict) else {}
+        target = doc.get('to') if isinstance(doc.get('to'), dict) else {}
+        store = doc.get('store') or source.get('_id')
+        date = int(doc.get('date') or 0)
+
+        for item in doc.get('products') or []:
+            if not isinstance(item, dict):
+                continue
+            product = item.get('_id') or (item.get('product') or {}).get('_id')
+            try:
+                qty = float(item.get('qty') or 0)
+            except (TypeError, ValueError):
+                continue
+            if not product or not store or not qty:
+                continue
+
+            if doc_type in SIGNED_TYPES:
+                add(product, store, date, qty, doc)
+                continue
+            add(product, store, date, STOCK_EFFECT[doc_type] * abs(qty), doc)
+            if doc_type == 'movements' and target.get('type') == 'stores' and target.get('_id'):
+                add(product, target['_id'], date, abs(qty), doc)
+
+    return {
+        'product': np.array(products, dtype='U24'),
+        'store': np.array(stores, dtype='U24'),
+        'date': np.array(dates, dtype=np.int64),
+        'delta': np.array(deltas, dtype=np.float64),
+        '_document': np.array(doc_ids, dtype='U24'),
+        'type': np.array(doc_types, dtype='U50'),
+    }
+
+# ============================================================================
+# LEDGER
+# ============================================================================
+
+def build_ledger(lines):
+    """Sort lines by (product, store, date) and compute running on-hand
+
+    Lines on the same date are ordered by document id, so both sources give
+    the same order; seq numbers the sorted lines.
+    """
+    product_names, product_codes = np.unique(lines['product'], return_inverse=True)
+    store_names, store_codes = np.unique(lines['store'], return_inverse=True)
+    group = product_codes.astype(np.int64) * max(len(store_names), 1) + store_codes
+
+    order = np.lexsort((np.arange(len(group)), lines['_document'], lines['date'], group))
+    ledger = {name: column[order] for name, column in lines.items()}
+    ledger['seq'] = np.arange(len(group), dtype=np.int64)
+    group = group[order]
+
+    starts = np.concatenate(([0], np.flatnonzero(group[1:] != group[:-1]) + 1)) \
+        if len(group) else np.zeros(0, dtype=np.int64)
+    total = np.cumsum(ledger['delta'])
+    before = np.concatenate(([0.0], total[starts[1:] - 1])) if len(starts) else starts
+    counts = np.diff(np.append(starts, len(group)))
+    ledger['balance'] = total - np.repeat(before, counts)
+
+    # Current on-hand is the last balance of every (product, store) group
+    ends = np.append(starts[1:], len(group)) - 1 if len(starts) else starts
+    on_hand = {
+        'product': ledger['product'][ends],
+        'store': ledger['store'][ends],
+        'qty': ledger['balance'][ends],
+    }
+    return ledger, on_hand
+
+
+def compare_snapshot(on_hand, snapshot):
+    """(product, store, ledger qty, snapshot qty) rows that disagree"""
+    computed = {(str(p), str(s)): float(q)
+                for p, s, q in zip(on_hand['product'], on_hand['store'], on_hand['qty'])}
+    expected = {}
+    for product, stock in snapshot.items():
+        if isinstance(stock, dict):
+            for store, qty in stock.items():
+                try:
+                    expected[(product, store)] = float(qty or 0)
+                except (TypeError, ValueError):
+                    continue
+
+    mismatches = []
+    for key in sorted(set(computed) | set(expected)):
+        ledger_qty, snapshot_qty = computed.get(key, 0.0), expected.get(key, 0.0)
+        if abs(ledger_qty - snapshot_qty) > TOLERANCE:
+            mismatches.append((key[0], key[1], round(ledger_qty, 3), snapshot_qty))
+    return mismatches
+
+
+def ensure_ledger_table(cursor):
+    """Create stock_ledger, or add seq to one created before it existed"""
+    with open(SCHEMA_PATH, 'r') as f:
+        schema_sql = f.read()
+    cursor.execute(schema_table(schema_sql, 'stock_ledger'))
+    cursor.execute("ALTER TABLE stock_ledger ADD COLUMN IF NOT EXISTS seq BIGINT NOT NULL DEFAULT 0")
+    cursor.execute("DROP INDEX IF EXISTS idx_stock_ledger_lookup")
+    for statement in schema_indexes(schema_sql, 'stock_ledger'):
+        cursor.execute(statement)
+
+
+def write_ledger(ledger):
+    """Replace this company's stock_ledger rows with a single COPY"""
+    buffer = io.StringIO()
+    for row in zip(ledger['product'], ledger['store'], ledger['date'], ledger['seq'],
+                   ledger['_document'], ledger['type'], ledger['delta'].round(3),
+                   ledger['balance'].round(3)):
+        buffer.write(COMPANY_ID + '\t' + '\t'.join(map(str, row)) + '\n')
+    buffer.seek(0)
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        ensure_ledger_table(cursor)
+        cursor.execute("DELETE FROM stock_ledger WHERE _client = %s", (COMPANY_ID,))
+        cursor.copy_expert("""
+            COPY stock_ledger (_client, product, store, date, seq, _document, type, delta, balance)
+            FROM STDIN
+        """, buffer)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Rebuild the stock ledger from document history")
+    parser.add_argument('--source', choices=['files', 'db'], default='files',
+                        help="read the extracted JSON files or the imported database")
+    parser.add_argument('--no-write', action='store_true',
+                        help="only compute and compare, do not write stock_ledger")
+    parser.add_argument('--out', metavar='DIR',
+                        help="write on-hand quantities and snapshot mismatches as CSV into DIR")
+    return parser.parse_args()
+
+
+def main():
+    """Rebuild, store and check the ledger"""
+    args = parse_args()
+
+    print("=" * 80)
+    print("📦 STOCK LEDGER REBUILD")
+    print("=" * 80)
+    print(f"Started: {datetime.now()}")
+    print(f"Source: {args.source}")
+    print("=" * 80)
+
+    started = time.time()
+    documents = load_documents(args.source)
+    lines = explode_lines(documents)
+    print(f"\n📥 {len(documents):,} documents → {len(lines['delta']):,} stock lines "
+          f"in {time.time() - started:.1f}s")
+
+    computed = time.time()
+    ledger, on_hand = build_ledger(lines)
+    print(f"⚡ Ledger for {len(on_hand['qty']):,} product/store pairs "
+          f"in {time.time() - computed:.2f}s")
+
+    if not args.no_write:
+        print("\n💾 Writing stock_ledger...")
+        write_ledger(ledger)
+        print(f"   ✅ Wrote {len(ledger['delta']):,} rows")
+
+    mismatches = compare_snapshot(on_hand, load_snapshot(args.source))
+    print(f"\n🔍 Product/store pairs differing from the catalog snapshot: {len(mismatches):,}")
+    for product, store, ledger_qty, snapshot_qty in mismatches[:20]:
+        print(f"   {product} @ {store}: ledger {ledger_qty:>10,.3f}  snapshot {snapshot_qty:>10,.3f}")
+    if len(mismatches) > 20:
+        print(f"   ... and {len(mismatches) - 20:,} more")
+
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+        with open(os.path.join(args.out, 'stock_on_hand.csv'), 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['product', 'store', 'qty'])
+            writer.writerows(zip(on_hand['product'], on_hand['store'], on_hand['qty'].round(3)))
+        with open(os.path.join(args.out, 'stock_mismatches.csv'), 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['product', 'store', 'ledger_qty', 'snapshot_qty'])
+            writer.writerows(mismatches)
+        print(f"\n📁 Reports saved to: {args.out}")
+
+    print("\n" + "=" * 80)
+    print("✅ LEDGER REBUILD COMPLETE!")
+    print(f"🕐 Finished: {datetime.now()}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
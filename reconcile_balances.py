@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Reconcile account balances against money movements
+Loads money_movements into columnar numpy arrays, computes running and
+daily balances per account in vectorized passes, compares the totals with
+the imported accounts.balance snapshot and flags movements whose
+_document does not exist.
+"""
+
+import argparse
+import csv
+import os
+import time
+import numpy as np
+import psycopg2
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from compact_ids import compact_id
+from import_data_to_postgres import DB_CONFIG, COMPANY_ID, REPORT_TIMEZONE, load_json
+
+# Differences below this are rounding noise
+TOLERANCE = 0.01
+
+# Hex digit value of every byte, 255 for anything that is not a hex digit
+HEX_VALUES = np.full(256, 255, dtype=np.uint8)
+for value, digit in enumerate(b'0123456789abcdef'):
+    HEX_VALUES[digit] = HEX_VALUES[bytes([digit]).upper()[0]] = value
+
+# ============================================================================
+# LOADING
+# ============================================================================
+
+def columns_from_records(records):
+    """Turn money movement dicts into columnar arrays"""
+    n = len(records)
+    return {
+        '_id': np.array([r.get('_id') or '' for r in records], dtype='U24'),
+        '_document': np.array([r.get('_document') or '' for r in records], dtype='U24'),
+        'account': np.array([r.get('account') or '' for r in records], dtype='U24'),
+        'credit': np.fromiter((r.get('type') == 'credit' for r in records), dtype=bool, count=n),
+        'debit': np.fromiter((r.get('type') == 'debit' for r in records), dtype=bool, count=n),
+        'sum': np.fromiter((float(r.get('sum') or 0) for r in records), dtype=np.float64, count=n),
+        'date': np.fromiter((int(r.get('date') or 0) for r in records), dtype=np.int64, count=n),
+    }
+
+
+def active(records):
+    """This company's records that are not deleted, as load_from_db selects them"""
+    return [r for r in records
+            if (r.get('_client') or COMPANY_ID) == COMPANY_ID and not r.get('deleted')]
+
+
+def load_from_files():
+    """Movements, document ids and account snapshots from the extracted JSON"""
+    movements = columns_from_records(active(load_json('money_movements.json')))
+    documents = np.array([d.get('_id') for d in active(load_json('documents.json'))], dtype='U24')
+    accounts = {a['_id']: a for a in active(load_json('accounts.json'))}
+    return movements, documents, accounts
+
+
+def load_from_db():
+    """Movements, document ids and account snapshots from PostgreSQL"""
+    conn = psycopg2.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT _id, COALESCE(_document, ''), COALESCE(account, ''),
+                   type = 'credit', type = 'debit', sum::float8, date
+            FROM money_movements WHERE _client = %s AND NOT deleted
+        """, (COMPANY_ID,))
+        rows = cursor.fetchall()
+        names = ['_id', '_document', 'account', 'credit', 'debit', 'sum', 'date']
+        types = ['U24', 'U24', 'U24', bool, bool, np.float64, np.int64]
+        columns = list(zip(*rows)) if rows else [[]] * len(names)
+        movements = {name: np.array(col, dtype=dtype)
+                     for name, col, dtype in zip(names, columns, types)}
+
+        cursor.execute("SELECT _id FROM documents WHERE _client = %s AND NOT deleted",
+                       (COMPANY_ID,))
+        documents = np.array([r[0] for r in cursor.fetchall()], dtype='U24')
+
+        cursor.execute("SELECT _id, name, balance FROM accounts WHERE _client = %s AND NOT deleted",
+                       (COMPANY_ID,))
+        accounts = {r[0]: {'_id': r[0], 'name': r[1], 'balance': r[2]}
+                    for r in cursor.fetchall()}
+    finally:
+        cursor.close()
+        conn.close()
+    return movements, documents, accounts
+
+# ============================================================================
+# VECTORIZED PASSES
+# ============================================================================
+
+def group_starts(keys):
+    """Start index of every run of equal values in a sorted key array"""
+    if len(keys) == 0:
+        return np.zeros(0, dtype=np.int64)
+    return np.concatenate(([0], np.flatnonzero(keys[1:] != keys[:-1]) + 1))
+
+
+def segmented_cumsum(values, starts):
+    """Cumulative sum that restarts at every group start"""
+    total = np.cumsum(values)
+    before = np.concatenate(([0.0], total[starts[1:] - 1])) if len(starts) else starts
+    counts = np.diff(np.append(starts, len(values)))
+    return total - np.repeat(before, counts)
+
+
+def account_totals(m):
+    """Income, outcome and balance per account"""
+    names, codes = np.unique(m['account'], return_inverse=True)
+    k = len(names)
+    income = np.bincount(codes, weights=np.where(m['credit'], m['sum'], 0.0), minlength=k)
+    outcome = np.bincount(codes, weights=np.where(m['debit'], m['sum'], 0.0), minlength=k)
+    counts = np.bincount(codes, minlength=k)
+    return names, codes, income, outcome, counts
+
+
+def running_balances(m, codes):
+    """Balance after each movement, per account in date order"""
+    signed = np.where(m['credit'], m['sum'], np.where(m['debit'], -m['sum'], 0.0))
+    order = np.lexsort((m['_id'], m['date'], codes))
+    starts = group_starts(codes[order])
+    running = np.empty_like(signed)
+    running[order] = segmented_cumsum(signed[order], starts)
+    return running
+
+
+def local_days(dates, tz=REPORT_TIMEZONE):
+    """Local day number (days since 1970-01-01) of every epoch-seconds date
+
+    Offsets are looked up once per distinct UTC hour, so DST is followed
+    like the importer's daily aggregates do.
+    """
+    if len(dates) == 0:
+        return np.zeros(0, dtype=np.int64)
+    zone = ZoneInfo(tz)
+    hours, inverse = np.unique(dates // 3600, return_inverse=True)
+    offsets = np.array([datetime.fromtimestamp(int(h) * 3600, timezone.utc)
+                        .astimezone(zone).utcoffset().total_seconds() for h in hours],
+                       dtype=np.int64)
+    return (dates + offsets[inverse]) // 86400
+
+
+def daily_balances(m, codes, names):
+    """Net flow and closing balance per account and local day"""
+    signed = np.where(m['credit'], m['sum'], np.where(m['debit'], -m['sum'], 0.0))
+    days = local_days(m['date'])
+    span = int(days.max() - days.min() + 1) if len(days) else 1
+    keys = codes.astype(np.int64) * span + (days - (days.min() if len(days) else 0))
+
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    net = np.bincount(inverse, weights=signed)
+    account_codes = unique_keys // span
+    closing = segmented_cumsum(net, group_starts(account_codes))
+    day_numbers = unique_keys % span + (days.min() if len(days) else 0)
+    return names[account_codes], day_numbers, net, closing
+
+
+def compact_keys(ids):
+    """12-byte join keys instead of 24-char unicode (96 bytes) per id
+
+    ObjectIds are hex-decoded in one array pass; anything else falls back
+    to compact_id, so the keys match it.
+    """
+    ids = np.asarray(ids, dtype='U24')
+    keys = np.zeros(len(ids), dtype='S12')
+    valid = np.zeros(len(ids), dtype=bool)
+    try:
+        raw = ids.astype('S24')
+    except UnicodeEncodeError:
+        raw = None
+    if raw is not None and len(ids):
+        nibbles = HEX_VALUES[np.frombuffer(raw.tobytes(), dtype=np.uint8).reshape(-1, 24)]
+        valid = (nibbles != 255).all(axis=1)
+        packed = (nibbles[:, 0::2] << 4) | nibbles[:, 1::2]
+        keys[valid] = np.ascontiguousarray(packed[valid]).view('S12').ravel()
+    for i in np.flatnonzero(~valid):
+        keys[i] = compact_id(str(ids[i]))
+    return keys
+
+
+def orphan_movements(m, documents):
+    """Mask of movements pointing at a document that does not exist"""
+    has_ref = m['_document'] != ''
+    return has_ref & ~np.isin(compact_keys(m['_document']), compact_keys(documents))
+
+# ============================================================================
+# REPORTING
+# ============================================================================
+
+def compare_snapshots(names, income, outcome, accounts):
+    """Rows (account, computed, snapshot, diff) for accounts that disagree"""
+    mismatches = []
+    computed = {str(name): (float(inc), float(out))
+                for name, inc, out in zip(names, income, outcome)}
+    for account_id in sorted(set(computed) | set(accounts)):
+        if not account_id:
+            continue
+        inc, out = computed.get(account_id, (0.0, 0.0))
+        snapshot = (accounts.get(account_id) or {}).get('balance') or {}
+        expected = float(snapshot.get('balance', 0) or 0)
+        diff = (inc - out) - expected
+        if abs(diff) > TOLERANCE:
+            mismatches.append({
+                'account': account_id,
+                'name': (accounts.get(account_id) or {}).get('name', ''),
+                'income': round(inc, 2),
+                'outcome': round(out, 2),
+                'computed_balance': round(inc - out, 2),
+                'snapshot_balance': expected,
+                'diff': round(diff, 2),
+            })
+    return mismatches
+
+
+def write_csv(path, header, rows):
+    """Write rows (iterables) to a CSV file"""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Reconcile account balances with money movements")
+    parser.add_argument('--source', choices=['files', 'db'], default='files',
+                        help="read the extracted JSON files or the imported database")
+    parser.add_argument('--out', metavar='DIR',
+                        help="write balances, daily balances and orphans as CSV into DIR")
+    return parser.parse_args()
+
+
+def main():
+    """Run the reconciliation"""
+    args = parse_args()
+
+    print("=" * 80)
+    print("🧮 ACCOUNT BALANCE RECONCILIATION")
+    print("=" * 80)
+    print(f"Started: {datetime.now()}")
+    print(f"Source: {args.source}")
+    print("=" * 80)
+
+    started = time.time()
+    movements, documents, accounts = load_from_db() if args.source == 'db' else load_from_files()
+    loaded = time.time()
+    print(f"\n📥 Loaded {len(movements['sum']):,} movements, {len(documents):,} documents, "
+          f"{len(accounts):,} accounts in {loaded - started:.1f}s")
+
+    names, codes, income, outcome, counts = account_totals(movements)
+    running = running_balances(movements, codes)
+    day_accounts, day_numbers, day_net, day_closing = daily_balances(movements, codes, names)
+    orphans = orphan_movements(movements, documents)
+    mismatches = compare_snapshots(names, income, outcome, accounts)
+    print(f"⚡ Computed in {time.time() - loaded:.2f}s")
+
+    print("\n🏦 Balances per account:")
+    for name, inc, out, count in zip(names, income, outcome, counts):
+        label = (accounts.get(name) or {}).get('name', '') if name else '(no account)'
+        print(f"   {name or '-':24s} {label[:24]:24s} {count:>8,} movements  "
+              f"in {inc:>14,.2f}  out {out:>14,.2f}  balance {inc - out:>14,.2f}")
+
+    print(f"\n🔍 Snapshot mismatches: {len(mismatches):,}")
+    for row in mismatches:
+        print(f"   {row['account']} {row['name'][:24]:24s} computed {row['computed_balance']:>14,.2f}  "
+              f"snapshot {row['snapshot_balance']:>14,.2f}  diff {row['diff']:>12,.2f}")
+
+    print(f"\n🔗 Movements referencing missing documents: {int(orphans.sum()):,}")
+
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+        write_csv(os.path.join(args.out, 'account_balances.csv'),
+                  ['account', 'movements', 'income', 'outcome', 'balance'],
+                  zip(names, counts, income.round(2), outcome.round(2), (income - outcome).round(2)))
+        write_csv(os.path.join(args.out, 'daily_balances.csv'),
+                  ['account', 'day', 'net', 'closing_balance'],
+                  ((a, date(1970, 1, 1) + timedelta(days=int(d)), round(n, 2), round(c, 2))
+                   for a, d, n, c in zip(day_accounts, day_numbers, day_net, day_closing)))
+        write_csv(os.path.join(args.out, 'running_balances.csv'),
+                  ['_id', 'account', 'date', 'sum', 'running_balance'],
+                  zip(movements['_id'], movements['account'], movements['date'],
+                      movements['sum'], running.round(2)))
+        write_csv(os.path.join(args.out, 'balance_mismatches.csv'),
+                  ['account', 'name', 'income', 'outcome', 'computed_balance',
+                   'snapshot_balance', 'diff'],
+                  (row.values() for row in mismatches))
+        write_csv(os.path.join(args.out, 'orphan_movements.csv'),
+                  ['_id', '_document', 'account', 'date', 'sum'],
+                  zip(movements['_id'][orphans], movements['_document'][orphans],
+                      movements['account'][orphans], movements['date'][orphans],
+                      movements['sum'][orphans]))
+        print(f"\n📁 Reports saved to: {args.out}")
+
+    print("\n" + "=" * 80)
+    print("✅ RECONCILIATION COMPLETE!")
+    print(f"🕐 Finished: {datetime.now()}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Random-access snapshot files for extracted records
+A .snap file holds length-prefixed zlib-compressed records followed by an
+index sorted by _id (offset, length, date and content digest per record) and
+a second index ordering those entries by date. Readers memory-map the file,
+so one record, an id range or a date slice is found by binary search and
+only the records asked for are decompressed and parsed.
+
+Usage:
+    python snapshot_store.py convert documents.json
+    python snapshot_store.py get documents.snap <_id>
+    python snapshot_store.py range documents.snap <from_id> <to_id>
+    python snapshot_store.py dates documents.snap 2024-05-01 2024-06-01
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from datetime import datetime, timezone
+from hashlib import blake2b
+
+MAGIC = b'AINSNAP1'
+DIGEST_BYTES = 16
+
+# index_offset, date_index_offset, count, id_width, magic
+FOOTER = struct.Struct('<QQQI8s')
+# offset, compressed length, date, digest (the id precedes it)
+ENTRY_TAIL = struct.Struct(f'<QIq{DIGEST_BYTES}s')
+LENGTH = struct.Struct('<I')
+POSITION = struct.Struct('<I')
+
+
+def record_digest(record):
+    """Content digest of a record, independent of key order"""
+    canonical = json.dumps(record, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return blake2b(canonical.encode(), digest_size=DIGEST_BYTES).digest()
+
+
+def record_date(record):
+    """The record's date as an int (0 when missing)"""
+    try:
+        return int(record.get('date') or 0)
+    except (TypeError, ValueError):
+        return 0
+
+# ============================================================================
+# WRITING
+# ============================================================================
+
+class SnapshotWriter:
+    """Append records, then write both indexes on close
+
+    The file is written under a temporary name and renamed into place,
+    so readers never see a half-written snapshot.
+    """
+
+    def __init__(self, path, level=6):
+        self.path = path
+        self.level = level
+        self.tmp_path = f"{path}.tmp"
+        self.file = open(self.tmp_path, 'wb')
+        self.file.write(MAGIC)
+        self.entries = []
+
+    def add(self, record):
+        """Store one record (it must have an _id)"""
+        data = json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode()
+        blob = zlib.compress(data, self.level)
+        offset = self.file.tell()
+        self.file.write(LENGTH.pack(len(blob)))
+        self.file.write(blob)
+        self.entries.append((str(record['_id']).encode(), offset, len(blob),
+                             record_date(record), record_digest(record)))
+
+    def close(self):
+        """Write the indexes and footer and move the file into place
+
+        A record added twice is indexed once, by its last copy.
+        """
+        # Offsets grow with every add, so the last copy of an _id sorts last
+        self.entries.sort()
+        self.entries = [e for i, e in enumerate(self.entries)
+                        if i + 1 == len(self.entries) or self.entries[i + 1][0] != e[0]]
+        id_width = max((len(e[0]) for e in self.entries), default=24)
+
+        index_offset = self.file.tell()
+        for key, offset, length, date, digest in self.entries:
+            self.file.write(key.ljust(id_width, b'\0'))
+            self.file.write(ENTRY_TAIL.pack(offset, length, date, digest))
+
+        date_index_offset = self.file.tell()
+        by_date = sorted(range(len(self.entries)), key=lambda i: (self.entries[i][3], i))
+        self.file.write(b''.join(POSITION.pack(i) for i in by_date))
+
+        self.file.write(FOOTER.pack(index_offset, date_index_offset, len(self.entries),
+                                    id_width, MAGIC))
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+            os.remove(self.tmp_path)
+
+
+def write_snapshot(path, records):
+    """Write an iterable of records as a snapshot; returns how many were written"""
+    with SnapshotWriter(path) as writer:
+        for record in records:
+            if isinstance(record, dict) and record.get('_id') is not None:
+                writer.add(record)
+    # Counted after close, which drops repeated ids
+    return len(writer.entries)
+
+# ============================================================================
+# READING
+# ============================================================================
+
+class SnapshotReader:
+    """Memory-mapped view of a snapshot file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a snapshot file")
+        (self.index_offset, self.date_index_offset, self.count,
+         self.id_width, magic) = FOOTER.unpack_from(self.map, len(self.map) - FOOTER.size)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is truncated")
+        self.entry_size = self.id_width + ENTRY_TAIL.size
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Index access -----------------------------------------------------------
+
+    def key_at(self, i):
+        start = self.index_offset + i * self.entry_size
+        return self.map[start:start + self.id_width].rstrip(b'\0').decode()
+
+    def entry_at(self, i):
+        """(_id, offset, length, date, digest) of the i-th entry in id order"""
+        start = self.index_offset + i * self.entry_size
+        key = self.map[start:start + self.id_width].rstrip(b'\0').decode()
+        return (key,) + ENTRY_TAIL.unpack_from(self.map, start + self.id_width)
+
+    def bisect(self, _id):
+        """First index position whose _id is >= _id"""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key_at(mid) < _id:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def index(self):
+        """(_id, date, digest) for every record in id order, without decompressing"""
+        for i in range(self.count):
+            key, _, _, date, digest = self.entry_at(i)
+            yield key, date, digest
+
+    # Records ----------------------------------------------------------------
+
+    def read(self, offset, length):
+        start = offset + LENGTH.size
+        return json.loads(zlib.decompress(self.map[start:start + length]))
+
+    def get(self, _id):
+        """One record by _id, or None"""
+        i = self.bisect(_id)
+        if i < self.count:
+            key, offset, length, _, _ = self.entry_at(i)
+            if key == _id:
+                return self.read(offset, length)
+        return None
+
+    def range(self, start=None, end=None):
+        """Records with start <= _id < end, in id order"""
+        i = self.bisect(start) if start is not None else 0
+        while i < self.count:
+            key, offset, length, _, _ = self.entry_at(i)
+            if end is not None and key >= end:
+                break
+            yield self.read(offset, length)
+            i += 1
+
+    def __iter__(self):
+        return self.range()
+
+    def date_position(self, i):
+        return POSITION.unpack_from(self.map, self.date_index_offset + i * POSITION.size)[0]
+
+    def by_date(self, start=None, end=None):
+        """Records with start <= date < end (epoch seconds), oldest first"""
+        lo, hi = 0, self.count
+        if start is not None:
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self.entry_at(self.date_position(mid))[3] < start:
+                    lo = mid + 1
+                else:
+                    hi = mid
+        for i in range(lo, self.count):
+            _, offset, length, date, _ = self.entry_at(self.date_position(i))
+            if end is not None and date >= end:
+                break
+            yield self.read(offset, length)
+
+
+def snapshot_path(json_path):
+    """documents.json -> documents.snap"""
+    return os.path.splitext(json_path)[0] + '.snap'
+
+# ============================================================================
+# COMMAND LINE
+# ============================================================================
+
+def day_arg(value):
+    """YYYY-MM-DD as epoch seconds (UTC)"""
+    return int(datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp())
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Read and write snapshot files")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    convert = commands.add_parser('convert', help="write <name>.snap next to a JSON dump")
+    convert.add_argument('json_file')
+
+    get = commands.add_parser('get', help="print one record")
+    get.add_argument('snapshot')
+    get.add_argument('id')
+
+    ids = commands.add_parser('range', help="print records with from_id <= _id < to_id")
+    ids.add_argument('snapshot')
+    ids.add_argument('from_id')
+    ids.add_argument('to_id')
+
+    dates = commands.add_parser('dates', help="print records dated in [from_day, to_day)")
+    dates.add_argument('snapshot')
+    dates.add_argument('from_day', type=day_arg)
+    dates.add_argument('to_day', type=day_arg)
+    return parser.parse_args()
+
+
+def main():
+    """Run one snapshot command"""
+    args = parse_args()
+
+    if args.command == 'convert':
+        with open(args.json_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        path = snapshot_path(args.json_file)
+        count = write_snapshot(path, data if isinstance(data, list) else [data])
+        size_kb = os.path.getsize(path) / 1024
+        print(f"✅ {count:,} records → {path} ({size_kb:,.1f} KB)")
+        return
+
+    with SnapshotReader(args.snapshot) as reader:
+        if args.command == 'get':
+            record = reader.get(args.id)
+            if record is None:
+                print(f"❌ {args.id} not found", file=sys.stderr)
+                sys.exit(1)
+            records = [record]
+        elif args.command == 'range':
+            records = reader.range(args.from_id, args.to_id)
+        else:
+            records = reader.by_date(args.from_day, args.to_day)
+
+        for record in records:
+            print(json.dumps(record, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
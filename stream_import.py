@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Stream Ainur data straight into PostgreSQL
+Pages coming out of the paginated API calls go through a bounded queue into
+the bulk loader of import_data_to_postgres.py, so fetching, transforming and
+loading overlap instead of running one after the other through JSON files.
+The stream can optionally be teed to NDJSON archive files.
+"""
+
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+import psycopg2
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from extract_all_ainur_data import (
+    COMPANY_ID, make_request, get_simple, iter_paginated, iter_search
+)
+from import_columns import TABLES
+from import_data_to_postgres import (
+    DB_CONFIG, IMPORT_WORKERS, copy_upsert, transform_chunk, quarantine, category_records,
+    ensure_schema, track_affected_days, refresh_daily_aggregates, recompute_debts, report
+)
+
+# Pages held between the fetcher and the loader; a full queue pauses fetching
+QUEUE_PAGES = int(os.environ.get('STREAM_QUEUE_PAGES', 8))
+
+# Marks the end of one table's pages in the queue
+END_OF_TABLE = object()
+
+# ============================================================================
+# SOURCES
+# ============================================================================
+
+def get_categories():
+    """Categories come as a plain list of names"""
+    result = make_request(f"/data/{COMPANY_ID}/catalog/categories")
+    if result and result.get('status'):
+        return result.get('data', [])
+    return []
+
+
+# Load order matches import_data_to_postgres.main; each source yields pages
+STREAM_SOURCES = [
+    ('stores', "Stores", lambda: iter([get_simple('stores')])),
+    ('accounts', "Accounts", lambda: iter([get_simple('accounts')])),
+    ('money_sources', "Money sources", lambda: iter([get_simple('sources')])),
+    ('categories', "Categories", lambda: iter([category_records(get_categories())])),
+    ('products', "Products", lambda: iter_paginated('catalog')),
+    ('customers', "Customers", lambda: iter_paginated('clients')),
+    ('suppliers', "Suppliers", lambda: iter([get_simple('suppliers')])),
+    ('documents', "Documents", lambda: iter_search('docs', {})),
+    ('money_movements', "Money movements", lambda: iter_search('money', {})),
+]
+
+# ============================================================================
+# PIPELINE
+# ============================================================================
+
+class PageStream:
+    """Bounded page queue between the fetching thread and the loader
+
+    Also keeps the time each side spent waiting for the other, which shows
+    whether a run was limited by the network or by the database.
+    """
+
+    def __init__(self, size, archive_dir=None):
+        self.pages = queue.Queue(maxsize=size)
+        self.stop = threading.Event()
+        self.archive_dir = archive_dir
+        self.fetch_wait = 0.0
+        self.load_wait = 0.0
+        self.error = None
+
+    def put(self, item):
+        """Block while the queue is full, unless the loader gave up"""
+        started = time.time()
+        while not self.stop.is_set():
+            try:
+                self.pages.put(item, timeout=1)
+                break
+            except queue.Full:
+                continue
+        self.fetch_wait += time.time() - started
+
+    def get(self):
+        """Next (table, page) from the fetcher"""
+        started = time.time()
+        item = self.pages.get()
+        self.load_wait += time.time() - started
+        if item is None:
+            raise RuntimeError(f"Fetching stopped: {self.error}")
+        return item
+
+    def fetch(self, sources):
+        """Fetcher thread: push every page of every source into the queue"""
+        try:
+            for table, _, pages in sources:
+                archive = None
+                if self.archive_dir:
+                    archive = open(os.path.join(self.archive_dir, f"{table}.ndjson"),
+                                   'w', encoding='utf-8')
+                try:
+                    for page in pages():
+                        if self.stop.is_set():
+                            return
+                        if archive:
+                            archive.writelines(json.dumps(r, ensure_ascii=False) + '\n'
+                                               for r in page)
+                        self.put((table, page))
+                finally:
+                    if archive:
+                        archive.close()
+                self.put((table, END_OF_TABLE))
+        except Exception as e:
+            self.error = e
+            self.put(None)
+
+    def buffers(self, table, pool, stats):
+        """COPY buffers for one table's pages, transformed while fetching continues
+
+        At most IMPORT_WORKERS pages are in the pool at once, so a slow
+        database also slows down how much is pulled off the queue.
+        """
+        pending = deque()
+        while True:
+            name, page = self.get()
+            if name != table:
+                raise RuntimeError(f"Expected pages for {table}, got {name}")
+            if page is END_OF_TABLE:
+                break
+            stats['pages'] += 1
+            stats['records'] += len(page)
+            if pool is None:
+                yield quarantine(table, transform_chunk(table, page))
+                continue
+            pending.append(pool.submit(transform_chunk, table, page))
+            if len(pending) >= IMPORT_WORKERS:
+                yield quarantine(table, pending.popleft().result())
+        while pending:
+            yield quarantine(table, pending.popleft().result())
+
+
+def stream_tables(cursor, conn, stream, sources, pool):
+    """Load every source's pages as they arrive, committing table by table"""
+    results = {}
+    for table, label, _ in sources:
+        print(f"\n📥 Streaming {label.upper()}...")
+        started = time.time()
+        stats = {'pages': 0, 'records': 0}
+        hook = track_affected_days if table == 'documents' else None
+
+        counts = copy_upsert(cursor, TABLES[table], stream.buffers(table, pool, stats), hook)
+        results[table] = report(counts, label)
+        print(f"   {stats['records']:,} records in {stats['pages']:,} pages, "
+              f"{time.time() - started:.1f}s")
+
+        if table == 'documents':
+            days = refresh_daily_aggregates(cursor)
+            print(f"   ✅ Daily aggregates refreshed for {days:,} store-days")
+        conn.commit()
+    return results
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Stream Ainur data straight into PostgreSQL")
+    parser.add_argument('--archive', metavar='DIR',
+                        help="also write every streamed record to DIR/<table>.ndjson")
+    parser.add_argument('--queue-pages', type=int, default=QUEUE_PAGES,
+                        help=f"pages buffered between fetching and loading (default {QUEUE_PAGES})")
+    parser.add_argument('--reset-schema', action='store_true',
+                        help="drop and recreate all tables before loading")
+    return parser.parse_args()
+
+
+def main():
+    """Fetch and load in one pass"""
+    args = parse_args()
+
+    print("=" * 80)
+    print("🌊 AINUR STREAMING IMPORT TO POSTGRESQL")
+    print("=" * 80)
+    print(f"Started: {datetime.now()}")
+    print(f"Company ID: {COMPANY_ID}")
+    print(f"Database: {DB_CONFIG['dbname']} @ {DB_CONFIG['host']}")
+    print(f"Queue: {args.queue_pages} pages, {IMPORT_WORKERS} transform workers")
+    if args.archive:
+        os.makedirs(args.archive, exist_ok=True)
+        print(f"Archive: {args.archive}")
+    print("=" * 80)
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    conn.autocommit = False
+    cursor = conn.cursor()
+
+    started = time.time()
+    stream = PageStream(args.queue_pages, args.archive)
+    fetcher = threading.Thread(target=stream.fetch, args=(STREAM_SOURCES,), daemon=True)
+    pool = ProcessPoolExecutor(max_workers=IMPORT_WORKERS) if IMPORT_WORKERS > 1 else None
+
+    try:
+        ensure_schema(cursor, args.reset_schema)
+        conn.commit()
+
+        fetcher.start()
+        results = stream_tables(cursor, conn, stream, STREAM_SOURCES, pool)
+
+        print("\n💳 Recomputing customer and supplier debt...")
+        for table, count in recompute_debts(cursor).items():
+            print(f"   ✅ {table}: {count:,} debts changed")
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"\n❌ Error during streaming import: {e}")
+        raise
+    finally:
+        stream.stop.set()
+        if pool:
+            pool.shutdown()
+        cursor.close()
+        conn.close()
+
+    elapsed = time.time() - started
+    print("\n" + "=" * 80)
+    print("📊 STREAMING SUMMARY")
+    print("=" * 80)
+    print(f"   {'':20s}  {'inserted':>10s} {'updated':>10s} {'unchanged':>10s}")
+    for name, counts in results.items():
+        print(f"   {name:20s}: {counts['inserted']:>10,} {counts['updated']:>10,} "
+              f"{counts['unchanged']:>10,}")
+    print("-" * 80)
+    print(f"   Total time: {elapsed:.1f}s")
+    print(f"   Loader waiting for the network: {stream.load_wait:.1f}s")
+    print(f"   Fetcher waiting for the database: {stream.fetch_wait:.1f}s")
+    print("=" * 80)
+    print("✅ STREAMING IMPORT COMPLETE!")
+    print(f"🕐 Finished: {datetime.now()}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
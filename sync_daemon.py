@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Continuous sync from Ainur into PostgreSQL
+Polls /search/docs and /search/money from just before the last successful
+cycle at a fixed interval, re-reading a wider window now and then to catch
+edits to older records, and upserts through the hash-guarded loader, so only
+new or changed records are written. Lag and throughput are served as
+Prometheus metrics.
+"""
+
+import argparse
+import os
+import threading
+import time
+import psycopg2
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from extract_all_ainur_data import COMPANY_ID, iter_search, search_total
+from import_columns import TABLES
+from import_data_to_postgres import (
+    DB_CONFIG, SCHEMA_PATH, copy_upsert, transform_chunk, quarantine, track_affected_days,
+    refresh_daily_aggregates, recompute_debts, schema_table
+)
+
+# Seconds between the start of two cycles
+SYNC_INTERVAL = int(os.environ.get('SYNC_INTERVAL', 30))
+
+# How far back a rescan looks; edits to older records need a full import
+SYNC_WINDOW = int(os.environ.get('SYNC_WINDOW', 86400))
+
+# Seconds between two rescans of the whole window; other cycles only poll recent changes
+SYNC_RESCAN_INTERVAL = int(os.environ.get('SYNC_RESCAN_INTERVAL', 3600))
+
+# Extra seconds re-read before the last successful cycle
+SYNC_OVERLAP = int(os.environ.get('SYNC_OVERLAP', 300))
+
+# Page size for the search calls; a quiet window fits in a single request
+SYNC_PAGE_SIZE = int(os.environ.get('SYNC_PAGE_SIZE', 1000))
+
+METRICS_PORT = int(os.environ.get('SYNC_METRICS_PORT', 9108))
+
+# Search endpoint polled for each table
+SYNC_ENDPOINTS = [
+    ('documents', 'docs'),
+    ('money_movements', 'money'),
+]
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+class SyncMetrics:
+    """Counters and gauges shared between the sync loop and the HTTP server"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.cycles = 0
+        self.errors = 0
+        self.last_success = None
+        self.last_duration = 0.0
+        self.newest_record = None
+        self.totals = {table: {'fetched': 0, 'pages': 0, 'inserted': 0, 'updated': 0}
+                       for table, _ in SYNC_ENDPOINTS}
+        self.last_rate = {table: 0.0 for table, _ in SYNC_ENDPOINTS}
+
+    def record_cycle(self, started, results, newest):
+        """Fold one successful cycle into the metrics"""
+        with self.lock:
+            self.cycles += 1
+            self.last_success = started
+            self.last_duration = time.time() - started
+            if newest and (self.newest_record is None or newest > self.newest_record):
+                self.newest_record = newest
+            for table, stats in results.items():
+                for key in self.totals[table]:
+                    self.totals[table][key] += stats[key]
+                self.last_rate[table] = stats['fetched'] / max(self.last_duration, 0.001)
+
+    def record_error(self):
+        with self.lock:
+            self.errors += 1
+
+    def render(self):
+        """Prometheus text exposition"""
+        now = time.time()
+        with self.lock:
+            lines = [
+                '# TYPE ainur_sync_cycles_total counter',
+                f'ainur_sync_cycles_total {self.cycles}',
+                '# TYPE ainur_sync_errors_total counter',
+                f'ainur_sync_errors_total {self.errors}',
+                '# HELP ainur_sync_lag_seconds Seconds since the start of the last successful cycle',
+                '# TYPE ainur_sync_lag_seconds gauge',
+                f'ainur_sync_lag_seconds {now - (self.last_success or self.started):.3f}',
+                '# TYPE ainur_sync_cycle_duration_seconds gauge',
+                f'ainur_sync_cycle_duration_seconds {self.last_duration:.3f}',
+            ]
+            if self.newest_record:
+                lines += [
+                    '# HELP ainur_sync_newest_record_age_seconds Age of the newest synced record date',
+                    '# TYPE ainur_sync_newest_record_age_seconds gauge',
+                    f'ainur_sync_newest_record_age_seconds {now - self.newest_record:.3f}',
+                ]
+            for key in ['fetched', 'pages', 'inserted', 'updated']:
+                lines.append(f'# TYPE ainur_sync_{key}_total counter')
+                lines += [f'ainur_sync_{key}_total{{table="{table}"}} {totals[key]}'
+                          for table, totals in self.totals.items()]
+            lines.append('# TYPE ainur_sync_records_per_second gauge')
+            lines += [f'ainur_sync_records_per_second{{table="{table}"}} {rate:.1f}'
+                      for table, rate in self.last_rate.items()]
+        return '\n'.join(lines) + '\n'
+
+
+def serve_metrics(metrics, port):
+    """Serve /metrics and /health from a background thread"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/metrics':
+                body = metrics.render().encode()
+                content_type = 'text/plain; version=0.0.4'
+            elif self.path == '/health':
+                healthy = metrics.last_success and \
+                    time.time() - metrics.last_success < 3 * SYNC_INTERVAL + metrics.last_duration
+                self.send_response(200 if healthy else 503)
+                self.end_headers()
+                return
+            else:
+                self.send_response(404)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('', port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# ============================================================================
+# SYNC
+# ============================================================================
+
+def sync_window(cursor, endpoint, table, from_date):
+    """Fetch one endpoint's window and upsert it; returns stats and newest date
+
+    A fetch that ends short of the total the endpoint reported raises, so
+    the cycle is rolled back instead of recording a partial window.
+    """
+    stats = {'fetched': 0, 'pages': 0}
+    newest = [None]
+    query = {'from_date': from_date}
+    expected = search_total(endpoint, query)
+    if expected is None:
+        raise RuntimeError(f"/search/{endpoint} did not report a total")
+
+    def buffers():
+        for page in iter_search(endpoint, query, SYNC_PAGE_SIZE):
+            stats['pages'] += 1
+            stats['fetched'] += len(page)
+            dates = [r.get('date') for r in page if isinstance(r.get('date'), (int, float))]
+            if dates:
+                newest[0] = max(dates + [newest[0] or 0])
+            yield quarantine(table, transform_chunk(table, page))
+
+    hook = track_affected_days if table == 'documents' else None
+    counts = copy_upsert(cursor, TABLES[table], buffers(), hook)
+    if stats['fetched'] < expected:
+        raise RuntimeError(f"/search/{endpoint} stopped at {stats['fetched']:,} "
+                           f"of {expected:,} records")
+    stats.update(inserted=counts['inserted'], updated=counts['updated'])
+    return stats, newest[0]
+
+
+def load_last_success(conn):
+    """Start of the last committed cycle from sync_state, or None"""
+    with open(SCHEMA_PATH, 'r') as f:
+        schema_sql = f.read()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(schema_table(schema_sql, 'sync_state'))
+        cursor.execute("SELECT last_success FROM sync_state WHERE _client = %s", (COMPANY_ID,))
+        row = cursor.fetchone()
+        conn.commit()
+        return row[0] if row else None
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def run_cycle(conn, from_date, started):
+    """One poll of every endpoint in a single transaction
+
+    The cycle's start is stored in sync_state in the same transaction, so
+    it is only recorded once everything it fetched is committed.
+    """
+    cursor = conn.cursor()
+    try:
+        results, newest = {}, None
+        for table, endpoint in SYNC_ENDPOINTS:
+            results[table], table_newest = sync_window(cursor, endpoint, table, from_date)
+            if table_newest and (newest is None or table_newest > newest):
+                newest = table_newest
+
+        changed = sum(r['inserted'] + r['updated'] for r in results.values())
+        if results['documents']['inserted'] + results['documents']['updated']:
+            refresh_daily_aggregates(cursor)
+        if changed:
+            recompute_debts(cursor)
+        cursor.execute("""
+            INSERT INTO sync_state (_client, last_success) VALUES (%s, %s)
+            ON CONFLICT (_client) DO UPDATE SET last_success = EXCLUDED.last_success
+        """, (COMPANY_ID, int(started)))
+        conn.commit()
+        return results, newest
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Keep PostgreSQL in sync with Ainur")
+    parser.add_argument('--interval', type=int, default=SYNC_INTERVAL,
+                        help=f"seconds between cycles (default {SYNC_INTERVAL})")
+    parser.add_argument('--window', type=int, default=SYNC_WINDOW,
+                        help=f"seconds of history re-read by a rescan (default {SYNC_WINDOW})")
+    parser.add_argument('--rescan-interval', type=int, default=SYNC_RESCAN_INTERVAL,
+                        help=f"seconds between rescans of the whole window "
+                             f"(default {SYNC_RESCAN_INTERVAL})")
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT,
+                        help=f"port for /metrics and /health, 0 to disable (default {METRICS_PORT})")
+    parser.add_argument('--once', action='store_true',
+                        help="run a single cycle and exit")
+    return parser.parse_args()
+
+
+def main():
+    """Poll forever"""
+    args = parse_args()
+
+    print("=" * 80)
+    print("🔄 AINUR CONTINUOUS SYNC")
+    print("=" * 80)
+    print(f"Started: {datetime.now()}")
+    print(f"Company ID: {COMPANY_ID}")
+    print(f"Database: {DB_CONFIG['dbname']} @ {DB_CONFIG['host']}")
+    print(f"Interval: {args.interval}s, window: {args.window}s "
+          f"rescanned every {args.rescan_interval}s")
+    print("=" * 80)
+
+    metrics = SyncMetrics()
+    if args.metrics_port:
+        serve_metrics(metrics, args.metrics_port)
+        print(f"📈 Metrics on http://0.0.0.0:{args.metrics_port}/metrics")
+
+    conn = None
+    last_rescan = None
+    try:
+        while True:
+            started = time.time()
+            try:
+                if conn is None or conn.closed:
+                    conn = psycopg2.connect(**DB_CONFIG)
+                    # A restarted daemon resumes from the last committed cycle
+                    if metrics.last_success is None:
+                        metrics.last_success = load_last_success(conn)
+
+                # Poll from the last good cycle; rescan the whole window at start
+                # and every rescan interval, still reaching back after an outage
+                rescan = not metrics.last_success or last_rescan is None or \
+                    started - last_rescan >= args.rescan_interval
+                from_date = int(started) - args.window
+                if metrics.last_success:
+                    since_success = int(metrics.last_success) - SYNC_OVERLAP
+                    from_date = min(from_date, since_success) if rescan else since_success
+                results, newest = run_cycle(conn, from_date, started)
+                metrics.record_cycle(started, results, newest)
+                if rescan:
+                    last_rescan = started
+                summary = ', '.join(f"{table} {r['fetched']:,} fetched / "
+                                    f"{r['inserted']:,} new / {r['updated']:,} changed"
+                                    for table, r in results.items())
+                print(f"[{datetime.now():%H:%M:%S}] ✅ {'rescan: ' if rescan else ''}{summary} "
+                      f"({time.time() - started:.1f}s)")
+            except psycopg2.OperationalError as e:
+                metrics.record_error()
+                print(f"[{datetime.now():%H:%M:%S}] ❌ Database error, reconnecting: {e}")
+                if conn is not None:
+                    conn.close()
+                conn = None
+            except Exception as e:
+                metrics.record_error()
+                print(f"[{datetime.now():%H:%M:%S}] ❌ Cycle failed: {e}")
+
+            if args.once:
+                break
+            time.sleep(max(0, args.interval - (time.time() - started)))
+    except KeyboardInterrupt:
+        print("\n👋 Stopping sync")
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
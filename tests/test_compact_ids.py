@@ -0,0 +1,31 @@
+from compact_ids import ObjectIdSet, compact_id, intern_refs
+
+
+def test_compact_id():
+    assert compact_id('58c872aa3ce7d5fc688b49bd') == bytes.fromhex('58c872aa3ce7d5fc688b49bd')
+    assert len(compact_id('walk-in')) == 12
+    assert compact_id('z' * 24) != compact_id('y' * 24)
+    assert compact_id(42) == compact_id('42')
+
+
+def test_add_reports_new_ids_only():
+    ids = ObjectIdSet()
+    assert ids.add('58c872aa3ce7d5fc688b49bd')
+    assert not ids.add('58c872aa3ce7d5fc688b49bd')
+    assert ids.add('walk-in') and 'walk-in' in ids
+    assert 'missing' not in ids and len(ids) == 2
+
+
+def test_grows_past_initial_capacity():
+    ids = ObjectIdSet(capacity=4)
+    values = [f"{i:024x}" for i in range(5000)]
+    assert all(ids.add(v) for v in values)
+    assert not any(ids.add(v) for v in values)
+    assert len(ids) == 5000 and all(v in ids for v in values)
+    assert f"{5000:024x}" not in ids
+
+
+def test_intern_refs_shares_reference_strings():
+    a = intern_refs({'_store': ''.join(['5c', 'a' * 22]), 'name': 'x'})
+    b = intern_refs({'_store': ''.join(['5c', 'a' * 22])})
+    assert a['_store'] is b['_store']
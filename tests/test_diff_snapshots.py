@@ -0,0 +1,81 @@
+import pytest
+
+from diff_snapshots import merge_index
+from snapshot_store import SnapshotReader, write_snapshot
+
+
+@pytest.fixture
+def snap(tmp_path):
+    readers = []
+
+    def make(name, records):
+        path = str(tmp_path / f"{name}.snap")
+        write_snapshot(path, records)
+        readers.append(SnapshotReader(path))
+        return readers[-1]
+
+    yield make
+    for reader in readers:
+        reader.close()
+
+
+def changes(old, new):
+    return [(status, _id) for status, _id, _ in merge_index(old, new)]
+
+
+def test_added_changed_deleted(snap):
+    old = snap('old', [{'_id': 'a', 'v': 1}, {'_id': 'b', 'v': 1}, {'_id': 'c', 'v': 1}])
+    new = snap('new', [{'_id': 'b', 'v': 1}, {'_id': 'c', 'v': 2}, {'_id': 'd', 'v': 1}])
+    assert changes(old, new) == [('deleted', 'a'), ('changed', 'c'), ('added', 'd')]
+
+
+def test_positions_point_into_new(snap):
+    old = snap('old', [{'_id': 'b', 'v': 1}])
+    new = snap('new', [{'_id': 'a', 'v': 1}, {'_id': 'b', 'v': 2}])
+    for _, _id, position in merge_index(old, new):
+        assert new.entry_at(position)[0] == _id
+
+
+def test_without_old_snapshot_everything_is_added(snap):
+    new = snap('new', [{'_id': 'a'}, {'_id': 'b'}])
+    assert changes(None, new) == [('added', 'a'), ('added', 'b')]
+
+
+def test_duplicate_ids_are_not_deleted(snap):
+    old = snap('old', [{'_id': 'a', 'v': 1}, {'_id': 'a', 'v': 2}, {'_id': 'b', 'v': 1}])
+    new = snap('new', [{'_id': 'a', 'v': 2}, {'_id': 'b', 'v': 1}, {'_id': 'b', 'v': 1}])
+    assert len(old) == 2 and len(new) == 2
+    assert changes(old, new) == []
+
+
+def test_last_copy_of_a_duplicate_wins(snap):
+    old = snap('old', [{'_id': 'a', 'v': 1}])
+    new = snap('new', [{'_id': 'a', 'v': 1}, {'_id': 'a', 'v': 2}])
+    assert new.get('a') == {'_id': 'a', 'v': 2}
+    assert changes(old, new) == [('changed', 'a')]
+
+
+def test_write_snapshot_counts_unique_ids(tmp_path):
+    assert write_snapshot(str(tmp_path / 'x.snap'), [{'_id': 'a'}, {'_id': 'a'}, {'_id': 'b'}]) == 2
+
+
+class Index:
+    """In-memory stand-in for an older snapshot whose index repeats ids"""
+
+    def __init__(self, entries):
+        self.entries = [(key, 0, 0, 0, digest) for key, digest in entries]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def entry_at(self, i):
+        return self.entries[i]
+
+    def key_at(self, i):
+        return self.entries[i][0]
+
+
+def test_repeated_index_entries_count_once():
+    old = Index([('a', b'1'), ('a', b'2'), ('b', b'1'), ('b', b'1')])
+    new = Index([('a', b'2'), ('b', b'1'), ('b', b'3'), ('c', b'1')])
+    assert list(merge_index(old, new)) == [('changed', 'b', 2), ('added', 'c', 3)]
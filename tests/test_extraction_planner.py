@@ -0,0 +1,94 @@
+from datetime import datetime, timezone
+
+import pytest
+
+import extract_all_ainur_data as extractor
+from extraction_planner import PAGE_MAX, date_windows, fit_budget, plan_resource
+
+
+def ts(*args):
+    return int(datetime(*args, tzinfo=timezone.utc).timestamp())
+
+
+def test_month_windows_are_contiguous_and_open_ended():
+    windows = date_windows(ts(2024, 1, 15), ts(2024, 3, 2), 'month')
+    assert windows == [(0, ts(2024, 2, 1)), (ts(2024, 2, 1), ts(2024, 3, 1)),
+                       (ts(2024, 3, 1), 2 ** 31 - 1)]
+
+
+def test_week_windows_start_on_monday():
+    windows = date_windows(ts(2024, 5, 8), ts(2024, 5, 20), 'week')
+    assert [start for start, _ in windows[1:]] == [ts(2024, 5, 13), ts(2024, 5, 20)]
+    assert windows[0] == (0, ts(2024, 5, 13))
+    assert all(a[1] == b[0] for a, b in zip(windows, windows[1:]))
+
+
+def test_single_day_window_covers_everything():
+    assert date_windows(ts(2024, 5, 8, 10), ts(2024, 5, 8, 12), 'day') == [(0, 2 ** 31 - 1)]
+
+
+def probe(count):
+    return {'count': count, 'latency': 0.1, 'bytes_per_record': 100,
+            'seconds_per_record': 0.0001, 'newest': 0, 'probe_requests': 2}
+
+
+def plans_for(probes, page_size):
+    return {key: plan_resource('data', key.split(':', 1)[1], info, page_size)
+            for key, info in probes.items()}
+
+
+def test_fit_budget_grows_the_costliest_resource_first():
+    probes = {'data:catalog': probe(8000), 'data:clients': probe(2000)}
+    plans = plans_for(probes, 500)
+    assert [plans[k]['requests'] for k in probes] == [16, 4]
+    assert fit_budget(plans, probes, 12)
+    assert plans['data:catalog']['page_size'] == 1000 and plans['data:clients']['page_size'] == 500
+    assert sum(p['requests'] for p in plans.values()) <= 12
+
+
+def test_fit_budget_reports_when_nothing_fits():
+    probes = {'data:catalog': probe(PAGE_MAX * 10)}
+    plans = plans_for(probes, 500)
+    assert not fit_budget(plans, probes, 5)
+    assert plans['data:catalog']['page_size'] == PAGE_MAX
+
+
+def test_no_budget_always_fits():
+    probes = {'data:catalog': probe(10 ** 6)}
+    plans = plans_for(probes, 100)
+    assert fit_budget(plans, probes, 0) and plans['data:catalog']['page_size'] == 100
+
+
+def test_windowed_search_fails_on_a_shortfall(monkeypatch):
+    plan = {'count': 3, 'windows': [(0, 10), (10, 2 ** 31 - 1)], 'granularity': 'day',
+            'concurrency': 1, 'page_size': 100}
+    monkeypatch.setitem(extractor.RESOURCE_PLANS, 'search:docs', plan)
+    monkeypatch.setattr(extractor, 'search_paginated',
+                        lambda endpoint, body, limit: [{'_id': str(body['from_date'])}])
+    monkeypatch.setattr(extractor, 'search_total', lambda endpoint: 3)
+    with pytest.raises(RuntimeError):
+        extractor.search_planned('docs')
+
+    monkeypatch.setattr(extractor, 'search_total', lambda endpoint: 2)
+    assert len(extractor.search_planned('docs')) == 2
+
+
+def test_parallel_offsets_retry_a_timed_out_page_in_halves(monkeypatch):
+    records = [{'_id': str(i)} for i in range(1050)]
+    requested = []
+
+    def make_request(path, method='GET', body=None, stats=None):
+        query = dict(part.split('=') for part in path.split('?')[1].split('&'))
+        offset, limit = int(query['offset']), int(query['limit'])
+        requested.append((offset, limit))
+        if offset == 200 and limit > 100:
+            stats.update(timeout=True)
+            return None
+        stats.update(timeout=False, bytes=10 * limit, seconds=0.01)
+        return {'status': True, 'data': records[offset:offset + limit]}
+
+    monkeypatch.setattr(extractor, 'make_request', make_request)
+    monkeypatch.setattr(extractor, 'PROJECT_FIELDS', False)
+    data = extractor.get_offsets_parallel('catalog', 1000, 200, 4)
+    assert data == records
+    assert (200, 100) in requested and (300, 100) in requested
@@ -0,0 +1,67 @@
+import extract_all_ainur_data as extractor
+from extract_all_ainur_data import PAGE_TARGET_BYTES, PAGE_TARGET_SECONDS, PageSizer, fetch_page
+
+
+def test_start_is_clamped():
+    assert PageSizer(50, 100, 1000).size == 100
+    assert PageSizer(5000, 100, 1000).size == 1000
+
+
+def test_grows_at_most_double_per_page():
+    sizer = PageSizer(100, 10, 100000)
+    sizer.observe(100, 1, 0.001)
+    assert sizer.size == 200
+
+
+def test_shrinks_to_byte_target():
+    sizer = PageSizer(1000, 10, 100000)
+    sizer.observe(1000, 4 * PAGE_TARGET_BYTES, 0.001)
+    assert sizer.size == 250
+
+
+def test_shrinks_to_time_target():
+    sizer = PageSizer(1000, 10, 100000)
+    sizer.observe(1000, 1, 2 * PAGE_TARGET_SECONDS)
+    assert sizer.size == 500
+
+
+def test_empty_page_changes_nothing():
+    sizer = PageSizer(1000, 10, 100000)
+    sizer.observe(0, 0, 30)
+    assert sizer.size == 1000
+
+
+def test_shrink_halves_and_caps_growth():
+    sizer = PageSizer(1000, 100, 5000)
+    assert sizer.shrink() and sizer.size == 500 and sizer.high == 500
+    sizer.observe(500, 1, 0.001)
+    assert sizer.size == 500
+    while sizer.shrink():
+        pass
+    assert sizer.size == 100 and not sizer.shrink()
+
+
+def test_fetch_page_retries_smaller_after_timeout(monkeypatch):
+    requested = []
+
+    def make_request(path, method='GET', body=None, stats=None):
+        requested.append(path)
+        if path.endswith('/1000'):
+            stats.update(timeout=True)
+            return None
+        stats.update(timeout=False, bytes=100, seconds=0.1)
+        return {'status': True, 'data': [{}] * 10}
+
+    monkeypatch.setattr(extractor, 'make_request', make_request)
+    result, limit = fetch_page(lambda n: f"/page/{n}", PageSizer(1000, 100, 5000))
+    assert requested == ['/page/1000', '/page/500'] and limit == 500
+    assert len(result['data']) == 10
+
+
+def test_fetch_page_gives_up_at_minimum(monkeypatch):
+    def make_request(path, method='GET', body=None, stats=None):
+        stats.update(timeout=True)
+        return None
+
+    monkeypatch.setattr(extractor, 'make_request', make_request)
+    assert fetch_page(lambda n: f"/page/{n}", PageSizer(200, 100, 200)) == (None, 100)
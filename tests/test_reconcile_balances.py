@@ -0,0 +1,36 @@
+from datetime import datetime, timezone
+
+import numpy as np
+
+from compact_ids import compact_id
+from reconcile_balances import compact_keys, group_starts, local_days, segmented_cumsum
+
+
+def test_group_starts():
+    assert group_starts(np.array([1, 1, 2, 5, 5, 5])).tolist() == [0, 2, 3]
+    assert group_starts(np.array([], dtype=np.int64)).tolist() == []
+
+
+def test_segmented_cumsum_restarts_per_group():
+    values = np.array([1.0, 2.0, 3.0, 10.0, -4.0, 5.0])
+    starts = np.array([0, 3, 5])
+    assert segmented_cumsum(values, starts).tolist() == [1.0, 3.0, 6.0, 10.0, 6.0, 5.0]
+
+
+def test_segmented_cumsum_empty():
+    assert segmented_cumsum(np.zeros(0), np.zeros(0, dtype=np.int64)).tolist() == []
+
+
+def test_compact_keys_match_compact_id():
+    ids = ['58c872aa3ce7d5fc688b49bd', '58C872AA3CE7D5FC688B4900', '', 'walk-in', 'z' * 24]
+    keys = compact_keys(np.array(ids, dtype='U24'))
+    assert keys.tolist() == np.array([compact_id(i) for i in ids], dtype='S12').tolist()
+
+
+def test_local_days_follow_dst():
+    def at(*args):
+        return int(datetime(*args, tzinfo=timezone.utc).timestamp())
+
+    # 21:30 UTC is past midnight in Kyiv in summer (UTC+3), not in winter (UTC+2)
+    days = local_days(np.array([at(2024, 7, 1, 21, 30), at(2024, 1, 1, 21, 30)]), 'Europe/Kyiv')
+    assert days.tolist() == [at(2024, 7, 2) // 86400, at(2024, 1, 1) // 86400]
@@ -0,0 +1,24 @@
+from import_columns import TABLES, Column, TableSpec, row_hash
+
+
+def spec():
+    return TableSpec('hash_test', [Column('_id'), Column('name'), Column('note')],
+                     update=['name'])
+
+
+def test_hash_covers_only_update_columns():
+    s = spec()
+    assert s.hashed == [1]
+    assert row_hash(s, ['a', 'Chair', 'x']) == row_hash(s, ['b', 'Chair', 'y'])
+    assert row_hash(s, ['a', 'Chair', 'x']) != row_hash(s, ['a', 'Table', 'x'])
+
+
+def test_null_and_empty_text_hash_differently():
+    s = spec()
+    assert row_hash(s, ['a', '\\N', '']) != row_hash(s, ['a', '', ''])
+
+
+def test_every_table_hashes_its_update_list():
+    for table in TABLES.values():
+        assert [table.columns[i].name for i in table.hashed] == \
+            [c.name for c in table.columns if c.name in table.update]
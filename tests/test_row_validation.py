@@ -0,0 +1,88 @@
+import pytest
+
+from import_columns import (
+    TABLES, SCHEMA_PATH, _bool_checker, _column_checker, _decimal_checker, _int_checker,
+    _text_checker, _uuid_checker, check_schema, parse_schema, row_validator
+)
+
+
+def ok(check, value):
+    fixed, problem = check(value)
+    assert problem is None, problem
+    return fixed
+
+
+def bad(check, value):
+    return check(value)[1] is not None
+
+
+def test_text():
+    check = _text_checker(5)
+    assert ok(check, 'abc') == 'abc' and ok(check, None) is None
+    assert ok(check, 12) == '12' and ok(check, True) == 'true'
+    assert bad(check, 'abcdef') and bad(check, {'a': 1})
+
+
+def test_int():
+    check = _int_checker('INTEGER')
+    assert ok(check, 7) == 7 and ok(check, 7.0) == 7 and ok(check, ' 42 ') == 42
+    assert ok(check, True) == 1
+    assert bad(check, 7.5) and bad(check, 'x') and bad(check, '1.5') and bad(check, [1])
+    assert bad(check, 2 ** 31) and ok(check, -2 ** 31) == -2 ** 31
+
+
+def test_decimal():
+    check = _decimal_checker(8, 2)
+    assert ok(check, '12,50') == 12.5 and ok(check, 3) == 3
+    assert ok(check, 999999.994) == 999999.994
+    assert bad(check, 999999.999) and bad(check, float('nan'))
+    assert bad(check, True) and bad(check, 'abc')
+
+
+def test_bool():
+    assert ok(_bool_checker, 1) is True and ok(_bool_checker, 'F') is False
+    assert ok(_bool_checker, None) is None
+    assert bad(_bool_checker, 'yes') and bad(_bool_checker, 2)
+
+
+def test_uuid():
+    value = '2F1A3C4E-0000-4000-8000-000000000000'
+    assert ok(_uuid_checker, value) == value.lower()
+    assert bad(_uuid_checker, 'not-a-uuid')
+
+
+@pytest.mark.parametrize('sql_type, value, problem', [
+    ('VARCHAR(3)', 'abcd', True),
+    ('TEXT', 'abcd', False),
+    ('SMALLINT', 40000, True),
+    ('NUMERIC(5,1)', 1234.5, False),
+    ('BOOLEAN', 'maybe', True),
+])
+def test_column_checker(sql_type, value, problem):
+    assert bad(_column_checker(sql_type), value) is problem
+
+
+def test_unchecked_types():
+    assert _column_checker('JSONB') is None and _column_checker('TIMESTAMP') is None
+
+
+def test_row_validator_fixes_and_reports():
+    spec = TABLES['stores']
+    validate = row_validator('stores')
+    record = {'_id': 's1', 'name': 'Main', 'created': '1700000000', 'default': 'true'}
+    row, problems = validate(spec.row(record))
+    assert problems == []
+    names = [c.name for c in spec.columns]
+    assert row[names.index('created')] == 1700000000 and row[names.index('default')] is True
+
+    row, problems = validate(spec.row({'name': 'x' * 300, 'created': 'soon'}))
+    assert any(p.startswith('_id: missing') for p in problems)
+    assert any(p.startswith('name:') for p in problems)
+    assert any(p.startswith('created:') for p in problems)
+
+
+def test_specs_match_schema_sql():
+    with open(SCHEMA_PATH) as f:
+        schema_sql = f.read()
+    assert check_schema(schema_sql) == []
+    assert parse_schema(schema_sql)['stores']['created_ms'] == 'DECIMAL(16,3)'
@@ -0,0 +1,49 @@
+import pytest
+
+from snapshot_store import SnapshotReader, record_digest, snapshot_path, write_snapshot
+
+RECORDS = [
+    {'_id': '5c0000000000000000000003', 'date': 300, 'name': 'Стіл', 'qty': 2.5},
+    {'_id': '5c0000000000000000000001', 'date': 100, 'name': 'Chair'},
+    {'_id': 'walk-in', 'name': 'No date'},
+    {'_id': '5c0000000000000000000002', 'date': 200, 'tags': ['a', 'b']},
+]
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    path = str(tmp_path / 'documents.snap')
+    write_snapshot(path, RECORDS + [{'name': 'no id'}])
+    with SnapshotReader(path) as reader:
+        yield reader
+
+
+def test_round_trip_in_id_order(snapshot):
+    assert len(snapshot) == 4
+    assert list(snapshot) == sorted(RECORDS, key=lambda r: r['_id'])
+
+
+def test_get_and_range(snapshot):
+    assert snapshot.get('walk-in') == RECORDS[2]
+    assert snapshot.get('5c0000000000000000000000') is None
+    ids = [r['_id'] for r in snapshot.range('5c0000000000000000000002', 'walk-in')]
+    assert ids == ['5c0000000000000000000002', '5c0000000000000000000003']
+
+
+def test_by_date(snapshot):
+    assert [r['_id'] for r in snapshot.by_date(150, 300)] == ['5c0000000000000000000002']
+    assert [r.get('date', 0) for r in snapshot.by_date()] == [0, 100, 200, 300]
+
+
+def test_index_digests_ignore_key_order(snapshot):
+    digests = {key: digest for key, _, digest in snapshot.index()}
+    reordered = dict(reversed(list(RECORDS[0].items())))
+    assert digests[RECORDS[0]['_id']] == record_digest(reordered)
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'documents.json'
+    path.write_text('[]')
+    with pytest.raises(ValueError):
+        SnapshotReader(str(path))
+    assert snapshot_path(str(path)) == str(tmp_path / 'documents.snap')
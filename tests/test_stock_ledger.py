@@ -0,0 +1,51 @@
+from rebuild_stock_ledger import build_ledger, explode_lines
+
+
+def doc(_id, doc_type, date, products, **extra):
+    return dict(_id=_id, type=doc_type, date=date, store='s1',
+                products=[{'_id': p, 'qty': q} for p, q in products], **extra)
+
+
+def test_explode_lines_signs_and_movements():
+    lines = explode_lines([
+        doc('d1', 'purchases', 10, [('p1', 5)]),
+        doc('d2', 'sales', 20, [('p1', 2), ('p2', 0)]),
+        doc('d3', 'movements', 30, [('p1', 1)], to={'type': 'stores', '_id': 's2'}),
+        doc('d4', 'changes', 40, [('p1', -1)]),
+        doc('d5', 'orders', 50, [('p1', 9)]),
+    ])
+    rows = list(zip(lines['_document'].tolist(), lines['store'].tolist(), lines['delta'].tolist()))
+    assert rows == [('d1', 's1', 5.0), ('d2', 's1', -2.0), ('d3', 's1', -1.0),
+                    ('d3', 's2', 1.0), ('d4', 's1', -1.0)]
+
+
+def test_build_ledger_running_balance_per_product_and_store():
+    lines = explode_lines([
+        doc('d2', 'sales', 20, [('p1', 2)]),
+        doc('d1', 'purchases', 10, [('p1', 5), ('p2', 3)]),
+        doc('d3', 'movements', 30, [('p1', 1)], to={'type': 'stores', '_id': 's2'}),
+    ])
+    ledger, on_hand = build_ledger(lines)
+    rows = list(zip(ledger['product'].tolist(), ledger['store'].tolist(),
+                    ledger['_document'].tolist(), ledger['balance'].tolist()))
+    assert rows == [('p1', 's1', 'd1', 5.0), ('p1', 's1', 'd2', 3.0), ('p1', 's1', 'd3', 2.0),
+                    ('p1', 's2', 'd3', 1.0), ('p2', 's1', 'd1', 3.0)]
+    assert ledger['seq'].tolist() == [0, 1, 2, 3, 4]
+    assert list(zip(on_hand['product'].tolist(), on_hand['store'].tolist(),
+                    on_hand['qty'].tolist())) == [('p1', 's1', 2.0), ('p1', 's2', 1.0),
+                                                  ('p2', 's1', 3.0)]
+
+
+def test_same_date_lines_ordered_by_document():
+    lines = explode_lines([
+        doc('db', 'sales', 10, [('p1', 1)]),
+        doc('da', 'purchases', 10, [('p1', 4)]),
+    ])
+    ledger, _ = build_ledger(lines)
+    assert ledger['_document'].tolist() == ['da', 'db']
+    assert ledger['balance'].tolist() == [4.0, 3.0]
+
+
+def test_build_ledger_empty():
+    ledger, on_hand = build_ledger(explode_lines([]))
+    assert len(ledger['balance']) == 0 and len(on_hand['qty']) == 0
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Hash-based verification of an import
+For every table (and every month of the partitioned ones) the rows the
+importer would load from the extracted files and the rows in PostgreSQL are
+each reduced to a count and an order-independent sum of per-row digests.
+A row's digest is the md5 of its _id, partition column and the scalar
+columns the upsert writes, rendered as PostgreSQL prints them, leaving out
+the ones recomputed after the load (DERIVED_COLUMNS). The database side
+computes it from the stored values, so columns that were not written, were
+changed afterwards by the backend or were coerced on load show up as
+changed rows. Source files are hashed in worker processes
+while the database groups are computed over parallel connections.
+Mismatching groups are then compared id by id.
+
+Usage:
+    python verify_import.py
+    python verify_import.py --tables documents --months 2024-05 2024-06
+"""
+
+import argparse
+import hashlib
+import os
+import psycopg2
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+
+from import_columns import TABLES, HASH_COLUMN, schema_types, row_validator
+from import_data_to_postgres import (
+    DB_CONFIG, DATA_DIR, IMPORT_WORKERS, TRANSFORM_CHUNK_SIZE, month_arg,
+    load_json, category_records
+)
+from month_shards import SHARDED, shards_current, shard_entries, read_shard
+
+# Tables the importer loads, in its order
+VERIFY_TABLES = ['stores', 'accounts', 'money_sources', 'categories', 'products',
+                 'customers', 'suppliers', 'documents', 'money_movements']
+
+# Database connections computing group hashes at once
+VERIFY_CONNECTIONS = int(os.environ.get('VERIFY_CONNECTIONS', 4))
+
+# Ids listed per mismatching group and kind
+MAX_LISTED_IDS = int(os.environ.get('VERIFY_MAX_IDS', 20))
+
+# Group of the unpartitioned tables
+WHOLE_TABLE = 'all'
+
+# Columns rewritten after the load (recompute_debts), so their source value is not kept
+DERIVED_COLUMNS = {'debt'}
+
+# How NULL and the column separator appear in a row digest
+NULL = '\\N'
+SEPARATOR = '|'
+
+
+@lru_cache(maxsize=None)
+def verify_columns(table):
+    """(column, schema.sql type) of the columns a row digest covers
+
+    JSONB columns are left out: PostgreSQL normalises their text, so the
+    source side could not render them the same way. DERIVED_COLUMNS are
+    left out as well.
+    """
+    spec = TABLES[table]
+    types = schema_types()[table]
+    names = ['_id'] + ([spec.partition_by] if spec.partition_by else [])
+    names += [c.name for c in spec.columns
+              if c.name in spec.update and not c.jsonb and c.name not in names
+              and c.name not in DERIVED_COLUMNS]
+    return tuple((name, types[name]) for name in names)
+
+
+def render(sql_type):
+    """Function rendering a validated value the way PostgreSQL's ::text does"""
+    if sql_type == 'BOOLEAN':
+        return lambda value: 'true' if value else 'false'
+    if sql_type.startswith(('DECIMAL', 'NUMERIC')):
+        scale = Decimal(1).scaleb(-int(sql_type.rstrip(')').split(',')[1]))
+
+        def numeric(value):
+            number = Decimal(str(value)).quantize(scale, ROUND_HALF_UP)
+            return str(abs(number) if number == 0 else number)
+        return numeric
+    return str
+
+
+def row_md5(fields):
+    """md5 of rendered column values, as row_sql computes it"""
+    return hashlib.md5(SEPARATOR.join(fields).encode()).hexdigest()
+
+
+def row_key(digest):
+    """First 64 bits of a row md5 as a signed int, as the SQL sum adds them"""
+    return int.from_bytes(bytes.fromhex(digest[:16]), 'big', signed=True)
+
+
+def month_of(date):
+    """YYYY-MM (UTC) of an epoch-seconds date, None for NULL"""
+    if date is None:
+        return None
+    return datetime.fromtimestamp(int(date), timezone.utc).strftime('%Y-%m')
+
+
+def month_bounds(month):
+    """[start, end) epoch seconds of a YYYY-MM month (UTC)"""
+    start = datetime.strptime(month, '%Y-%m').replace(tzinfo=timezone.utc)
+    end = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return int(start.timestamp()), int(end.timestamp())
+
+# ============================================================================
+# SOURCE SIDE
+# ============================================================================
+
+def chunk_digests(table, items, archived_before=None, groups=None):
+    """Group hashes of the rows transform_chunk would load (runs in a worker)
+
+    Rows failing validation are quarantined by the importer and skipped
+    here, as are rows dated before archived_before, whose months were
+    detached. Returns {group: [rows, hash sum]}, or with groups
+    {group: {_id: row md5}} for just those groups.
+    """
+    spec = TABLES[table]
+    validate = row_validator(table)
+    positions = {c.name: i for i, c in enumerate(spec.columns)}
+    columns = [(positions[name], render(sql_type)) for name, sql_type in verify_columns(table)]
+    id_index = positions['_id']
+    part_index = positions[spec.partition_by] if spec.partition_by else None
+
+    result = {}
+    for item in items:
+        try:
+            values, problems = validate(spec.row(item))
+        except Exception:
+            continue
+        if problems:
+            continue
+        if part_index is not None:
+            date = values[part_index]
+            if archived_before and date and 0 < date < archived_before:
+                continue
+            group = month_of(date)
+        else:
+            group = WHOLE_TABLE
+        digest = row_md5([NULL if values[i] is None else fmt(values[i]) for i, fmt in columns])
+        if groups is None:
+            totals = result.setdefault(group, [0, 0])
+            totals[0] += 1
+            totals[1] += row_key(digest)
+        elif group in groups:
+            result.setdefault(group, {})[values[id_index]] = digest
+    return result
+
+
+def shard_digests(table, path, sha256, archived_before=None, groups=None):
+    """chunk_digests of one month shard (runs in a worker)"""
+    return chunk_digests(table, read_shard(path, sha256), archived_before, groups)
+
+
+def source_tasks(table, months=None, archived_before=None):
+    """(function, args) covering a table's extracted rows, one task per chunk or shard"""
+    if table in SHARDED and (months or shards_current(DATA_DIR, table)):
+        return [(shard_digests, (table, path, entry['sha256'], archived_before))
+                for _, path, entry in shard_entries(DATA_DIR, table, months)]
+    if table == 'categories':
+        data = category_records(load_json('categories.json'))
+    else:
+        data = load_json(f"{table}.json")
+    return [(chunk_digests, (table, data[i:i + TRANSFORM_CHUNK_SIZE], archived_before))
+            for i in range(0, len(data), TRANSFORM_CHUNK_SIZE)]
+
+
+def run_tasks(pool, tasks, groups=None):
+    """Run (function, args) tasks on the pool and merge their results"""
+    futures = [pool.submit(fn, *args, groups) for fn, args in tasks]
+    merged = {}
+    for future in futures:
+        for group, value in future.result().items():
+            if groups is None:
+                totals = merged.setdefault(group, [0, 0])
+                totals[0] += value[0]
+                totals[1] += value[1]
+            else:
+                merged.setdefault(group, {}).update(value)
+    return merged
+
+# ============================================================================
+# DATABASE SIDE
+# ============================================================================
+
+def row_sql(table):
+    """SQL expression of a row's md5 over verify_columns, as row_md5 computes it"""
+    fields = ', '.join(f"""COALESCE("{name}"::text, '{NULL}')"""
+                       for name, _ in verify_columns(table))
+    return f"md5(concat_ws('{SEPARATOR}', {fields}))"
+
+
+def group_sql(spec):
+    """SQL expression of a row's verification group"""
+    if spec.partition_by:
+        return f"to_char(to_timestamp({spec.partition_by}) AT TIME ZONE 'UTC', 'YYYY-MM')"
+    return f"'{WHOLE_TABLE}'"
+
+
+def group_filter(spec, groups, archived_before=None):
+    """WHERE fragment and params limiting a dated table to some months and
+    leaving out archived rows"""
+    if not spec.partition_by:
+        return '', []
+    column = spec.partition_by
+    where, params = '', []
+    if archived_before:
+        where = f" AND NOT ({column} > 0 AND {column} < %s)"
+        params.append(archived_before)
+    if not groups:
+        return where, params
+    clauses = []
+    for group in groups:
+        if group is None:
+            clauses.append(f"{column} IS NULL")
+        else:
+            clauses.append(f"({column} >= %s AND {column} < %s)")
+            params += month_bounds(group)
+    return f"{where} AND ({' OR '.join(clauses)})", params
+
+
+def archived_cutoffs():
+    """{table: epoch seconds} before which detach_partitions archived the rows"""
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT to_regclass('public.partition_archive') IS NOT NULL")
+        if not cursor.fetchone()[0]:
+            return {}
+        cursor.execute("SELECT parent, before FROM partition_archive")
+        return dict(cursor.fetchall())
+    finally:
+        conn.close()
+
+
+def db_digests(table, groups=None, archived_before=None):
+    """{group: [rows, hash sum]} of a table, on its own connection
+
+    Only imported rows are compared: rows the backend created and rows
+    soft-deleted by propagate_deletions.py have no content hash and are
+    not expected in the source.
+    """
+    spec = TABLES[table]
+    where, params = group_filter(spec, groups, archived_before)
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT {group_sql(spec)}, COUNT(*),
+                   SUM(('x' || left({row_sql(table)}, 16))::bit(64)::bigint)
+            FROM {table}
+            WHERE "{HASH_COLUMN}" IS NOT NULL{where}
+            GROUP BY 1
+        """, params)
+        return {group: [count, int(total or 0)] for group, count, total in cursor.fetchall()}
+    finally:
+        conn.close()
+
+
+def db_ids(table, group, archived_before=None):
+    """{_id: row md5} of one group"""
+    spec = TABLES[table]
+    where, params = group_filter(spec, [group] if group != WHOLE_TABLE else None,
+                                 archived_before)
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT _id, {row_sql(table)} FROM {table}
+            WHERE "{HASH_COLUMN}" IS NOT NULL{where}
+        """, params)
+        return dict(cursor.fetchall())
+    finally:
+        conn.close()
+
+# ============================================================================
+# VERIFICATION
+# ============================================================================
+
+def verify_tables(tables=VERIFY_TABLES, months=None):
+    """Compare source and database group hashes of every table
+
+    With months the dated tables are only compared for those months and
+    the other tables are skipped. Returns {table: result} where result
+    has the source and database row counts and the mismatching groups,
+    each with the ids missing from the database, extra in it, or changed.
+    """
+    if months:
+        tables = [t for t in tables if TABLES[t].partition_by]
+    groups = set(months) if months else None
+    cutoffs = archived_cutoffs()
+
+    workers = max(1, IMPORT_WORKERS)
+    with ProcessPoolExecutor(max_workers=workers) as pool, \
+            ThreadPoolExecutor(max_workers=max(1, VERIFY_CONNECTIONS)) as db_pool:
+        db_futures = {t: db_pool.submit(db_digests, t, groups, cutoffs.get(t)) for t in tables}
+        tasks = {t: source_tasks(t, months, cutoffs.get(t)) for t in tables}
+        source = {t: run_tasks(pool, tasks[t]) for t in tables}
+
+        results = {}
+        for table in tables:
+            db = db_futures[table].result()
+            if groups:
+                db = {g: v for g, v in db.items() if g in groups}
+            bad = sorted((g for g in set(source[table]) | set(db)
+                          if source[table].get(g) != db.get(g)), key=lambda g: g or '')
+            results[table] = {
+                'source_rows': sum(v[0] for v in source[table].values()),
+                'db_rows': sum(v[0] for v in db.values()),
+                'groups': len(set(source[table]) | set(db)),
+                'mismatches': [],
+            }
+            if not bad:
+                continue
+
+            # Only the mismatching groups are compared row by row
+            source_ids = run_tasks(pool, tasks[table], set(bad))
+            db_id_futures = {g: db_pool.submit(db_ids, table, g, cutoffs.get(table))
+                             for g in bad}
+            for group in bad:
+                expected = source_ids.get(group, {})
+                actual = db_id_futures[group].result()
+                results[table]['mismatches'].append({
+                    'group': group,
+                    'source_rows': (source[table].get(group) or [0])[0],
+                    'db_rows': (db.get(group) or [0])[0],
+                    'missing': sorted(set(expected) - set(actual)),
+                    'extra': sorted(set(actual) - set(expected)),
+                    'changed': sorted(i for i in set(expected) & set(actual)
+                                      if expected[i] != actual[i]),
+                })
+    return results
+
+
+def print_verification(results):
+    """Per-table verdicts, with the mismatching groups and ids; returns True if all match"""
+    ok = True
+    for table, result in results.items():
+        if not result['mismatches']:
+            print(f"   ✅ {table:20s}: {result['db_rows']:>10,} rows match "
+                  f"({result['groups']:,} groups)")
+            continue
+        ok = False
+        print(f"   ❌ {table:20s}: {result['source_rows']:>10,} in source, "
+              f"{result['db_rows']:,} in DB")
+        for mismatch in result['mismatches']:
+            print(f"      {mismatch['group'] or 'no date'}: {mismatch['source_rows']:,} in source, "
+                  f"{mismatch['db_rows']:,} in DB")
+            for kind in ['missing', 'extra', 'changed']:
+                ids = mismatch[kind]
+                if ids:
+                    more = f" (+{len(ids) - MAX_LISTED_IDS:,} more)" if len(ids) > MAX_LISTED_IDS else ''
+                    print(f"         {kind}: {', '.join(ids[:MAX_LISTED_IDS])}{more}")
+    return ok
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Verify PostgreSQL against the extracted data")
+    parser.add_argument('--tables', nargs='+', choices=VERIFY_TABLES, default=VERIFY_TABLES,
+                        help="only verify these tables")
+    parser.add_argument('--months', nargs='+', metavar='YYYY-MM', type=month_arg,
+                        help="only verify these months of documents and money movements")
+    return parser.parse_args()
+
+
+def main():
+    """Verify and exit non-zero on any mismatch"""
+    args = parse_args()
+
+    print("=" * 80)
+    print("🔍 IMPORT VERIFICATION")
+    print("=" * 80)
+    print(f"Data source: {DATA_DIR}")
+    print(f"Database: {DB_CONFIG['dbname']} @ {DB_CONFIG['host']}")
+    print("=" * 80)
+
+    started = datetime.now()
+    ok = print_verification(verify_tables(args.tables, args.months))
+    print(f"\n🕐 Verified in {(datetime.now() - started).total_seconds():.1f}s")
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()